@@ -2,12 +2,10 @@
 
 import logging
 import os
-import re
 
 from dotenv import load_dotenv
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from markupsafe import Markup
 
 # Initialize the database object
 # We do this here so it can be imported by models.py
@@ -39,29 +37,31 @@ def create_app():
     # Initialize the app with the database
     db.init_app(app)
 
-    # --- Custom Jinja Filters ---
-    @app.template_filter("format_substeps")
-    def format_substeps(text):
-        if not text:
-            return ""
+    # WAL journal, mmap and friends for SQLite (no-op for other databases)
+    from . import metrics, migrations, profiling, sqlite_profile
 
-        # Define the pattern to find the start of a new sub-step
-        pattern = r"(?<=[a-z0-9\]\)])\s*(?=[A-Z])"
+    with app.app_context():
+        sqlite_profile.init_app(app, db.engine)
+        # Per-request latency/SQL counters and planner stage timers on /metrics
+        metrics.init_app(app, db.engine)
+    # Opt-in cProfile of individual requests (PROFILE_REQUESTS=on, see profiling.py)
+    profiling.init_app(app)
+    migrations.init_app(app)
+
+    # Registers the flush hook that versions the catalogue for HTTP/plan caches
+    from .services import catalogue_version  # noqa: F401 (import for side-effects)
 
-        # Split the text into a list of sub-steps based on the capital letters
-        substeps = re.split(pattern, text)
+    # --- Background Jobs ---
+    # Catalogue imports/reclassification run here instead of blocking scripts
+    from .services.job_runner import JobRunner
 
-        # Wrap each sub-step in a div with a custom class
-        # The '•' adds a nice visual bullet point
-        html_output = "".join(
-            [
-                f'<div class="recipe-substep"> {s.strip()}</div>'
-                for s in substeps
-                if s.strip()
-            ]
-        )
+    JobRunner(app)
 
-        return Markup(html_output)
+    # The routes' small writes (favourites, plan changes) go through one
+    # writer thread and are group-committed, see write_queue.py
+    from .services.write_queue import WriteQueue
+
+    WriteQueue(app)
 
     # --- Blueprint Registration ---
     # We import these inside the function to prevent "circular imports"
@@ -69,11 +69,13 @@ def create_app():
 
     app.register_blueprint(main_bp)
 
-    # Create database tables if they don't exist
+    # Schema changes are applied explicitly with `flask db-upgrade`, so a worker
+    # start is just a version check. AUTO_MIGRATE=on upgrades at boot instead
+    # (handy for throwaway/dev databases).
     with app.app_context():
-        # This ensures all models (Recipe, Ingredient, etc.) are known to SQLAlchemy
-        from . import models  # noqa: F401 (import for side-effects)
-
-        db.create_all()
+        if os.getenv("AUTO_MIGRATE", "off").lower() == "on":
+            migrations.upgrade()
+        else:
+            migrations.warn_if_pending()
 
     return app
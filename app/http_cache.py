@@ -0,0 +1,80 @@
+# app/http_cache.py
+
+import gzip
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+
+# Responses smaller than this aren't worth the CPU to gzip
+COMPRESS_MIN_BYTES = 1024
+
+
+def _etag_for(parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    # Weak: the same representation may be sent gzipped or not
+    return f'W/"{digest}"'
+
+
+def conditional_json(cache_key):
+    """
+    Adds ETag/Last-Modified revalidation to a JSON view.
+
+    `cache_key()` returns (parts, last_modified) where `parts` is anything whose
+    repr changes whenever the response would (catalogue version, plan ids,
+    query args...). If the client already holds that version the view body is
+    skipped entirely and a bodyless 304 goes back.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts, last_modified = cache_key()
+            etag = _etag_for(parts)
+
+            if_none_match = request.headers.get("If-None-Match")
+            if if_none_match:
+                not_modified = etag in [t.strip() for t in if_none_match.split(",")]
+            else:
+                since = request.if_modified_since
+                not_modified = bool(
+                    since
+                    and last_modified
+                    and last_modified.replace(microsecond=0)
+                    <= since.replace(tzinfo=None)
+                )
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                _maybe_compress(response)
+
+            response.headers["ETag"] = etag
+            if last_modified:
+                response.last_modified = last_modified
+            # Private (depends on the session cookie) and always revalidated
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.update(["Cookie", "Accept-Encoding"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _maybe_compress(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+    ):
+        return
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return
+
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
@@ -0,0 +1,285 @@
+# app/metrics.py
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+# --- Metrics Configuration ---
+# Histogram bucket upper bounds. Latencies are in seconds; statement buckets are
+# counts, so an N+1 page shows up as requests piling into the 50+ buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# /metrics answers loopback clients only unless METRICS_ALLOW_REMOTE is set
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """A labelled, thread-safe Prometheus-style histogram."""
+
+    def __init__(self, name, doc, label_names, buckets):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., sum, count]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+
+        for key, series in sorted(snapshot.items()):
+            labels = list(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, series):
+                le = _format_labels(labels + [("le", bound)])
+                lines.append(f"{self.name}_bucket{le} {count}")
+            inf = _format_labels(labels + [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """A labelled, thread-safe Prometheus-style counter."""
+
+    def __init__(self, name, doc, label_names):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for key, value in sorted(snapshot.items()):
+            labels = _format_labels(list(zip(self.label_names, key)))
+            lines.append(f"{self.name}{labels} {value:g}")
+        return lines
+
+
+# --- Registry ---
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by endpoint.",
+    ("endpoint", "method", "status"),
+    LATENCY_BUCKETS,
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements executed per request.",
+    ("endpoint", "method"),
+    STATEMENT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_duration_seconds",
+    "Total time spent in SQL per request.",
+    ("endpoint", "method"),
+    LATENCY_BUCKETS,
+)
+SQL_STATEMENTS = Counter(
+    "sql_statements_total",
+    "SQL statements executed, by origin (request or background).",
+    ("origin",),
+)
+SQL_SECONDS = Counter(
+    "sql_duration_seconds_total",
+    "Time spent in SQL, by origin (request or background).",
+    ("origin",),
+)
+PLANNER_STAGE_SECONDS = Histogram(
+    "planner_stage_duration_seconds",
+    "Time per planner stage (candidate_load, scoring, sampling, aggregation).",
+    ("operation", "stage"),
+    LATENCY_BUCKETS,
+)
+PLAN_MEMO_LOOKUPS = Counter(
+    "plan_memo_lookups_total",
+    "Memoized plan lookups, by result (hit or miss).",
+    ("result",),
+)
+WRITE_GROUP_SIZE = Histogram(
+    "write_group_size",
+    "Queued writes committed together per group commit.",
+    (),
+    STATEMENT_BUCKETS,
+)
+WRITE_SECONDS = Histogram(
+    "write_queue_duration_seconds",
+    "Time from queueing a write to its commit, by operation.",
+    ("operation",),
+    LATENCY_BUCKETS,
+)
+
+REGISTRY = [
+    REQUEST_SECONDS,
+    REQUEST_SQL_STATEMENTS,
+    REQUEST_SQL_SECONDS,
+    SQL_STATEMENTS,
+    SQL_SECONDS,
+    PLANNER_STAGE_SECONDS,
+    PLAN_MEMO_LOOKUPS,
+    WRITE_GROUP_SIZE,
+    WRITE_SECONDS,
+]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# --- Planner Stage Timing ---
+class StageTimer:
+    """
+    Accumulates wall time per stage over one planner call and records each
+    stage once on exit, so loops that alternate scoring/sampling still give a
+    single observation per call.
+
+        with StageTimer("suggest_meal_plan") as stage:
+            with stage("candidate_load"):
+                ...
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.totals = {}
+
+    @contextmanager
+    def __call__(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.totals[stage] = self.totals.get(stage, 0.0) + elapsed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for stage, seconds in self.totals.items():
+            PLANNER_STAGE_SECONDS.observe(
+                seconds, operation=self.operation, stage=stage
+            )
+        return False
+
+
+# --- Hooks ---
+def _register_sql_events(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_t0"].pop()
+
+        if has_request_context() and "metrics_sql" in g:
+            g.metrics_sql[0] += 1
+            g.metrics_sql[1] += elapsed
+            origin = "request"
+        else:
+            origin = "background"
+        SQL_STATEMENTS.inc(origin=origin)
+        SQL_SECONDS.inc(elapsed, origin=origin)
+
+    @event.listens_for(engine, "handle_error")
+    def drop_statement(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_t0"):
+            conn.info["metrics_t0"].pop()
+
+
+def init_app(app, engine):
+    app.config.setdefault(
+        "METRICS_ENABLED", os.getenv("METRICS_ENABLED", "on").lower() != "off"
+    )
+    app.config.setdefault(
+        "METRICS_ALLOW_REMOTE",
+        os.getenv("METRICS_ALLOW_REMOTE", "off").lower() == "on",
+    )
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    _register_sql_events(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_t0 = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+
+    @app.after_request
+    def record_request(response):
+        if "metrics_t0" not in g or request.endpoint in (None, "static"):
+            return response
+
+        endpoint, method = request.endpoint, request.method
+        statements, sql_seconds = g.metrics_sql
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.metrics_t0,
+            endpoint=endpoint,
+            method=method,
+            status=response.status_code,
+        )
+        REQUEST_SQL_STATEMENTS.observe(statements, endpoint=endpoint, method=method)
+        REQUEST_SQL_SECONDS.observe(sql_seconds, endpoint=endpoint, method=method)
+        logging.debug(
+            "%s %s: %s SQL statements in %.1f ms",
+            method,
+            request.path,
+            statements,
+            sql_seconds * 1000,
+        )
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        if (
+            not app.config["METRICS_ALLOW_REMOTE"]
+            and request.remote_addr not in LOCAL_ADDRESSES
+        ):
+            abort(404)
+        return Response(
+            render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -0,0 +1,241 @@
+# app/migrations.py
+
+import logging
+from datetime import datetime
+
+import click
+from sqlalchemy import inspect, select, text
+
+from . import db
+
+# --- Schema Versioning ---
+# Every applied migration is recorded here, so `upgrade()` only runs new ones.
+schema_migration = db.Table(
+    "schema_migration",
+    db.metadata,
+    db.Column("version", db.Integer, primary_key=True),
+    db.Column("description", db.String(200), nullable=False),
+    db.Column("applied_at", db.DateTime, nullable=False),
+)
+
+
+def _add_missing_column(conn, table_name, column_name):
+    """ALTER TABLE ... ADD COLUMN for a model column the live table lacks."""
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column_name in existing:
+        return False
+
+    column = db.metadata.tables[table_name].c[column_name]
+    col_type = column.type.compile(dialect=conn.dialect)
+    logging.info("Adding column %s.%s", table_name, column_name)
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table_name} ADD COLUMN {column_name} {col_type}"
+    )
+    return True
+
+
+def _create_missing_indexes(conn, indexes):
+    """
+    Creates the named model indexes ({table: [index name, ...]}) that the live
+    table doesn't have yet. Each migration lists the indexes it introduced:
+    "everything the model declares" would include indexes on columns that
+    only a later migration adds.
+    """
+    for table_name, index_names in indexes.items():
+        table = db.metadata.tables[table_name]
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(table_name)}
+        by_name = {index.name: index for index in table.indexes}
+        for name in index_names:
+            if name not in existing:
+                logging.info("Creating index %s", name)
+                by_name[name].create(conn)
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+# --- Migrations ---
+# Each step receives a connection inside its own transaction and must be safe
+# to run against a database that create_all() has already brought up to date.
+
+
+def _baseline(conn):
+    # Fresh databases get the whole current schema (indexes included) in one go
+    db.metadata.create_all(bind=conn)
+
+
+def _hot_path_indexes(conn):
+    _create_missing_indexes(
+        conn,
+        {
+            "recipe": [
+                "ix_recipe_disliked_category",
+                "ix_recipe_disliked_favourite_name",
+                "ix_recipe_disliked_time",
+                "ix_recipe_favourite",
+            ],
+            "recipe_label": ["ix_recipe_label_label_recipe"],
+            "recipe_ingredient": ["ix_recipe_ingredient_ingredient_recipe"],
+            "confirmed_plan": [
+                "ix_confirmed_plan_status_date",
+                "ix_confirmed_plan_date",
+            ],
+        },
+    )
+
+
+def _structured_instructions(conn):
+    from .services.instructions import backfill_instruction_steps
+
+    _add_missing_column(conn, "recipe", "instruction_steps")
+    backfill_instruction_steps(conn)
+
+
+def _catalogue_state(conn):
+    from .services.catalogue_version import bump_catalogue_version
+
+    db.metadata.tables["catalogue_state"].create(conn, checkfirst=True)
+    bump_catalogue_version(conn)
+
+
+def _recipe_kcal(conn):
+    from .models import parse_calories
+
+    _add_missing_column(conn, "recipe", "kcal")
+
+    # Backfill by id in batches so memory stays flat on big catalogues
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, nutritional_info FROM recipe WHERE id > :last "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE recipe SET kcal = :kcal WHERE id = :id"),
+            [{"id": rid, "kcal": parse_calories(info, rid)} for rid, info in rows],
+        )
+        last_id = rows[-1][0]
+
+    _create_missing_indexes(conn, {"recipe": ["ix_recipe_disliked_kcal"]})
+
+
+def _near_duplicates(conn):
+    from .services.catalogue_version import bump_catalogue_version
+
+    _add_missing_column(conn, "recipe", "duplicate_of_id")
+    for name in ("recipe_minhash", "recipe_minhash_band"):
+        db.metadata.tables[name].create(conn, checkfirst=True)
+    # Signatures are filled in by scripts/dedupe_catalogue.py; the bump makes
+    # workers re-export their catalogue columns with the duplicate flag
+    bump_catalogue_version(conn)
+
+
+def _single_active_plan(conn):
+    # Racing finalise requests could leave several active plans; the newest
+    # one is what the planner has been showing, the rest become history
+    newest = conn.execute(
+        text("SELECT MAX(id) FROM confirmed_plan WHERE status = 'active'")
+    ).scalar()
+    if newest is not None:
+        conn.execute(
+            text(
+                "UPDATE confirmed_plan SET status = 'completed' "
+                "WHERE status = 'active' AND id != :newest"
+            ),
+            {"newest": newest},
+        )
+    # Partial index, same syntax on SQLite and PostgreSQL. It's the conflict
+    # target of the active plan upsert (write_queue.save_active_plan)
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_confirmed_plan_active "
+        "ON confirmed_plan (status) WHERE status = 'active'"
+    )
+
+
+def _flags_version(conn):
+    _add_missing_column(conn, "catalogue_state", "flags_version")
+    conn.execute(
+        text("UPDATE catalogue_state SET flags_version = 0 WHERE flags_version IS NULL")
+    )
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "planner/search hot-path indexes", _hot_path_indexes),
+    (3, "structured instruction steps", _structured_instructions),
+    (4, "catalogue version tracking", _catalogue_state),
+    (5, "recipe kcal column for calorie filters", _recipe_kcal),
+    (6, "near-duplicate signatures and duplicate_of", _near_duplicates),
+    (7, "at most one active plan", _single_active_plan),
+    (8, "favourite/dislike flags versioned apart from the catalogue", _flags_version),
+]
+
+
+def current_version():
+    if not inspect(db.engine).has_table("schema_migration"):
+        return 0
+    versions = db.session.scalars(select(schema_migration.c.version)).all()
+    return max(versions, default=0)
+
+
+def warn_if_pending():
+    """Logs (instead of applying) migrations the database is missing."""
+    behind = MIGRATIONS[-1][0] - current_version()
+    if behind > 0:
+        logging.warning(
+            "Database schema is %s migration(s) behind; run `flask db-upgrade`",
+            behind,
+        )
+    db.session.remove()
+    return behind
+
+
+def upgrade():
+    """Applies every migration newer than the database's recorded version."""
+    # Make sure everything is imported so the metadata is complete
+    from . import models  # noqa: F401 (import for side-effects)
+
+    schema_migration.create(db.engine, checkfirst=True)
+    version = current_version()
+    db.session.remove()
+
+    pending = [m for m in MIGRATIONS if m[0] > version]
+    for number, description, step in pending:
+        logging.info("Applying migration %s: %s", number, description)
+        with db.engine.begin() as conn:
+            step(conn)
+            conn.execute(
+                schema_migration.insert().values(
+                    version=number,
+                    description=description,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+
+    return len(pending)
+
+
+def replay(conn, since):
+    """
+    Re-runs the steps of every migration newer than `since` on `conn`, for
+    rows written in that older schema's shape (an archive import). Steps are
+    safe to repeat: DDL is skipped when already present and backfills derive
+    their columns from the source data.
+    """
+    for number, description, step in MIGRATIONS:
+        if number > since:
+            logging.info("Replaying migration %s: %s", number, description)
+            step(conn)
+
+
+def init_app(app):
+    @app.cli.command("db-upgrade")
+    def db_upgrade_command():
+        """Bring the database schema up to date."""
+        applied = upgrade()
+        click.echo(f"Applied {applied} migration(s); schema at v{current_version()}")
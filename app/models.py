@@ -4,6 +4,7 @@ import json
 import logging
 from datetime import datetime
 
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 
 from . import db
@@ -31,23 +32,90 @@ recipe_label = db.Table(
     extend_existing=True,
 )
 
+# Reverse lookup (label -> recipes) for label filters such as veg_only
+db.Index(
+    "ix_recipe_label_label_recipe", recipe_label.c.label_id, recipe_label.c.recipe_id
+)
+
+# --- Near-Duplicate Detection (see services/near_duplicates.py) ---
+# One MinHash signature per recipe, plus its LSH band buckets. The bucket key
+# hashes in the band number, so one (bucket, recipe) index serves every band.
+recipe_minhash = db.Table(
+    "recipe_minhash",
+    db.metadata,
+    db.Column("recipe_id", db.Integer, db.ForeignKey("recipe.id"), primary_key=True),
+    db.Column("signature", db.LargeBinary, nullable=False),
+)
+
+recipe_minhash_band = db.Table(
+    "recipe_minhash_band",
+    db.metadata,
+    db.Column("bucket", db.BigInteger, primary_key=True),
+    db.Column("recipe_id", db.Integer, db.ForeignKey("recipe.id"), primary_key=True),
+)
+
 # NOTE: The definition for recipe_ingredient = db.Table(...) has been REMOVED!
 
 
+def parse_calories(nutritional_info, recipe_id=None):
+    """kcal per portion from a recipe's nutritional_info (JSON string or dict)."""
+    if not nutritional_info:
+        return None
+
+    try:
+        # Step 1: Handle if it's a string (JSON) or already a dictionary
+        if isinstance(nutritional_info, str):
+            data = json.loads(nutritional_info)
+        else:
+            data = nutritional_info
+
+        # Step 2: Navigate the Gousto structure
+        # Check per_portion -> energy_kcal
+        portion = data.get("per_portion", {})
+        kcal = portion.get("energy_kcal")
+
+        # Step 3: Fallback check just in case keys vary
+        if kcal is None:
+            kcal = data.get("kcal") or portion.get("kcal")
+
+        return int(kcal) if kcal is not None else None
+
+    except Exception:
+        logging.exception("Error parsing calories for recipe %s", recipe_id)
+        return None
+
+
 class Recipe(db.Model):
     __tablename__ = "recipe"
+    # Indexes match the planner/search filters (see migrations.py for existing DBs)
+    __table_args__ = (
+        db.Index("ix_recipe_disliked_category", "is_disliked", "category"),
+        db.Index(
+            "ix_recipe_disliked_favourite_name", "is_disliked", "is_favourite", "name"
+        ),
+        db.Index("ix_recipe_disliked_time", "is_disliked", "time_minutes"),
+        db.Index("ix_recipe_disliked_kcal", "is_disliked", "kcal"),
+        db.Index("ix_recipe_favourite", "is_favourite"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), unique=True, nullable=False)
     # removed duplicate 'category' definition (kept single definition below)
     servings = db.Column(db.Integer)
     time_minutes = db.Column(db.Integer)
     instructions = db.Column(db.Text)
+    # [[sub-step, ...], ...] derived from `instructions` when the recipe is saved
+    instruction_steps = db.Column(db.JSON)
     nutritional_info = db.Column(db.Text)
+    # kcal per portion, kept in step with `nutritional_info` so SQL can filter on it
+    kcal = db.Column(db.Integer)
     is_favourite = db.Column(db.Boolean, default=False)
     is_disliked = db.Column(db.Boolean, default=False)
     image_url = db.Column(db.String(500))
     source_url = db.Column(db.String(500))
     category = db.Column(db.String(50), default="Other")
+    # Set when this recipe is a near-copy of another (e.g. re-published under a
+    # new name); such recipes are left out of planner candidates and search
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey("recipe.id"))
     # slug = db.Column(db.String(255), unique=True, nullable=False)
 
     # 1. UPDATED: Relationship to RecipeIngredient Model (Association Object)
@@ -71,32 +139,24 @@ class Recipe(db.Model):
         return f"<Recipe {self.name}>"
 
     @property
-    def calories(self):
-        """Extracts kcal from nutritional_info, handling strings or dicts."""
-        if not self.nutritional_info:
-            return None
+    def steps(self):
+        """Structured cooking steps; derived on the fly for un-migrated rows."""
+        if self.instruction_steps is not None:
+            return self.instruction_steps
 
-        try:
-            # Step 1: Handle if it's a string (JSON) or already a dictionary
-            if isinstance(self.nutritional_info, str):
-                data = json.loads(self.nutritional_info)
-            else:
-                data = self.nutritional_info
+        from .services.instructions import structure_instructions
 
-            # Step 2: Navigate the Gousto structure
-            # Check per_portion -> energy_kcal
-            portion = data.get("per_portion", {})
-            kcal = portion.get("energy_kcal")
+        return structure_instructions(self.instructions)
 
-            # Step 3: Fallback check just in case keys vary
-            if kcal is None:
-                kcal = data.get("kcal") or portion.get("kcal")
+    @property
+    def calories(self):
+        """Extracts kcal from nutritional_info, handling strings or dicts."""
+        return parse_calories(self.nutritional_info, self.id)
 
-            return int(kcal) if kcal is not None else None
 
-        except Exception:
-            logging.exception("Error parsing calories for recipe %s", self.id)
-            return None
+@event.listens_for(Recipe.nutritional_info, "set")
+def _sync_kcal(recipe, value, oldvalue, initiator):
+    recipe.kcal = parse_calories(value, recipe.id)
 
 
 class Ingredient(db.Model):
@@ -130,6 +190,12 @@ class Label(db.Model):
 class RecipeIngredient(db.Model):
     # 4. FINAL MODEL: This creates the 'recipe_ingredient' table
     __tablename__ = "recipe_ingredient"
+    # The primary key covers recipe -> ingredients; this covers the reverse
+    __table_args__ = (
+        db.Index(
+            "ix_recipe_ingredient_ingredient_recipe", "ingredient_id", "recipe_id"
+        ),
+    )
 
     recipe_id = db.Column(db.Integer, db.ForeignKey("recipe.id"), primary_key=True)
     ingredient_id = db.Column(
@@ -150,9 +216,28 @@ class RecipeIngredient(db.Model):
 
 class ConfirmedPlan(db.Model):
     __tablename__ = "confirmed_plan"
+    __table_args__ = (
+        db.Index("ix_confirmed_plan_status_date", "status", "date_confirmed"),
+        db.Index("ix_confirmed_plan_date", "date_confirmed"),
+        # Plus a partial unique index allowing one active plan, created by
+        # migration 7 (declared here, its postgresql_where would import that
+        # dialect at every startup)
+    )
     id = db.Column(db.Integer, primary_key=True)
     # Using datetime.utcnow for a consistent timestamp
     date_confirmed = db.Column(db.DateTime, default=datetime.utcnow)
     # We will store IDs like "12,45,67,89,102"
     recipe_ids = db.Column(db.String(500), nullable=False)
     status = db.Column(db.String(20), default="active")
+
+
+class CatalogueState(db.Model):
+    # Single row (id=1). `version` is bumped whenever recipe/ingredient/label data
+    # changes, `flags_version` when only favourites/dislikes do (see
+    # services/catalogue_version.py); caches key off them. `updated_at` moves
+    # with either.
+    __tablename__ = "catalogue_state"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    flags_version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
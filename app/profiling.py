@@ -0,0 +1,127 @@
+# app/profiling.py
+
+import hmac
+import logging
+import os
+import time
+
+from flask import g, request
+
+# --- Request Profiling (opt-in) ---
+# With PROFILE_REQUESTS=on, a request carrying `X-Profile: <token>` (or
+# `?_profile=<token>`) runs under cProfile. The token is PROFILE_TOKEN, which
+# must be set: without it profiling stays off and an error is logged. When the
+# mode is off nothing is registered (or imported), so normal requests pay nothing.
+#   PROFILE_DIR        where .prof files go (default: <instance>/profiles)
+#   PROFILE_KEEP       how many profiles to keep before the oldest are deleted
+#   PROFILE_ENDPOINTS  comma-separated endpoints allowed to be profiled
+#                      (e.g. "main.shuffle,main.generate_plan"); empty = any
+#   PROFILE_TOP        how many functions the logged summary lists
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_ARG = "_profile"
+DEFAULT_KEEP = 50
+DEFAULT_TOP = 25
+
+
+def _wants_profile(app):
+    allowed = app.config["PROFILE_ENDPOINTS"]
+    if allowed and request.endpoint not in allowed:
+        return False
+
+    token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+    return token is not None and hmac.compare_digest(
+        token.encode(), app.config["PROFILE_TOKEN"].encode()
+    )
+
+
+def _rotate(directory, keep):
+    profiles = sorted(
+        (e for e in os.scandir(directory) if e.name.endswith(".prof")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in profiles[: max(0, len(profiles) - keep)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _summarise(profiler, top):
+    import io
+    import pstats
+
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def init_app(app):
+    enabled = os.getenv("PROFILE_REQUESTS", "off").lower() == "on"
+    app.config.setdefault("PROFILE_REQUESTS", enabled)
+    if not app.config["PROFILE_REQUESTS"]:
+        return
+
+    app.config.setdefault("PROFILE_TOKEN", os.getenv("PROFILE_TOKEN", ""))
+    if not app.config["PROFILE_TOKEN"]:
+        # A guessable default would let anyone profile production requests
+        logging.error(
+            "PROFILE_REQUESTS is on but PROFILE_TOKEN is unset; not profiling"
+        )
+        app.config["PROFILE_REQUESTS"] = False
+        return
+
+    import cProfile
+
+    app.config.setdefault(
+        "PROFILE_DIR",
+        os.getenv("PROFILE_DIR", os.path.join(app.instance_path, "profiles")),
+    )
+    app.config.setdefault("PROFILE_KEEP", int(os.getenv("PROFILE_KEEP", DEFAULT_KEEP)))
+    app.config.setdefault("PROFILE_TOP", int(os.getenv("PROFILE_TOP", DEFAULT_TOP)))
+    endpoints = os.getenv("PROFILE_ENDPOINTS", "")
+    app.config.setdefault(
+        "PROFILE_ENDPOINTS", {e.strip() for e in endpoints.split(",") if e.strip()}
+    )
+    os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+    logging.warning(
+        "Request profiling enabled; profiles go to %s", app.config["PROFILE_DIR"]
+    )
+
+    @app.before_request
+    def start_profiler():
+        if not _wants_profile(app):
+            return
+        g.profiler = cProfile.Profile()
+        g.profiler_t0 = time.perf_counter()
+        g.profiler.enable()
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - g.profiler_t0) * 1000
+
+        # 1. Dump the raw profile (open with snakeviz / pstats)
+        now = time.time()
+        name = "{}.{:03d}-{}-{:.0f}ms.prof".format(
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(now)),
+            int(now * 1000) % 1000,
+            (request.endpoint or "unknown").replace(".", "_"),
+            elapsed_ms,
+        )
+        path = os.path.join(app.config["PROFILE_DIR"], name)
+        profiler.dump_stats(path)
+        _rotate(app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"])
+
+        # 2. Log the top functions by cumulative time next to it
+        logging.info(
+            "Profiled %s %s in %.1f ms -> %s\n%s",
+            request.method,
+            request.path,
+            elapsed_ms,
+            path,
+            _summarise(profiler, app.config["PROFILE_TOP"]),
+        )
@@ -1,9 +1,13 @@
 # app/routes.py
+import functools
+import json
 import logging
-from datetime import datetime
+import random
 
 from flask import (
     Blueprint,
+    Response,
+    current_app,
     flash,
     jsonify,
     redirect,
@@ -12,16 +16,38 @@ from flask import (
     session,
     url_for,
 )
-from sqlalchemy import func
 
-from .models import ConfirmedPlan, Ingredient, Recipe, db
+from .http_cache import conditional_json
+from .models import ConfirmedPlan, Recipe, db
+from .services.beam_planner import (
+    MAX_PER_WEEK,
+    MAX_WEEKS,
+    MIN_WEEKS,
+    search_tuning,
+    suggest_multi_week_plan,
+)
+from .services.catalogue_version import get_catalogue_state, get_catalogue_version
+from .services.job_runner import JOBS_TOKEN_HEADER
 from .services.planner_service import (
+    PLANNER_MODES,
     generate_optimized_shopping_list,
     get_synergy_report,
+    load_plan_recipes,
+    parse_category_quotas,
     suggest_meal_plan,
+    suggest_quota_plan,
     suggest_single_recipe,
     suggest_single_replacement,
 )
+from .services.write_queue import (
+    abandon_active_plan,
+    complete_active_plan,
+    run_write,
+    save_active_plan,
+    set_ingredient_category,
+    toggle_recipe_dislike,
+    toggle_recipe_status,
+)
 
 main_bp = Blueprint("main", __name__)
 
@@ -36,17 +62,15 @@ def index():
     if "current_plan" not in session or not isinstance(session["current_plan"], list):
         session["current_plan"] = [None] * 6
 
-    # 1. Resolve recipe objects for the grid
+    # 1. Resolve recipe objects for the grid (one eager load for every slot)
     current_ids = [rid for rid in session["current_plan"] if rid]
-    slots = [
-        db.session.get(Recipe, rid) if rid else None for rid in session["current_plan"]
-    ]
+    slots = load_plan_recipes(session["current_plan"])
 
     # 2. Generate the synergy report for the currently selected IDs
     synergy_items = []
     if len(current_ids) > 1:
-        # Using your existing function from planner_service.py
-        synergy_items = get_synergy_report(current_ids)
+        # Reuses the loaded slots rather than querying the recipes again
+        synergy_items = get_synergy_report(current_ids, recipes=[r for r in slots if r])
 
     # Check if a plan is already being cooked
     active_plan_exists = (
@@ -78,8 +102,8 @@ def randomise_slot(slot_index):
 
     # 2. Collect Prefs from the form (passed by our JS mirror)
     prefs = {
-        "max_time": request.form.get("max_time"),
-        "max_calories": request.form.get("max_cal"),
+        "max_time": request.form.get("max_time", type=int),
+        "max_calories": request.form.get("max_cal", type=int),
     }
 
     # 3. Get existing IDs for synergy (excluding the current slot)
@@ -100,6 +124,40 @@ def randomise_slot(slot_index):
     return redirect(url_for("main.index"))
 
 
+@main_bp.route("/fill_by_quota", methods=["POST"])
+def fill_by_quota():
+    # Fills the empty slots to quotas such as "2 chicken, 1 fish, 2 vegetarian"
+    current_plan = session.get("current_plan")
+    if not isinstance(current_plan, list) or len(current_plan) != 6:
+        current_plan = [None] * 6
+
+    empty_slots = [i for i, rid in enumerate(current_plan) if not rid]
+    try:
+        quotas = parse_category_quotas(request.form.get("quotas", ""))
+        if sum(quotas.values()) > len(empty_slots):
+            raise ValueError(f"Only {len(empty_slots)} empty slot(s) to fill")
+    except ValueError as e:
+        flash(str(e), "warning")
+        return redirect(url_for("main.index"))
+
+    prefs = {
+        "max_time": request.form.get("max_time", type=int),
+        "max_calories": request.form.get("max_cal", type=int),
+    }
+    picks = suggest_quota_plan(
+        quotas, existing_ids=[rid for rid in current_plan if rid], prefs=prefs
+    )
+    for slot_index, recipe in zip(empty_slots, picks):
+        current_plan[slot_index] = recipe.id
+
+    if len(picks) < sum(quotas.values()):
+        flash("Not enough recipes to meet every quota.", "info")
+
+    session["current_plan"] = current_plan
+    session.modified = True
+    return redirect(url_for("main.index"))
+
+
 @main_bp.route("/clear_slot/<int:slot_index>", methods=["POST"])
 def clear_slot(slot_index):
     current_plan = session["current_plan"]
@@ -111,26 +169,124 @@ def clear_slot(slot_index):
 
 @main_bp.route("/generate_plan", methods=["POST", "GET"])
 def generate_plan():
-    seed_id = request.form.get("seed_id")
+    # GET is the shareable form: /generate_plan?seed_id=..&rng=..&max_time=..
+    seed_id = request.values.get("seed_id", type=int)
     if not seed_id:
         return redirect(url_for("main.index"))
 
     # Gather preferences from form
     prefs = {
-        "max_calories": request.form.get("max_cal", type=int),
-        "max_time": request.form.get("max_time", type=int),
-        "veg_only": "veg_only" in request.form,
+        "max_calories": request.values.get("max_cal", type=int),
+        "max_time": request.values.get("max_time", type=int),
+        "veg_only": "veg_only" in request.values,
     }
     session["current_prefs"] = prefs  # Save for shuffling later
 
-    suggested_recipes = suggest_meal_plan(int(seed_id), count=5, prefs=prefs)
+    # Deterministic beam search on request, weighted sampling otherwise
+    mode = request.values.get("mode", "sample")
+    if mode not in PLANNER_MODES:
+        mode = "sample"
+
+    # Every sampled plan gets an RNG seed so the same URL gives the same plan
+    rng_seed = None
+    if mode == "sample":
+        rng_seed = request.values.get("rng", type=int)
+        if rng_seed is None:
+            rng_seed = random.randrange(2**31)
+
+    try:
+        tuning = search_tuning(
+            beam_width=request.values.get("beam_width", type=int),
+            time_budget_ms=request.values.get("time_budget_ms", type=int),
+        )
+    except ValueError as e:
+        flash(str(e), "warning")
+        return redirect(url_for("main.index"))
+
+    suggested_recipes = suggest_meal_plan(
+        seed_id, count=5, prefs=prefs, mode=mode, rng_seed=rng_seed, **tuning
+    )
     session["current_plan"] = [r.id for r in suggested_recipes]
 
     # Generate the synergy report
-    synergy = get_synergy_report(session["current_plan"])
+    recipes = load_plan_recipes(session["current_plan"])
+    synergy = get_synergy_report(session["current_plan"], recipes=recipes)
+
+    share_args = {
+        "seed_id": seed_id,
+        "max_cal": prefs["max_calories"],
+        "max_time": prefs["max_time"],
+        "veg_only": "on" if prefs["veg_only"] else None,
+        "mode": mode,
+        "rng": rng_seed,
+        **tuning,
+    }
+    share_url = url_for(
+        "main.generate_plan",
+        _external=True,
+        **{k: v for k, v in share_args.items() if v is not None},
+    )
 
     return render_template(
-        "plan_display.html", recipes=suggested_recipes, synergy=synergy
+        "plan_display.html", recipes=recipes, synergy=synergy, share_url=share_url
+    )
+
+
+def _int_param(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    return int(value)
+
+
+@main_bp.route("/api/multi_week_plan", methods=["POST"])
+def multi_week_plan():
+    params = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        weeks = _int_param(params, "weeks", MIN_WEEKS)
+        if not MIN_WEEKS <= weeks <= MAX_WEEKS:
+            raise ValueError(f"weeks must be between {MIN_WEEKS} and {MAX_WEEKS}")
+
+        prefs = {
+            "max_calories": _int_param(params, "max_cal"),
+            "max_time": _int_param(params, "max_time"),
+            "veg_only": str(params.get("veg_only", "")).lower() in ("1", "true", "on"),
+        }
+        per_week = _int_param(params, "per_week", 5)
+        seed_id = _int_param(params, "seed_id")
+        if not 1 <= per_week <= MAX_PER_WEEK:
+            raise ValueError(f"per_week must be between 1 and {MAX_PER_WEEK}")
+        tuning = search_tuning(
+            beam_width=_int_param(params, "beam_width"),
+            time_budget_ms=_int_param(params, "time_budget_ms"),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    result = suggest_multi_week_plan(
+        weeks,
+        per_week=per_week,
+        prefs=prefs,
+        seed_recipe_id=seed_id,
+        **tuning,
+    )
+    return jsonify(
+        {
+            "weeks": [
+                [
+                    {
+                        "id": r.id,
+                        "name": r.name,
+                        "category": r.category,
+                        "time": r.time_minutes,
+                    }
+                    for r in week
+                ]
+                for week in result["weeks"]
+            ],
+            "score": result["score"],
+            "greedy_steps": result["greedy_steps"],
+        }
     )
 
 
@@ -155,8 +311,8 @@ def shuffle(index):
     current_ids[index] = new_recipe.id
     session["current_plan"] = current_ids
 
-    recipes = [db.session.get(Recipe, rid) for rid in current_ids]
-    synergy = get_synergy_report(current_ids)
+    recipes = load_plan_recipes(current_ids)
+    synergy = get_synergy_report(current_ids, recipes=recipes)
 
     return render_template("plan_display.html", recipes=recipes, synergy=synergy)
 
@@ -170,19 +326,8 @@ def finalise_plan():
         if not valid_ids:
             return {"status": "error", "message": "No meals selected"}, 400
 
-        recipe_ids_str = ",".join(map(str, valid_ids))
-
-        # Look for existing active plan
-        existing_plan = ConfirmedPlan.query.filter_by(status="active").first()
-
-        if existing_plan:
-            existing_plan.recipe_ids = recipe_ids_str
-            existing_plan.date_confirmed = datetime.utcnow()
-        else:
-            new_plan = ConfirmedPlan(recipe_ids=recipe_ids_str, status="active")
-            db.session.add(new_plan)
-
-        db.session.commit()
+        # Creates or replaces the active plan in one atomic upsert
+        run_write(save_active_plan, valid_ids)
         return {"status": "success"}  # Explicit JSON
 
     except Exception as e:
@@ -197,9 +342,9 @@ def current_plan():
     if not plan_record:
         return render_template("current_plan.html", recipes=[], active_recipe=None)
 
-    # Convert "1,2,3" string back to objects
+    # Convert "1,2,3" string back to objects (skipping any since deleted)
     id_list = [int(rid) for rid in plan_record.recipe_ids.split(",") if rid]
-    recipes = [db.session.get(Recipe, rid) for rid in id_list]
+    recipes = [r for r in load_plan_recipes(id_list, with_instructions=True) if r]
 
     active_id = request.args.get("active", type=int)
     active_recipe = next(
@@ -213,15 +358,11 @@ def current_plan():
 
 @main_bp.route("/toggle_dislike/<int:recipe_id>", methods=["POST"])
 def toggle_dislike(recipe_id):
-    recipe = db.session.get(Recipe, recipe_id)
-    if recipe:
-        recipe.is_disliked = not recipe.is_disliked
-        db.session.commit()
-    return redirect(request.referrer or url_for("main.plan_display"))
+    run_write(toggle_recipe_dislike, recipe_id)
+    return redirect(request.referrer or url_for("main.index"))
 
 
-@main_bp.route("/api/shopping_list_preview")
-def shopping_list_preview():
+def _preview_recipe_ids():
     # 1. Try to get IDs from session (Planner view)
     current_ids = [rid for rid in session.get("current_plan", []) if rid]
 
@@ -237,6 +378,20 @@ def shopping_list_preview():
                 ]
                 current_ids.extend(ids)
 
+    return current_ids
+
+
+def _shopping_list_cache_key():
+    version, _ = get_catalogue_version()
+    # ETag only: editing the session plan has no timestamp for Last-Modified
+    return ("shopping_list", version, tuple(_preview_recipe_ids())), None
+
+
+@main_bp.route("/api/shopping_list_preview")
+@conditional_json(_shopping_list_cache_key)
+def shopping_list_preview():
+    current_ids = _preview_recipe_ids()
+
     if not current_ids:
         return jsonify({"grouped_shopping_list": {}, "basics_check_list": []})
 
@@ -250,14 +405,7 @@ def update_ingredient_category():
     ing_name = data.get("name")
     new_cat = data.get("category")
 
-    # Use func.lower to match regardless of capitalisation
-    ingredient = Ingredient.query.filter(
-        func.lower(Ingredient.name) == ing_name.lower()
-    ).first()
-
-    if ingredient:
-        ingredient.category = new_cat
-        db.session.commit()
+    if run_write(set_ingredient_category, ing_name, new_cat):
         return jsonify({"status": "success"})
 
     return (
@@ -285,12 +433,21 @@ def select_recipe(slot_index, recipe_id):
     return redirect(url_for("main.index"))
 
 
+def _search_cache_key():
+    version, flags_version, updated_at = get_catalogue_state()
+    args = (request.args.get("q", "").strip(), request.args.get("favourites"))
+    return ("search", version, flags_version, args), updated_at
+
+
 @main_bp.route("/api/search_recipes")
+@conditional_json(_search_cache_key)
 def search_recipes():
     query = request.args.get("q", "").strip()
     only_favourites = request.args.get("favourites", "false") == "true"
 
-    stmt = Recipe.query.filter(Recipe.is_disliked.is_(False))
+    stmt = Recipe.query.filter(
+        Recipe.is_disliked.is_(False), Recipe.duplicate_of_id.is_(None)
+    )
 
     if only_favourites:
         stmt = stmt.filter(Recipe.is_favourite.is_(True))
@@ -309,35 +466,51 @@ def search_recipes():
     )
 
 
+def _similar_cache_key():
+    # Disliked recipes are left out, so a dislike changes the answer
+    version, flags_version, updated_at = get_catalogue_state()
+    args = (request.view_args["recipe_id"], request.args.get("k"))
+    return ("similar", version, flags_version, args), updated_at
+
+
+@main_bp.route("/api/similar/<int:recipe_id>")
+@conditional_json(_similar_cache_key)
+def similar(recipe_id):
+    from .services.similarity_index import DEFAULT_K, MAX_K, similar_recipes
+
+    k = min(max(request.args.get("k", DEFAULT_K, type=int), 1), MAX_K)
+    matches = similar_recipes(recipe_id, k=k)
+    if matches is None:
+        return jsonify({"status": "error", "message": "Recipe not found"}), 404
+
+    scores = dict(matches)
+    recipes = [r for r in load_plan_recipes([rid for rid, _ in matches]) if r]
+    return jsonify(
+        [
+            {
+                "id": r.id,
+                "name": r.name,
+                "category": r.category,
+                "time": r.time_minutes,
+                "score": scores[r.id],
+            }
+            for r in recipes
+        ]
+    )
+
+
 @main_bp.route("/toggle_status/<int:recipe_id>/<string:status_type>", methods=["POST"])
 def toggle_status(recipe_id, status_type):
-    recipe = db.session.get(Recipe, recipe_id)
-    if not recipe:
+    if not run_write(toggle_recipe_status, recipe_id, status_type):
         return {"error": "Recipe not found"}, 404
 
-    if status_type == "favourite":
-        recipe.is_favourite = not recipe.is_favourite
-        # Logic: If favourited, it cannot be disliked
-        if recipe.is_favourite:
-            recipe.is_disliked = False
-
-    elif status_type == "dislike":
-        recipe.is_disliked = not recipe.is_disliked
-        # Logic: If disliked, it cannot be a favourite
-        if recipe.is_disliked:
-            recipe.is_favourite = False
-
-    db.session.commit()
     return redirect(request.referrer or url_for("main.index"))
 
 
 @main_bp.route("/complete_plan", methods=["POST"])
 def complete_plan():
-    plan = ConfirmedPlan.query.filter_by(status="active").first()
-    if plan:
-        plan.status = "completed"  # It's now history!
-        plan.date_confirmed = datetime.utcnow()
-        db.session.commit()
+    # The active plan becomes history (feeding the recency bias)
+    if run_write(complete_active_plan):
         session.pop("current_plan", None)  # Clear local draft
         flash("Plan moved to history. Recency bias applied!", "success")
     return redirect(url_for("main.index"))
@@ -345,8 +518,7 @@ def complete_plan():
 
 @main_bp.route("/abandon_plan", methods=["POST"])
 def abandon_plan():
-    ConfirmedPlan.query.filter_by(status="active").delete()
-    db.session.commit()
+    run_write(abandon_active_plan)
     session.pop("current_plan", None)
     flash("Plan deleted.", "info")
     return redirect(url_for("main.index"))
@@ -363,3 +535,89 @@ def reclassify_recipe(recipe_id):
         flash(f"Updated {recipe.name} to {new_category}.", "success")
 
     return redirect(request.referrer or url_for("main.index"))
+
+
+# --- Background Jobs (imports, reclassification, reindexing) ---
+
+
+@main_bp.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    runner = current_app.extensions["job_runner"]
+    return jsonify([job.to_dict() for job in runner.list()])
+
+
+def _jobs_token_required(view):
+    """403 unless the request carries the JOBS_TOKEN (see job_runner.py)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        runner = current_app.extensions["job_runner"]
+        if not runner.authorised(request.headers.get(JOBS_TOKEN_HEADER)):
+            return (
+                jsonify({"status": "error", "message": "Not allowed to manage jobs"}),
+                403,
+            )
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@main_bp.route("/api/jobs/<string:kind>", methods=["POST"])
+@_jobs_token_required
+def start_job(kind):
+    runner = current_app.extensions["job_runner"]
+    params = request.get_json(silent=True) or request.form.to_dict()
+
+    try:
+        job = runner.submit(kind, params)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return jsonify(job.to_dict()), 202
+
+
+@main_bp.route("/api/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id):
+    job = current_app.extensions["job_runner"].get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@main_bp.route("/api/jobs/<int:job_id>/cancel", methods=["POST"])
+@_jobs_token_required
+def cancel_job(job_id):
+    job = current_app.extensions["job_runner"].cancel(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@main_bp.route("/api/jobs/<int:job_id>/events")
+def job_events(job_id):
+    """Server-sent events: pushes the job's state every time it changes."""
+    job = current_app.extensions["job_runner"].get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    def stream():
+        seen = -1
+        while True:
+            with job.changed:
+                # Wake up on change, or every 15s to send a keep-alive comment
+                job.changed.wait_for(lambda: job.revision != seen, timeout=15)
+                revision = job.revision
+            if revision == seen:
+                yield ": keep-alive\n\n"
+                continue
+
+            seen = revision
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+            if not job.is_active and job.finished_at:
+                break
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,291 @@
+# app/services/beam_planner.py
+
+import heapq
+import logging
+import time
+from itertools import islice
+from typing import Dict
+
+from sqlalchemy import select
+
+from app.metrics import StageTimer
+from app.models import Label, Recipe
+from app.services.catalogue_snapshot import get_snapshot
+from app.services.planner_service import (
+    RECENT_DAYS,
+    calculate_affinity_score,
+    calculate_individual_weight,
+    get_recent_recipe_ids,
+    load_candidate_records,
+    load_plan_recipes,
+    noisy_labels,
+)
+
+# --- Beam Search Configuration ---
+# How many partial plans survive each step, and how many children each one may
+# contribute before the beam is pruned back to BEAM_WIDTH.
+BEAM_WIDTH = 8
+EXPANSIONS_PER_STATE = 6
+
+# Per state, only a shortlist is scored: the best candidates on their own
+# merits plus those sharing a fresh ingredient with the week so far.
+SHORTLIST_SIZE = 300
+NEIGHBOURS_PER_INGREDIENT = 25
+
+# Once the budget is spent the search stops and the best partial plan is
+# completed in one greedy pass, so a full plan always comes back, and soon
+# after the deadline. Each slot then weighs only the GREEDY_CHOICES best
+# candidates (by static score) the no-repeat window allows.
+TIME_BUDGET_MS = 2000
+GREEDY_CHOICES = 20
+
+# Ceilings for what a request may ask for. Slots per week bound the work left
+# after the deadline (two meals a day).
+MAX_BEAM_WIDTH = 64
+MAX_TIME_BUDGET_MS = TIME_BUDGET_MS * 5
+MAX_PER_WEEK = 14
+
+# --- Multi-Week Rules ---
+MIN_WEEKS, MAX_WEEKS = 2, 6
+# A recipe can't come back within this many weeks (current week included)
+NO_REPEAT_WEEKS = MAX_WEEKS
+# Cuisines used in the previous VARIETY_WEEKS weeks cost VARIETY_PENALTY each
+VARIETY_WEEKS = 1
+VARIETY_PENALTY = 3.0
+# Same as the flat penalty calculate_affinity_score applies per pair
+RECENT_PENALTY = 50.0
+
+
+def search_tuning(beam_width=None, time_budget_ms=None) -> dict:
+    """
+    Checks request-supplied search settings. Values must be positive (else
+    ValueError) and are capped at MAX_BEAM_WIDTH / MAX_TIME_BUDGET_MS. Returns
+    the ones given (not None) as keyword arguments for the planners.
+    """
+    tuning = {}
+    for key, value, ceiling in (
+        ("beam_width", beam_width, MAX_BEAM_WIDTH),
+        ("time_budget_ms", time_budget_ms, MAX_TIME_BUDGET_MS),
+    ):
+        if value is None:
+            continue
+        if value < 1:
+            raise ValueError(f"{key} must be positive")
+        tuning[key] = min(value, ceiling)
+    return tuning
+
+
+def beam_search_plan(
+    candidates,
+    weeks: int,
+    per_week: int,
+    prefs: dict = None,
+    recent_ids=None,
+    seed=None,
+    beam_width: int = BEAM_WIDTH,
+    time_budget_ms: float = TIME_BUDGET_MS,
+    no_repeat_weeks: int = NO_REPEAT_WEEKS,
+    variety_weeks: int = VARIETY_WEEKS,
+) -> Dict:
+    """
+    Fills `weeks` x `per_week` slots from `candidates` (RecipeRecords), keeping
+    the `beam_width` best partial plans by cumulative score at every step.
+    A step adds one recipe; its score is calculate_individual_weight plus its
+    affinity with the recipes already in that week, minus recency and
+    cross-week variety penalties. Cost is linear in the number of weeks.
+
+    `seed` (a RecipeRecord) is placed first in week one. Past `time_budget_ms`
+    the search stops and the best plan so far is completed greedily; the
+    slots filled that way are counted in "greedy_steps".
+    Returns {"plan": [[record, ...] per week], "score", "steps", "greedy_steps"}.
+    """
+    prefs = prefs or {}
+    recent_ids = recent_ids or set()
+    beam_width = max(1, beam_width)
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+
+    pool = list(candidates)
+    if seed is not None:
+        pool = [c for c in pool if c.id != seed.id] + [seed]
+    if not pool:
+        return {"plan": [], "score": 0.0, "steps": 0, "greedy_steps": 0}
+
+    # 1. Per-candidate terms that don't depend on the rest of the plan
+    static = [
+        calculate_individual_weight(c, prefs)
+        - (RECENT_PENALTY if c.id in recent_ids else 0.0)
+        for c in pool
+    ]
+    by_static = sorted(range(len(pool)), key=static.__getitem__, reverse=True)
+    top_static = by_static[:SHORTLIST_SIZE]
+
+    # Inverted index: fresh ingredient -> best candidates using it
+    neighbours = {}
+    for i in by_static:
+        for ing_id in pool[i].fresh_ingredient_ids:
+            bucket = neighbours.setdefault(ing_id, [])
+            if len(bucket) < NEIGHBOURS_PER_INGREDIENT:
+                bucket.append(i)
+
+    def step_score(i, week_items, prev_cuisines):
+        c = pool[i]
+        score = static[i]
+        for j in week_items:
+            score += calculate_affinity_score(c, pool[j], prefs, recent_ids)
+        return score - VARIETY_PENALTY * (c.cuisine_mask & prev_cuisines).bit_count()
+
+    # 2. The search. A state is (score, chosen pool indices in slot order).
+    total_slots = weeks * per_week
+    beam = [(0.0, ())]
+    if seed is not None:
+        beam = [(static[-1], (len(pool) - 1,))]
+
+    def slot_context(chosen, step):
+        """(week start, indices the no-repeat window blocks, previous cuisines)"""
+        week_no = step // per_week
+        week_start = week_no * per_week
+        window_start = max(0, week_no - no_repeat_weeks + 1) * per_week
+        prev_cuisines = 0
+        variety_start = max(0, week_no - variety_weeks) * per_week
+        for j in chosen[variety_start:week_start]:
+            prev_cuisines |= pool[j].cuisine_mask
+        return week_start, set(chosen[window_start:]), prev_cuisines
+
+    def fill_greedily(score, chosen):
+        for step in range(len(chosen), total_slots):
+            week_start, blocked, prev_cuisines = slot_context(chosen, step)
+            allowed = (i for i in by_static if i not in blocked)
+            scored = [
+                (step_score(i, chosen[week_start:], prev_cuisines), i)
+                for i in islice(allowed, GREEDY_CHOICES)
+            ]
+            if not scored:
+                break
+            gain, i = max(scored)
+            score += gain
+            chosen += (i,)
+        return score, chosen
+
+    greedy_steps = 0
+    for step in range(len(beam[0][1]), total_slots):
+        if time.perf_counter() > deadline:
+            score, chosen = beam[0]
+            beam = [fill_greedily(score, chosen)]
+            greedy_steps = len(beam[0][1]) - len(chosen)
+            break
+
+        children, seen = [], set()
+        for score, chosen in beam:
+            if children and time.perf_counter() > deadline:
+                break  # out of time mid-step: keep what's been expanded
+            week_start, blocked, prev_cuisines = slot_context(chosen, step)
+            week_items = chosen[week_start:]
+
+            shortlist = set(top_static)
+            for j in week_items:
+                for ing_id in pool[j].fresh_ingredient_ids:
+                    shortlist.update(neighbours.get(ing_id, ()))
+            shortlist -= blocked
+
+            scored = (
+                (score + step_score(i, week_items, prev_cuisines), i) for i in shortlist
+            )
+            for child_score, i in heapq.nlargest(EXPANSIONS_PER_STATE, scored):
+                # Order inside a week doesn't matter; don't let permutations of
+                # the same week crowd other plans out of the beam
+                key = (chosen[:week_start], frozenset(week_items + (i,)))
+                if key not in seen:
+                    seen.add(key)
+                    children.append((child_score, chosen + (i,)))
+
+        if not children:
+            break  # ran out of recipes that the no-repeat window allows
+        beam = heapq.nlargest(beam_width, children)
+
+    best_score, best = beam[0]
+    plan = [
+        [pool[i] for i in best[start:][:per_week]]
+        for start in range(0, len(best), per_week)
+    ]
+    return {
+        "plan": plan,
+        "score": round(best_score, 2),
+        "steps": len(best),
+        "greedy_steps": greedy_steps,
+    }
+
+
+def plan_score(records, prefs=None, recent_ids=None) -> float:
+    """
+    The objective beam search maximises, for one week of RecipeRecords in
+    placement order. Lets plans from either planner mode be compared.
+    """
+    prefs = prefs or {}
+    recent_ids = recent_ids or set()
+    score = 0.0
+    for k, record in enumerate(records):
+        score += calculate_individual_weight(record, prefs)
+        if record.id in recent_ids:
+            score -= RECENT_PENALTY
+        for placed in records[:k]:
+            score += calculate_affinity_score(record, placed, prefs, recent_ids)
+    return score
+
+
+def suggest_multi_week_plan(
+    weeks: int,
+    per_week: int = 5,
+    prefs: dict = None,
+    seed_recipe_id: int = None,
+    beam_width: int = BEAM_WIDTH,
+    time_budget_ms: float = TIME_BUDGET_MS,
+) -> Dict:
+    """
+    Plans `weeks` consecutive weeks (MIN_WEEKS..MAX_WEEKS) in one search, with
+    no repeats inside the NO_REPEAT_WEEKS window and a cuisine-variety penalty
+    between neighbouring weeks. Returns {"weeks": [[Recipe, ...], ...], ...}.
+    """
+    if not MIN_WEEKS <= weeks <= MAX_WEEKS:
+        raise ValueError(f"weeks must be between {MIN_WEEKS} and {MAX_WEEKS}")
+
+    prefs = prefs or {}
+    with StageTimer("suggest_multi_week_plan") as stage:
+        with stage("candidate_load"):
+            snapshot = get_snapshot()
+            recent_ids = get_recent_recipe_ids(days=RECENT_DAYS)
+
+            query = select(Recipe.id).where(Recipe.is_disliked.is_(False))
+            if prefs.get("veg_only"):
+                query = query.join(Recipe.labels).where(Label.title == "Vegetarian")
+            candidates = load_candidate_records(query, snapshot)
+
+            seed = None
+            if seed_recipe_id:
+                found = snapshot.records([seed_recipe_id], ignore_labels=noisy_labels())
+                seed = found[0] if found else None
+
+        with stage("scoring"):
+            result = beam_search_plan(
+                candidates,
+                weeks,
+                per_week,
+                prefs,
+                recent_ids,
+                seed=seed,
+                beam_width=beam_width,
+                time_budget_ms=time_budget_ms,
+            )
+
+        with stage("aggregation"):
+            # Only the chosen recipes become ORM objects
+            chosen = [r.id for week in result["plan"] for r in week]
+            by_id = {r.id: r for r in load_plan_recipes(chosen) if r}
+            result["weeks"] = [[by_id[r.id] for r in week] for week in result["plan"]]
+
+    if result["greedy_steps"]:
+        logging.info(
+            "Multi-week plan hit its %s ms budget; %s step(s) finished greedily",
+            time_budget_ms,
+            result["greedy_steps"],
+        )
+    return result
@@ -0,0 +1,319 @@
+# app/services/catalogue_archive.py
+
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, inspect, select
+
+from app.models import Ingredient, Label, Recipe, db
+
+# --- Archive Format ---
+# One compressed .npz holding every catalogue table column by column, plus a
+# JSON manifest (stored as the "manifest" byte array). Column kinds:
+#   int/float/bool  one array (int64/float64/uint8)
+#   str/json/bytes  all values concatenated into a uint8 "data" array with
+#                   int64 "offsets" (value i is data[offsets[i]:offsets[i + 1]])
+# Nullable columns also get a uint8 "valid" mask. Keys are "table.column.part".
+# User data (confirmed plans) is not part of the catalogue and isn't exported.
+ARCHIVE_FORMAT = 1
+
+# In foreign-key order, so an import can insert them one after the other. The
+# near-duplicate signatures and LSH bands are derived, but slow to recompute.
+ARCHIVE_TABLES = (
+    "label",
+    "ingredient",
+    "recipe",
+    "recipe_label",
+    "recipe_ingredient",
+    "recipe_minhash",
+    "recipe_minhash_band",
+)
+
+# Rows per INSERT batch on import
+IMPORT_BATCH_SIZE = 5000
+
+
+def _column_kind(column):
+    if isinstance(column.type, db.JSON):
+        return "json"
+    python_type = column.type.python_type
+    if python_type is bool:
+        return "bool"
+    if python_type is int:
+        return "int"
+    if python_type is float:
+        return "float"
+    if python_type is str:
+        return "str"
+    if python_type is bytes:
+        return "bytes"
+    raise ValueError(f"Can't archive column {column} of type {column.type}")
+
+
+def _encode(kind, values, key, arrays):
+    import numpy as np
+
+    valid = [v is not None for v in values]
+    if not all(valid):
+        arrays[f"{key}.valid"] = np.array(valid, dtype=np.uint8)
+
+    if kind in ("int", "float", "bool"):
+        dtype = {"int": np.int64, "float": np.float64, "bool": np.uint8}[kind]
+        fill = 0 if kind != "float" else 0.0
+        arrays[f"{key}.values"] = np.array(
+            [fill if v is None else v for v in values], dtype=dtype
+        )
+        return
+
+    if kind == "json":
+        values = [None if v is None else json.dumps(v) for v in values]
+    if kind in ("str", "json"):
+        values = [b"" if v is None else v.encode() for v in values]
+    else:
+        values = [b"" if v is None else bytes(v) for v in values]
+
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    arrays[f"{key}.offsets"] = offsets
+    arrays[f"{key}.data"] = np.frombuffer(b"".join(values), dtype=np.uint8)
+
+
+def _decode(kind, key, data):
+    valid = None
+    if f"{key}.valid" in data:
+        valid = data[f"{key}.valid"].astype(bool).tolist()
+
+    if kind in ("int", "float", "bool"):
+        values = data[f"{key}.values"].tolist()
+        if kind == "bool":
+            values = [bool(v) for v in values]
+    else:
+        offsets = data[f"{key}.offsets"].tolist()
+        blob = data[f"{key}.data"].tobytes()
+        values = [blob[start:end] for start, end in zip(offsets, offsets[1:])]
+        if kind in ("str", "json"):
+            # JSON stays serialised: it goes straight back into a text column
+            values = [v.decode() for v in values]
+
+    if valid is not None:
+        values = [v if ok else None for v, ok in zip(values, valid)]
+    return values
+
+
+def _drop_secondary_indexes(conn):
+    """Drops the archived tables' named indexes and returns them for re-creation."""
+    dropped = []
+    for name in ARCHIVE_TABLES:
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(name)}
+        for index in db.metadata.tables[name].indexes:
+            if index.name in existing:
+                index.drop(conn)
+                dropped.append(index)
+    return dropped
+
+
+def _insert_rows(conn, table, columns):
+    """
+    Inserts {column: [values]} with executemany straight on the driver: at
+    hundreds of thousands of rows, SQLAlchemy's per-row parameter processing
+    costs more than the inserts. Values must already be in their database
+    form (JSON as text, etc.).
+    """
+    keys = list(columns)
+    compiled = table.insert().compile(dialect=conn.dialect, column_keys=keys)
+    if compiled.positional:
+        params = list(zip(*(columns[key] for key in compiled.positiontup)))
+    else:
+        params = [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+    for start in range(0, len(params), IMPORT_BATCH_SIZE):
+        end = start + IMPORT_BATCH_SIZE
+        conn.exec_driver_sql(str(compiled), params[start:end])
+
+
+def _advance_sequences(conn):
+    """
+    Moves PostgreSQL's serial sequences past the imported ids; rows went in
+    with explicit ids, so the next ORM insert would otherwise reuse id 1.
+    SQLite needs nothing: it takes MAX(rowid) + 1.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    for name in ARCHIVE_TABLES:
+        column = db.metadata.tables[name].autoincrement_column
+        if column is None:
+            continue
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{name}', '{column.name}'), "
+            f"COALESCE(MAX({quote(column.name)}), 1), "
+            f"MAX({quote(column.name)}) IS NOT NULL) FROM {quote(name)}"
+        )
+
+
+def read_manifest(path):
+    """The manifest of an archive, or None if `path` isn't one."""
+    import numpy as np
+
+    try:
+        with np.load(path) as data:
+            manifest = json.loads(data["manifest"].tobytes())
+    except (OSError, KeyError, ValueError):
+        return None
+    return manifest if manifest.get("format") == ARCHIVE_FORMAT else None
+
+
+def export_archive(path, with_similarity=True):
+    """
+    Writes the whole catalogue (and, with `with_similarity`, the similarity
+    index for its current version) to `path`, atomically. Returns the manifest.
+    """
+    import numpy as np
+
+    from app.migrations import current_version
+    from app.services.catalogue_version import get_catalogue_version
+
+    t0 = time.perf_counter()
+    arrays, tables = {}, {}
+    with db.engine.connect() as conn:
+        for name in ARCHIVE_TABLES:
+            table = db.metadata.tables[name]
+            rows = conn.execute(
+                select(table).order_by(*table.primary_key.columns)
+            ).all()
+            kinds = {c.name: _column_kind(c) for c in table.columns}
+            for position, (column, kind) in enumerate(kinds.items()):
+                values = [row[position] for row in rows]
+                _encode(kind, values, f"{name}.{column}", arrays)
+            tables[name] = {"rows": len(rows), "columns": kinds}
+
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "created_at": datetime.utcnow().isoformat(),
+        "schema_version": current_version(),
+        "catalogue_version": get_catalogue_version()[0],
+        "tables": tables,
+        "similarity_index": False,
+    }
+    db.session.remove()
+
+    if with_similarity and tables["recipe"]["rows"]:
+        from app.services.similarity_index import get_similarity_index
+
+        index = get_similarity_index()
+        arrays.update(
+            (f"similar.{name}", array) for name, array in index.to_arrays().items()
+        )
+        manifest["similarity_index"] = True
+
+    arrays["manifest"] = np.frombuffer(json.dumps(manifest).encode(), dtype=np.uint8)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            np.savez_compressed(fh, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logging.info(
+        "Exported %s recipes to %s (%.1f MB) in %.1f s",
+        tables["recipe"]["rows"],
+        path,
+        os.path.getsize(path) / 1e6,
+        time.perf_counter() - t0,
+    )
+    return manifest
+
+
+def import_archive(path):
+    """
+    Bulk-loads an archive written by export_archive into a database whose
+    schema is up to date but whose catalogue is empty. Ids are preserved, so
+    the bundled similarity index stays valid. Archives from an older schema
+    have the newer migrations replayed over them, which fills in the columns
+    they derive (kcal, ...). Returns the manifest.
+    """
+    import numpy as np
+
+    from app.migrations import current_version, replay
+    from app.services.catalogue_version import bump_catalogue_version
+    from app.services.similarity_index import SimilarityIndex, index_path_for
+
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ValueError(f"{path} is not a catalogue archive")
+    schema_version = current_version()
+    if manifest["schema_version"] > schema_version:
+        raise ValueError(
+            f"Archive needs schema v{manifest['schema_version']}; "
+            "run `flask db-upgrade` first"
+        )
+
+    for model in (Recipe, Ingredient, Label):
+        if db.session.scalar(select(func.count()).select_from(model)):
+            raise ValueError(
+                "The database already has a catalogue; import needs it empty"
+            )
+    db.session.remove()
+
+    t0 = time.perf_counter()
+    with np.load(path) as data, db.engine.begin() as conn:
+        # Secondary indexes are cheaper to build once at the end than to
+        # maintain row by row
+        indexes = _drop_secondary_indexes(conn)
+
+        for name in ARCHIVE_TABLES:
+            spec = manifest["tables"].get(name)
+            if not spec or not spec["rows"]:
+                continue
+            table = db.metadata.tables[name]
+            missing = set(spec["columns"]) - set(table.columns.keys())
+            if missing:
+                raise ValueError(f"Unknown {name} column(s): {', '.join(missing)}")
+
+            columns = {
+                column: _decode(kind, f"{name}.{column}", data)
+                for column, kind in spec["columns"].items()
+            }
+            _insert_rows(conn, table, columns)
+
+        for index in indexes:
+            index.create(conn)
+        _advance_sequences(conn)
+        if manifest["schema_version"] < schema_version:
+            replay(conn, manifest["schema_version"])
+
+        # Core inserts bypass the ORM hook that versions the catalogue
+        bump_catalogue_version(conn)
+
+        if manifest.get("similarity_index"):
+            index = SimilarityIndex.from_arrays(
+                {
+                    key.removeprefix("similar."): data[key]
+                    for key in data.files
+                    if key.startswith("similar.")
+                }
+            )
+
+    if manifest.get("similarity_index"):
+        # Saved under its export-time version; the first lookup carries it
+        # over to this database's version without re-embedding anything
+        index.save(index_path_for(current_app, db.engine))
+
+    logging.info(
+        "Imported %s recipes from %s in %.1f s",
+        manifest["tables"]["recipe"]["rows"],
+        path,
+        time.perf_counter() - t0,
+    )
+    return manifest
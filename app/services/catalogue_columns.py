@@ -0,0 +1,297 @@
+# app/services/catalogue_columns.py
+
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from itertools import chain
+
+from sqlalchemy import select
+
+from app.models import Ingredient, Recipe, RecipeIngredient, recipe_label
+
+# --- Columnar Catalogue File ---
+# Layout:  MAGIC | u64 header length | JSON header | padding | column data...
+# Every column starts on an ALIGN boundary so NumPy can view it in place. Each
+# worker maps the same file read-only, so the pages live once in the OS page
+# cache however many workers there are. A new catalogue version is written to
+# a temp file and os.replace()d over the old one; workers still holding the
+# old mapping keep reading the old (now unlinked) inode until they remap.
+MAGIC = b"GCATCOL1"
+ALIGN = 64
+
+# Stored in place of NULL kcal/time values
+MISSING = -1
+
+# Flag bits. Only STATIC_FLAGS are stored in the file's `flags` column: the
+# favourite/disliked bits change on every toggle, so they are read separately
+# (load_flags) and keyed on the catalogue's flags_version instead.
+FLAG_FAVOURITE = 1
+FLAG_DISLIKED = 2
+FLAG_DUPLICATE = 4
+STATIC_FLAGS = FLAG_DUPLICATE
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def read_header(path):
+    """Returns the JSON header of a columns file, or None if it isn't one."""
+    try:
+        with open(path, "rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = struct.unpack("<Q", fh.read(8))
+            return json.loads(fh.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _int_pairs(result):
+    """(a, b) integer rows -> (n, 2) int64 array, without per-Row conversion."""
+    import numpy as np
+
+    return np.fromiter(chain.from_iterable(result), dtype=np.int64).reshape(-1, 2)
+
+
+def _build_arrays(conn):
+    import numpy as np
+
+    # 1. Per-recipe scalars, ordered by id so lookups can bisect
+    rows = conn.execute(
+        select(
+            Recipe.id,
+            Recipe.kcal,
+            Recipe.time_minutes,
+            Recipe.category,
+            Recipe.duplicate_of_id,
+        ).order_by(Recipe.id)
+    ).all()
+    n = len(rows)
+
+    categories = sorted({row.category or "Other" for row in rows})
+    category_codes = {name: code for code, name in enumerate(categories)}
+
+    ids = np.fromiter((row.id for row in rows), dtype=np.int32, count=n)
+    kcal = np.fromiter(
+        (MISSING if row.kcal is None else row.kcal for row in rows),
+        dtype=np.int32,
+        count=n,
+    )
+    time_minutes = np.fromiter(
+        (MISSING if row.time_minutes is None else row.time_minutes for row in rows),
+        dtype=np.int32,
+        count=n,
+    )
+    category = np.fromiter(
+        (category_codes[row.category or "Other"] for row in rows),
+        dtype=np.uint8,
+        count=n,
+    )
+    flags = np.fromiter(
+        (0 if row.duplicate_of_id is None else FLAG_DUPLICATE for row in rows),
+        dtype=np.uint8,
+        count=n,
+    )
+
+    # 2. Label bitmasks: bit i of a row <=> header["label_ids"][i]
+    links = _int_pairs(
+        conn.execute(select(recipe_label.c.recipe_id, recipe_label.c.label_id))
+    )
+    label_ids = sorted(set(links[:, 1].tolist()))
+    words = max(1, (len(label_ids) + 63) // 64)
+    label_bits = np.zeros((n, words), dtype=np.uint64)
+    if len(links):
+        rows_at = np.searchsorted(ids, links[:, 0])
+        bits = np.searchsorted(np.array(label_ids, dtype=np.int64), links[:, 1])
+        masks = np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64))
+        np.bitwise_or.at(label_bits, (rows_at, bits // 64), masks)
+
+    # 3. Ingredient incidence in CSR form: recipe i uses
+    #    ingredient_indices[ingredient_indptr[i]:ingredient_indptr[i + 1]]
+    pairs = _int_pairs(
+        conn.execute(
+            select(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id).order_by(
+                RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id
+            )
+        )
+    )
+    counts = np.bincount(np.searchsorted(ids, pairs[:, 0]), minlength=n)
+    ingredient_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=ingredient_indptr[1:])
+    ingredient_indices = pairs[:, 1].astype(np.int32)
+
+    # 4. Ingredient attributes, ordered by id
+    ing_rows = conn.execute(
+        select(Ingredient.id, Ingredient.is_basic).order_by(Ingredient.id)
+    ).all()
+    ingredient_ids = np.array([r.id for r in ing_rows], dtype=np.int32)
+    ingredient_is_basic = np.array([bool(r.is_basic) for r in ing_rows], dtype=np.uint8)
+
+    arrays = {
+        "ids": ids,
+        "kcal": kcal,
+        "time_minutes": time_minutes,
+        "category": category,
+        "flags": flags,
+        "label_bits": label_bits,
+        "ingredient_indptr": ingredient_indptr,
+        "ingredient_indices": ingredient_indices,
+        "ingredient_ids": ingredient_ids,
+        "ingredient_is_basic": ingredient_is_basic,
+    }
+    meta = {"categories": categories, "label_ids": label_ids}
+    return arrays, meta
+
+
+def export_columns(path, version, conn):
+    """
+    Writes the catalogue's planner features to `path` (atomically replacing any
+    previous file). `conn` is a SQLAlchemy connection to read from.
+    """
+    arrays, meta = _build_arrays(conn)
+
+    # Offsets are relative to the start of the data section
+    columns, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        columns[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+
+    header = json.dumps(
+        {
+            "version": version,
+            "n_recipes": len(arrays["ids"]),
+            "columns": columns,
+            **meta,
+        }
+    ).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack("<Q", len(header)))
+            fh.write(header)
+            for name, array in arrays.items():
+                fh.seek(data_start + columns[name]["offset"])
+                fh.write(array.tobytes())
+            # Empty trailing columns still need their bytes to exist for mmap
+            fh.truncate(data_start + offset)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logging.info("Exported catalogue columns v%s to %s", version, path)
+
+
+class CatalogueColumns:
+    """Read-only, zero-copy NumPy views over a mapped columns file."""
+
+    def __init__(self, path):
+        import numpy as np
+
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        end = header_start + length
+        header = json.loads(self._mmap[header_start:end])
+        data_start = _align(end)
+
+        self.path = path
+        self.version = header["version"]
+        self.categories = header["categories"]
+        self.label_ids = header["label_ids"]
+        self.label_bit = {label_id: i for i, label_id in enumerate(self.label_ids)}
+
+        for name, spec in header["columns"].items():
+            shape = tuple(spec["shape"])
+            count = 1
+            for dim in shape:
+                count *= dim
+            view = np.frombuffer(
+                self._mmap,
+                dtype=np.dtype(spec["dtype"]),
+                count=count,
+                offset=data_start + spec["offset"],
+            ).reshape(shape)
+            setattr(self, name, view)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_for(self, recipe_ids):
+        """Row positions for the given recipe ids (-1 where an id is unknown)."""
+        import numpy as np
+
+        wanted = np.asarray(recipe_ids, dtype=np.int32)
+        if not len(self.ids):
+            return np.full(len(wanted), -1)
+        rows = np.searchsorted(self.ids, wanted)
+        rows[rows >= len(self.ids)] = 0
+        return np.where(self.ids[rows] == wanted, rows, -1)
+
+    def ingredients_at(self, row):
+        start = self.ingredient_indptr[row]
+        end = self.ingredient_indptr[row + 1]
+        return self.ingredient_indices[start:end]
+
+
+def load_columns(path, version, conn):
+    """
+    Maps the columns file for `version`, exporting it first if the file on disk
+    is missing or belongs to another catalogue version.
+    """
+    header = read_header(path)
+    if header is None or header["version"] != version:
+        export_columns(path, version, conn)
+
+    columns = CatalogueColumns(path)
+    if columns.version != version:
+        # Another worker swapped in a different version between export and map
+        logging.info(
+            "Catalogue columns at %s are v%s, wanted v%s",
+            path,
+            columns.version,
+            version,
+        )
+    return columns
+
+
+def load_flags(conn, columns):
+    """
+    The full per-row flags for `columns`: the static bits from the file plus
+    the favourite/disliked bits read from the database (two indexed id
+    queries). Returns a private array; the mapped file is left untouched.
+    """
+    import numpy as np
+
+    # Masking also drops user bits left in files exported by older versions
+    flags = columns.flags & STATIC_FLAGS
+    for bit, column in (
+        (FLAG_FAVOURITE, Recipe.is_favourite),
+        (FLAG_DISLIKED, Recipe.is_disliked),
+    ):
+        ids = np.fromiter(
+            conn.execute(select(Recipe.id).where(column.is_(True))).scalars(),
+            dtype=np.int64,
+        )
+        rows = columns.rows_for(ids)
+        flags[rows[rows >= 0]] |= bit
+    return flags
@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 import re
 import time
 from fractions import Fraction
@@ -8,19 +9,44 @@ import requests
 from bs4 import BeautifulSoup
 
 from app.models import Ingredient, Label, Recipe, RecipeIngredient, db, recipe_label
+from app.services.instructions import structure_steps
+from app.services.near_duplicates import (
+    MERGE_THRESHOLD,
+    find_near_duplicates,
+    minhash_signatures,
+    recipe_tokens,
+    store_signatures,
+)
 
 # --- 1. CONFIGURATION (Your Proven Logic) ---
-GET_RECIPES_ENDPOINT = (
-    "https://production-api.gousto.co.uk/cmsreadbroker/v1/recipes?category=recipes"
-)
-GET_RECIPE_INFO_ENDPOINT = (
-    "https://production-api.gousto.co.uk/cmsreadbroker/v1/recipe/"
-)
+# GOUSTO_API_BASE points the scrapers somewhere else, e.g. the local stand-in
+# in scripts/fake_gousto.py; GOUSTO_POLL_DELAY overrides the pause between
+# catalogue pages. Both are read per call since the fetch threads run outside
+# any app context.
+DEFAULT_API_BASE = "https://production-api.gousto.co.uk"
+GET_RECIPES_PATH = "/cmsreadbroker/v1/recipes?category=recipes"
+GET_RECIPE_INFO_PATH = "/cmsreadbroker/v1/recipe/"
 GET_RECIPES_PAGE_LIMIT = 16
 MAX_RECIPES = 96
 POLL_DELAY = 3
 
 
+def api_base():
+    return os.getenv("GOUSTO_API_BASE", DEFAULT_API_BASE).rstrip("/")
+
+
+def recipes_endpoint(offset, limit=GET_RECIPES_PAGE_LIMIT):
+    return f"{api_base()}{GET_RECIPES_PATH}&limit={limit}&offset={offset}"
+
+
+def recipe_info_endpoint(slug):
+    return f"{api_base()}{GET_RECIPE_INFO_PATH}{slug}"
+
+
+def poll_delay():
+    return float(os.getenv("GOUSTO_POLL_DELAY", POLL_DELAY))
+
+
 def clean_label(label_text):
     """Standardises labels: 'Vegetarian recipes' -> 'Vegetarian'"""
     if not label_text:
@@ -29,10 +55,114 @@ def clean_label(label_text):
     return re.sub(r"\brecipes?\b", "", label_text, flags=re.IGNORECASE).strip()
 
 
-def scrape_and_save_recipe(recipe_path, recipe_name, servings):
+def parse_quantity(s: str):
+    """Safe parsing for fractions and mixed numbers ('1 1/2' -> 1.5)."""
+    s = s.strip()
+    try:
+        if " " in s:
+            whole, frac = s.split(" ", 1)
+            return float(int(whole) + Fraction(frac))
+        if "/" in s:
+            return float(Fraction(s))
+        return float(s)
+    except Exception:
+        logging.debug("Failed to parse quantity '%s'", s)
+        return None
+
+
+def parse_recipe_entry(api_data, slug):
+    """
+    Turns a Gousto recipe 'entry' payload into a plain dict of the fields we store.
+    This is pure CPU work (HTML stripping + regex) with no database access, so it
+    can run in its own pipeline stage.
+    """
+    parsed = {
+        "slug": slug,
+        "time_minutes": api_data.get("prep_times", {}).get("for_2")
+        or api_data.get("prep_times", {}).get("for_4"),
+        "image_url": None,
+        "source_url": f"https://www.gousto.co.uk/cookbook/recipes/{slug}",
+    }
+
+    # New Visuals
+    media = api_data.get("media", {})
+    images = media.get("images", [])
+    if images:
+        # We specifically target the 'image' key found in your JSON extract
+        # Attempt to get the 400px wide one (usually index 1)
+        parsed["image_url"] = (
+            images[1].get("image") if len(images) > 1 else images[0].get("image")
+        )
+
+    # Clean Instructions (and split them into steps/sub-steps once, here)
+    raw_instr = api_data.get("cooking_instructions", [])
+    step_texts = [
+        BeautifulSoup(s.get("instruction", ""), "html.parser").get_text(
+            separator=" ", strip=True
+        )
+        for s in raw_instr
+    ]
+    parsed["instructions"] = "\n".join(step_texts)
+    parsed["instruction_steps"] = structure_steps(step_texts)
+    parsed["nutritional_info"] = json.dumps(api_data.get("nutritional_information"))
+
+    # --- SANITISED LABELS ---
+    label_titles = []
+    for cat in api_data.get("categories", []):
+        title = clean_label(cat.get("title"))
+        if title and title.lower() != "all" and title not in label_titles:
+            label_titles.append(title)
+    parsed["labels"] = label_titles
+
+    # --- INGREDIENT PARSING (Regex Logic) ---
+    ingredient_map = {}
+    for item in api_data.get("ingredients", []):
+        name = item.get("name", "N/A").strip()
+        label = item.get("label", "")
+        qty, unit = 1.0, "item"
+
+        # Pattern 1: (Quantity Unit) xMultiplier
+        m1 = re.search(
+            r"\(([\d\s\/\.]+)\s*([a-zA-Z]{1,4})\)(?:\s*x(\d+))?$",
+            label,
+            re.IGNORECASE,
+        )
+        if m1:
+            raw_qty, unit = m1.group(1).strip(), m1.group(2).strip()
+            mult = int(m1.group(3)) if m1.group(3) else 1
+
+            base = parse_quantity(raw_qty)
+            if base is not None:
+                qty = base * mult
+        else:
+            m2 = re.search(r"x(\d+)$", label, re.IGNORECASE)
+            if m2:
+                qty = float(m2.group(1))
+
+        if qty > 0:
+            key = (name, unit)
+            if key in ingredient_map:
+                ingredient_map[key]["quantity"] += qty
+            else:
+                ingredient_map[key] = {"name": name, "quantity": qty, "unit": unit}
+
+    # Skip if the name is empty or just "N/A"
+    parsed["ingredients"] = [
+        ing for ing in ingredient_map.values() if ing["name"] and ing["name"] != "N/A"
+    ]
+    return parsed
+
+
+def scrape_and_save_recipe(recipe_path, recipe_name, servings, listed_names=None):
+    """
+    Upserts one recipe. `listed_names` is the complete listing of this run:
+    only then can a content match whose name is no longer listed be taken for
+    a rename. Without it, or when the match is still listed (a live variant),
+    the recipe is stored separately and linked with duplicate_of_id.
+    """
     clean_path = recipe_path.lstrip("/")
     slug = clean_path.split("/")[-1]
-    api_url = GET_RECIPE_INFO_ENDPOINT + slug
+    api_url = recipe_info_endpoint(slug)
 
     try:
         response = requests.get(api_url)
@@ -41,10 +171,42 @@ def scrape_and_save_recipe(recipe_path, recipe_name, servings):
         if not api_data:
             return
 
+        parsed = parse_recipe_entry(api_data, slug)
+
         # --- DB UPSERT LOGIC (Sequential ID Version) ---
         # Instead of db.session.get(Recipe, id), we filter by name or slug
         recipe = Recipe.query.filter_by(name=recipe_name).first()
 
+        # A new name may still be a renamed/re-published recipe: match on content
+        (signature,) = minhash_signatures(
+            [
+                recipe_tokens(
+                    [ing["name"] for ing in parsed["ingredients"]],
+                    parsed["instructions"],
+                )
+            ]
+        )
+        duplicate_of_id = None
+        if recipe is None and signature is not None:
+            matches = find_near_duplicates(db.session.connection(), signature)
+            original = db.session.get(Recipe, matches[0][0]) if matches else None
+            renamed = (
+                original is not None
+                and matches[0][1] >= MERGE_THRESHOLD
+                and listed_names is not None
+                and original.name not in listed_names
+            )
+            if renamed:
+                logging.info(
+                    "Recipe %r matches unlisted %r; updating it in place",
+                    recipe_name,
+                    original.name,
+                )
+                recipe = original
+                recipe.name = recipe_name
+            elif original is not None:
+                duplicate_of_id = original.id
+
         if recipe:
             # Clear old links for a clean update
             db.session.execute(
@@ -58,7 +220,7 @@ def scrape_and_save_recipe(recipe_path, recipe_name, servings):
             db.session.flush()
         else:
             # Do not provide an id; the DB assigns a sequential ID automatically.
-            recipe = Recipe(name=recipe_name)
+            recipe = Recipe(name=recipe_name, duplicate_of_id=duplicate_of_id)
             db.session.add(recipe)
 
         # IMPORTANT: Flush here so the DB generates the new sequential ID
@@ -67,106 +229,35 @@ def scrape_and_save_recipe(recipe_path, recipe_name, servings):
 
         # --- DATA EXTRACTION ---
         recipe.servings = servings
-        recipe.time_minutes = api_data.get("prep_times", {}).get(
-            "for_2"
-        ) or api_data.get("prep_times", {}).get("for_4")
-
-        # New Visuals
-        media = api_data.get("media", {})
-        images = media.get("images", [])
-        if images:
-            # We specifically target the 'image' key found in your JSON extract
-            # Attempt to get the 400px wide one (usually index 1)
-            recipe.image_url = (
-                images[1].get("image") if len(images) > 1 else images[0].get("image")
-            )
-        recipe.source_url = f"https://www.gousto.co.uk/cookbook/recipes/{slug}"
-
-        # Clean Instructions
-        raw_instr = api_data.get("cooking_instructions", [])
-        recipe.instructions = "\n".join(
-            [
-                BeautifulSoup(s.get("instruction", ""), "html.parser").get_text(
-                    separator=" ", strip=True
-                )
-                for s in raw_instr
-            ]
-        )
-        recipe.nutritional_info = json.dumps(api_data.get("nutritional_information"))
+        recipe.time_minutes = parsed["time_minutes"]
+        if parsed["image_url"]:
+            recipe.image_url = parsed["image_url"]
+        recipe.source_url = parsed["source_url"]
+        recipe.instructions = parsed["instructions"]
+        recipe.instruction_steps = parsed["instruction_steps"]
+        recipe.nutritional_info = parsed["nutritional_info"]
 
         # --- SANITISED LABELS ---
-        for cat in api_data.get("categories", []):
-            title = clean_label(cat.get("title"))
-            if title and title.lower() != "all":
-                lbl = Label.query.filter_by(title=title).first() or Label(title=title)
-                if lbl not in recipe.labels:
-                    recipe.labels.append(lbl)
-
-        # --- INGREDIENT PARSING (Regex Logic) ---
-        ingredient_map = {}
-        for item in api_data.get("ingredients", []):
-            name = item.get("name", "N/A").strip()
-            label = item.get("label", "")
-            qty, unit = 1.0, "item"
-
-            # Pattern 1: (Quantity Unit) xMultiplier
-            m1 = re.search(
-                r"\(([\d\s\/\.]+)\s*([a-zA-Z]{1,4})\)(?:\s*x(\d+))?$",
-                label,
-                re.IGNORECASE,
-            )
-            if m1:
-                raw_qty, unit = m1.group(1).strip(), m1.group(2).strip()
-                mult = int(m1.group(3)) if m1.group(3) else 1
-
-                # Safe parsing for fractions and mixed numbers
-                def parse_quantity(s: str):
-                    s = s.strip()
-                    try:
-                        if " " in s:
-                            whole, frac = s.split(" ", 1)
-                            return float(int(whole) + Fraction(frac))
-                        if "/" in s:
-                            return float(Fraction(s))
-                        return float(s)
-                    except Exception:
-                        logging.debug("Failed to parse quantity '%s'", s)
-                        return None
-
-                base = parse_quantity(raw_qty)
-                if base is not None:
-                    qty = base * mult
-            else:
-                m2 = re.search(r"x(\d+)$", label, re.IGNORECASE)
-                if m2:
-                    qty = float(m2.group(1))
-
-            if qty > 0:
-                key = (name, unit)
-                if key in ingredient_map:
-                    ingredient_map[key]["quantity"] += qty
-                else:
-                    ingredient_map[key] = {"name": name, "quantity": qty, "unit": unit}
+        for title in parsed["labels"]:
+            lbl = Label.query.filter_by(title=title).first() or Label(title=title)
+            if lbl not in recipe.labels:
+                recipe.labels.append(lbl)
 
         # --- LINKING ---
         # Ensure the recipe object has been flushed so it has an ID
         db.session.flush()
 
-        for ing in ingredient_map.values():
-            # 1. Skip if the name is empty or just "N/A"
-            if not ing["name"] or ing["name"] == "N/A":
-                continue
-
-            # 2. Get or Create Ingredient
+        for ing in parsed["ingredients"]:
+            # 1. Get or Create Ingredient
             ing_db = Ingredient.query.filter_by(name=ing["name"]).first()
             if not ing_db:
                 ing_db = Ingredient(name=ing["name"], category="Other")
                 db.session.add(ing_db)
 
-            # 3. Flush to ensure ing_db has an ID before creating the link
+            # 2. Flush to ensure ing_db has an ID before creating the link
             db.session.flush()
 
-            # 4. Final Safety Check: Only link if BOTH IDs are present
+            # 3. Final Safety Check: Only link if BOTH IDs are present
             if recipe.id and ing_db.id:
                 link = RecipeIngredient(
                     recipe_id=recipe.id,  # Use IDs directly for stability
@@ -182,6 +273,8 @@ def scrape_and_save_recipe(recipe_path, recipe_name, servings):
                     getattr(ing_db, "id", None),
                 )
 
+        if signature is not None:
+            store_signatures(db.session.connection(), {recipe.id: signature})
         db.session.commit()
 
     except Exception:
@@ -189,16 +282,16 @@ def scrape_and_save_recipe(recipe_path, recipe_name, servings):
         logging.exception("Error scraping recipe %s", slug)
 
 
-def scrape_all_recipes():
-    """Discovery Loop using proven offset pagination."""
-    total_scraped = 0
+def list_catalogue():
+    """
+    Pages through the listing; returns ([(path, name, servings)], complete).
+    `complete` is False when MAX_RECIPES or an error cut it short.
+    """
+    listed = []
     offset = 0
-    logging.info("--- Starting Full Catalogue Scrape ---")
 
     while True:
-        api_url = (
-            f"{GET_RECIPES_ENDPOINT}&limit={GET_RECIPES_PAGE_LIMIT}&offset={offset}"
-        )
+        api_url = recipes_endpoint(offset)
         logging.info(
             "Fetching page %s (offset=%s)",
             (offset // GET_RECIPES_PAGE_LIMIT) + 1,
@@ -212,31 +305,43 @@ def scrape_all_recipes():
 
             if not entries:
                 logging.info("No more entries found.")
-                break
+                return listed, True
 
             for entry in entries:
                 path, name = entry.get("url"), entry.get("title")
                 serv = entry.get("prep_times", {}).get("for_2", 2)
 
                 if path and name:
-                    logging.info("Processing: %s", name)
-                    scrape_and_save_recipe(path, name, serv)
-                    total_scraped += 1
+                    listed.append((path, name, serv))
 
-                if total_scraped >= MAX_RECIPES:
+                if len(listed) >= MAX_RECIPES:
                     logging.info("Reached limit of %s.", MAX_RECIPES)
-                    return
+                    return listed, False
 
             offset += GET_RECIPES_PAGE_LIMIT
-            time.sleep(POLL_DELAY)
+            time.sleep(poll_delay())
 
         except Exception:
             logging.exception(
                 "Catalogue error while fetching page at offset %s", offset
             )
-            break
+            return listed, False
+
+
+def scrape_all_recipes():
+    """
+    Lists the whole catalogue first, then scrapes it entry by entry, so
+    renamed recipes can be told from live variants (scrape_and_save_recipe).
+    """
+    logging.info("--- Starting Full Catalogue Scrape ---")
+    listed, complete = list_catalogue()
+    listed_names = {name for _, name, _ in listed} if complete else None
+
+    for path, name, serv in listed:
+        logging.info("Processing: %s", name)
+        scrape_and_save_recipe(path, name, serv, listed_names)
 
-    logging.info("--- Finished! Total recipes: %s ---", total_scraped)
+    logging.info("--- Finished! Total recipes: %s ---", len(listed))
 
 
 def run_catalogue_import():
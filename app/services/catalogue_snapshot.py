@@ -0,0 +1,312 @@
+# app/services/catalogue_snapshot.py
+
+import copy
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.models import Ingredient, Label, db
+from app.services.catalogue_columns import (
+    FLAG_DISLIKED,
+    FLAG_FAVOURITE,
+    MISSING,
+    load_columns,
+    load_flags,
+)
+from app.services.catalogue_version import get_catalogue_state
+
+
+class RecipeRecord:
+    """
+    The fields the planner scores on, and nothing else. Labels are a bitmask
+    over the snapshot's label table; `cuisine_mask` drops the noisy labels so
+    affinity scoring is one AND + popcount. Build them with
+    CatalogueSnapshot.records(); load ORM Recipes only for what gets rendered.
+    """
+
+    __slots__ = (
+        "id",
+        "calories",
+        "time_minutes",
+        "category",
+        "is_favourite",
+        "is_disliked",
+        "label_mask",
+        "cuisine_mask",
+        "ingredient_ids",
+        "fresh_ingredient_ids",
+        "label_table",
+    )
+
+    def __init__(
+        self,
+        recipe_id,
+        calories,
+        time_minutes,
+        category,
+        flags,
+        label_mask,
+        cuisine_mask,
+        ingredient_ids,
+        fresh_ingredient_ids,
+        label_table,
+    ):
+        self.id = recipe_id
+        self.calories = calories
+        self.time_minutes = time_minutes
+        self.category = category
+        self.is_favourite = bool(flags & FLAG_FAVOURITE)
+        self.is_disliked = bool(flags & FLAG_DISLIKED)
+        self.label_mask = label_mask
+        self.cuisine_mask = cuisine_mask
+        self.ingredient_ids = ingredient_ids
+        self.fresh_ingredient_ids = fresh_ingredient_ids
+        # Shared (bit -> title) tuple, only used to answer label_titles
+        self.label_table = label_table
+
+    @property
+    def label_titles(self):
+        mask, titles = self.label_mask, []
+        while mask:
+            low = mask & -mask
+            titles.append(self.label_table[low.bit_length() - 1])
+            mask ^= low
+        return titles
+
+    def __repr__(self):
+        return f"<RecipeRecord {self.id}>"
+
+
+class CatalogueSnapshot:
+    """
+    Read-only view of the planner-relevant catalogue data for one catalogue
+    version. Per-recipe scoring features live in a memory-mapped columnar file
+    shared by every worker (see catalogue_columns.py); the small ingredient and
+    label lookup tables are plain dicts. The favourite/disliked flags aren't in
+    the file: `flags` holds them for `flags_version`. Shared by all requests
+    until either version moves on.
+    """
+
+    def __init__(self, version, flags_version=0):
+        self.version = version
+        self.flags_version = flags_version
+        self.built_at = None
+        self.columns = None  # CatalogueColumns (ids, kcal, time, labels, ...)
+        self.flags = None  # per-row FLAG_* bits, favourite/disliked included
+        self.labels = {}  # {label_id: title}
+        self.ingredients = {}  # {ingredient_id: (name, category, is_basic)}
+        self.ingredient_categories = {}  # {lower-case name: category}
+        self.basic_ingredient_ids = frozenset()
+        self.label_table = ()  # label title per bit of RecipeRecord.label_mask
+
+    @classmethod
+    def build(cls, version, columns_path, flags_version=0):
+        snapshot = cls(version, flags_version)
+        conn = db.session.connection()
+
+        # 1. Lookup tables
+        snapshot.labels = dict(conn.execute(select(Label.id, Label.title)).all())
+        for ing_id, name, category, is_basic in conn.execute(
+            select(
+                Ingredient.id, Ingredient.name, Ingredient.category, Ingredient.is_basic
+            )
+        ):
+            snapshot.ingredients[ing_id] = (name, category or "Other", bool(is_basic))
+            snapshot.ingredient_categories[name.lower()] = category or "Other"
+        snapshot.basic_ingredient_ids = frozenset(
+            ing_id
+            for ing_id, (_, _, is_basic) in snapshot.ingredients.items()
+            if is_basic
+        )
+
+        # 2. Per-recipe features: map the shared file, exporting it if stale
+        snapshot.columns = load_columns(columns_path, version, conn)
+        if snapshot.columns.version != version:
+            # Lost a race with another worker; force a rebuild on next access
+            snapshot.version = None
+        snapshot.flags = load_flags(conn, snapshot.columns)
+        snapshot.label_table = tuple(
+            snapshot.labels.get(label_id, "") for label_id in snapshot.columns.label_ids
+        )
+
+        snapshot.built_at = time.time()
+        return snapshot
+
+    def with_flags(self, flags_version):
+        """
+        A copy for a newer flags_version: the columns mapping and lookup tables
+        are shared, only the favourite/disliked flags are re-read. Requests
+        still holding this snapshot keep seeing its flags unchanged.
+        """
+        snapshot = copy.copy(self)
+        snapshot.flags_version = flags_version
+        snapshot.flags = load_flags(db.session.connection(), self.columns)
+        return snapshot
+
+    def label_mask(self, titles):
+        """Bitmask (as used by RecipeRecord.label_mask) of the given titles."""
+        wanted = set(titles)
+        return sum(
+            1 << bit for bit, title in enumerate(self.label_table) if title in wanted
+        )
+
+    def stratified_sample(self, recipe_ids, cap, min_per_stratum, rng):
+        """
+        Draws about `cap` of `recipe_ids` without replacement, stratified by
+        (category, is_favourite). Each stratum gets its proportional share but
+        at least `min_per_stratum`, so small strata (favourites, rare
+        categories) are still represented.
+        Returns (sampled_ids, {id: expansion}), where expansion = stratum size /
+        stratum sample size. Multiplying a pick weight by it undoes the
+        over-sampling of small strata.
+        """
+        import numpy as np
+
+        cols = self.columns
+        ids = np.asarray(recipe_ids, dtype=np.int64)
+        rows = cols.rows_for(ids)
+        known = rows >= 0
+        strata = np.full(len(ids), -1, dtype=np.int64)
+        strata[known] = cols.category[rows[known]].astype(np.int64) * 2 + (
+            self.flags[rows[known]] & FLAG_FAVOURITE
+        )
+
+        sampled, expansion = [], {}
+        for stratum in np.unique(strata).tolist():
+            members = ids[strata == stratum].tolist()
+            share = round(cap * len(members) / len(ids))
+            take = min(len(members), max(share, min_per_stratum))
+            picked = rng.sample(members, take)
+            sampled.extend(picked)
+            factor = len(members) / take
+            expansion.update((recipe_id, factor) for recipe_id in picked)
+        return sampled, expansion
+
+    def records(self, recipe_ids, ignore_labels=()):
+        """
+        RecipeRecords for `recipe_ids`, in the same order; ids the snapshot
+        doesn't know are skipped. `ignore_labels` are left out of cuisine_mask.
+        """
+        cols = self.columns
+        rows = cols.rows_for(list(recipe_ids))
+        rows = rows[rows >= 0]
+        keep_mask = ~self.label_mask(ignore_labels)
+
+        # Convert whole columns at once; per-element NumPy access is slow
+        ids = cols.ids[rows].tolist()
+        kcal = cols.kcal[rows].tolist()
+        minutes = cols.time_minutes[rows].tolist()
+        categories = [cols.categories[c] for c in cols.category[rows].tolist()]
+        flags = self.flags[rows].tolist()
+        label_words = cols.label_bits[rows].tolist()
+        starts = cols.ingredient_indptr[rows].tolist()
+        ends = cols.ingredient_indptr[rows + 1].tolist()
+        indices = cols.ingredient_indices
+        basics = self.basic_ingredient_ids
+
+        records = []
+        for i, recipe_id in enumerate(ids):
+            mask = 0
+            for word_no, word in enumerate(label_words[i]):
+                mask |= word << (64 * word_no)
+            start, end = starts[i], ends[i]
+            ingredient_ids = tuple(indices[start:end].tolist())
+            records.append(
+                RecipeRecord(
+                    recipe_id,
+                    None if kcal[i] == MISSING else kcal[i],
+                    None if minutes[i] == MISSING else minutes[i],
+                    categories[i],
+                    flags[i],
+                    mask,
+                    mask & keep_mask,
+                    ingredient_ids,
+                    frozenset(ingredient_ids) - basics,
+                    self.label_table,
+                )
+            )
+        return records
+
+
+def columns_path_for(app, engine):
+    """One columns file per database, under CATALOGUE_COLUMNS_DIR."""
+    directory = app.config.get("CATALOGUE_COLUMNS_DIR") or os.getenv(
+        "CATALOGUE_COLUMNS_DIR", app.instance_path
+    )
+    digest = hashlib.sha1(str(engine.url).encode()).hexdigest()[:12]
+    return os.path.join(directory, f"catalogue-{digest}.cols")
+
+
+# One snapshot per database (scripts/benchmarks may run several apps at once)
+_snapshots = {}
+_build_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Returns the snapshot for the current catalogue and flags versions. A new
+    catalogue version rebuilds it; a new flags version only refreshes its
+    flags (see CatalogueSnapshot.with_flags). Concurrent callers wait for a
+    single rebuild.
+    """
+    key = str(db.engine.url)
+    version, flags_version, _ = get_catalogue_state()
+    current = _snapshots.get(key)
+    if (
+        current is not None
+        and current.version == version
+        and current.flags_version == flags_version
+    ):
+        return current
+
+    with _build_lock:
+        current = _snapshots.get(key)
+        if current is not None and current.version == version:
+            if current.flags_version != flags_version:
+                t0 = time.perf_counter()
+                current = _snapshots[key] = current.with_flags(flags_version)
+                logging.info(
+                    "Refreshed catalogue flags v%s in %.0f ms",
+                    flags_version,
+                    (time.perf_counter() - t0) * 1000,
+                )
+        else:
+            t0 = time.perf_counter()
+            current = _snapshots[key] = CatalogueSnapshot.build(
+                version, columns_path_for(current_app, db.engine), flags_version
+            )
+            logging.info(
+                "Built catalogue snapshot v%s (%s recipes) in %.0f ms",
+                version,
+                len(current.columns),
+                (time.perf_counter() - t0) * 1000,
+            )
+        return current
+
+
+def warm_snapshot_async(app):
+    """
+    Builds the snapshot (and the similarity index on top of it) on a daemon
+    thread so the first request doesn't.
+    """
+
+    def warm():
+        from app.services.similarity_index import get_similarity_index
+
+        with app.app_context():
+            try:
+                get_similarity_index(get_snapshot())
+            except Exception:
+                # e.g. the schema hasn't been created yet (`flask db-upgrade`)
+                logging.warning("Catalogue snapshot warm-up failed", exc_info=True)
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=warm, name="snapshot-warmup", daemon=True)
+    thread.start()
+    return thread
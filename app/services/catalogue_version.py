@@ -0,0 +1,95 @@
+# app/services/catalogue_version.py
+
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models import CatalogueState, Ingredient, Label, Recipe, RecipeIngredient, db
+
+# Anything that changes what the planner, search or shopping list can return
+CATALOGUE_MODELS = (Recipe, Ingredient, Label, RecipeIngredient)
+
+# Recipe columns toggled from the UI. Changing only these bumps flags_version
+# instead of version, so a favourite doesn't make every worker re-export the
+# catalogue columns (see catalogue_columns.load_flags).
+FLAG_COLUMNS = frozenset({"is_favourite", "is_disliked"})
+
+_state = CatalogueState.__table__
+
+
+def get_catalogue_version():
+    """Returns (version, updated_at) for the current catalogue."""
+    version, _, updated_at = get_catalogue_state()
+    return version, updated_at
+
+
+def get_catalogue_state():
+    """
+    Returns (version, flags_version, updated_at). Anything that depends on the
+    favourite/disliked flags must key on both versions.
+    """
+    row = db.session.execute(
+        select(
+            CatalogueState.version,
+            CatalogueState.flags_version,
+            CatalogueState.updated_at,
+        ).where(CatalogueState.id == 1)
+    ).first()
+    if row is None:
+        return 0, 0, None
+    return row.version, row.flags_version, row.updated_at
+
+
+def bump_catalogue_version(connection=None):
+    """
+    Marks the catalogue as changed. ORM writes do this automatically; call it
+    after bulk Core inserts/updates that bypass the session's unit of work.
+    """
+    connection = connection or db.session.connection()
+    result = connection.execute(
+        _state.update()
+        .where(_state.c.id == 1)
+        .values(version=_state.c.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            _state.insert().values(id=1, version=1, updated_at=datetime.utcnow())
+        )
+
+
+def bump_flags_version(connection=None):
+    """Marks the favourite/disliked flags (and nothing else) as changed."""
+    connection = connection or db.session.connection()
+    result = connection.execute(
+        _state.update()
+        .where(_state.c.id == 1)
+        .values(flags_version=_state.c.flags_version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        bump_catalogue_version(connection)
+
+
+def _flags_only(obj):
+    # Attribute history is still intact in after_flush
+    if not isinstance(obj, Recipe):
+        return False
+    changed = {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+    return bool(changed) and changed <= FLAG_COLUMNS
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_catalogue_change(session, flush_context):
+    added_or_deleted = any(
+        isinstance(obj, CATALOGUE_MODELS) for obj in chain(session.new, session.deleted)
+    )
+    dirty = [obj for obj in session.dirty if isinstance(obj, CATALOGUE_MODELS)]
+    if not (added_or_deleted or dirty):
+        return
+    # Same connection/transaction as the flush, so it commits or rolls back
+    # together with the change itself
+    if not added_or_deleted and all(_flags_only(obj) for obj in dirty):
+        bump_flags_version(session.connection())
+    else:
+        bump_catalogue_version(session.connection())
@@ -1,6 +1,9 @@
 # app/services/classifier.py
 import logging
 
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
 from app.models import Recipe, RecipeIngredient, db
 
 # Define our search terms
@@ -40,51 +43,93 @@ MEAT_MAP = {
 # Ingredients to ignore when categorising
 DECEPTIVE_INGREDIENTS = ["stock", "cube", "mix", "gravy", "flavouring", "bouillon"]
 
+# Recipes per transaction when re-classifying the whole catalogue
+CLASSIFY_BATCH_SIZE = 200
+
+
+def categorise_recipe(label_titles, ingredient_names):
+    """
+    Picks a category from a recipe's label titles and ingredient names.
+    Pure function so the ingest pipeline can classify before anything is saved.
+    """
+    assigned_category = "Other"
+
+    # 1. Label Check (Vegetarian/Vegan)
+    label_titles = [title.lower() for title in label_titles]
+    if any(v in label_titles for v in ["vegetarian", "vegan", "meat free"]):
+        assigned_category = "Vegetarian"
+
+    # 2: If not veggie, check for specific meat labels first
+    elif any("chicken" in t for t in label_titles):
+        assigned_category = "Chicken"
+    elif any("beef" in t for t in label_titles):
+        assigned_category = "Beef"
+    elif any("pork" in t for t in label_titles):
+        assigned_category = "Pork"
+    elif any("fish" in t for t in label_titles):
+        assigned_category = "Fish"
+
+    # 3. If still Other, check for meat keywords in ingredients
+    if assigned_category == "Other":
+        # Filter out stock, cubes, etc.
+        combined_text = " ".join(
+            name.lower()
+            for name in ingredient_names
+            if not any(d in name.lower() for d in DECEPTIVE_INGREDIENTS)
+        )
+
+        # Check against your MEAT_MAP
+        for category, keywords in MEAT_MAP.items():
+            if any(k in combined_text for k in keywords):
+                assigned_category = category
+                break
+
+    return assigned_category
+
+
+def classify_all_recipes(progress=None, stop=None, batch_size=CLASSIFY_BATCH_SIZE):
+    """
+    Re-derives every recipe's category. Commits every `batch_size` recipes so a
+    run against the live database never holds the write lock for long.
+    Returns the number of recipes classified.
+    """
+    recipe_ids = db.session.scalars(select(Recipe.id).order_by(Recipe.id)).all()
+    total = len(recipe_ids)
+    logging.info("Classifying %s recipes", total)
+
+    done = 0
+    for start in range(0, total, batch_size):
+        if stop is not None and stop.is_set():
+            break
+
+        end = start + batch_size
+        batch_ids = recipe_ids[start:end]
+        recipes = db.session.scalars(
+            select(Recipe)
+            .where(Recipe.id.in_(batch_ids))
+            .options(selectinload(Recipe.labels))
+        ).all()
+
+        for recipe in recipes:
+            # Explicitly query the link table for this recipe's ingredients.
+            # A generator keeps the query lazy: it only runs if labels don't decide.
+            ingredient_names = (
+                link.ingredient.name
+                for link in RecipeIngredient.query.filter_by(recipe_id=recipe.id)
+            )
+            assigned_category = categorise_recipe(
+                [label.title for label in recipe.labels], ingredient_names
+            )
+
+            recipe.category = assigned_category
+            logging.debug(
+                "%s: %s -> %s", recipe.id, recipe.name[:25], assigned_category
+            )
+
+        db.session.commit()
+        done += len(recipes)
+        if progress:
+            progress({"step": "recipes", "done": done, "total": total})
 
-def classify_all_recipes():
-    recipes = Recipe.query.all()
-    logging.info("Classifying %s recipes", len(recipes))
-
-    for recipe in recipes:
-        assigned_category = "Other"
-
-        # 1. Label Check (Vegetarian/Vegan)
-        label_titles = [label.title.lower() for label in recipe.labels]
-        if any(v in label_titles for v in ["vegetarian", "vegan", "meat free"]):
-            assigned_category = "Vegetarian"
-
-        # 2: If not veggie, check for specific meat labels first
-        elif any("chicken" in t for t in label_titles):
-            assigned_category = "Chicken"
-        elif any("beef" in t for t in label_titles):
-            assigned_category = "Beef"
-        elif any("pork" in t for t in label_titles):
-            assigned_category = "Pork"
-        elif any("fish" in t for t in label_titles):
-            assigned_category = "Fish"
-
-        # 3. If still Other, check for meat keywords in ingredients
-        if assigned_category == "Other":
-            # Explicitly query the link table for this recipe's ingredients
-            links = RecipeIngredient.query.filter_by(recipe_id=recipe.id).all()
-
-            ingredient_names = []
-            for link in links:
-                name = link.ingredient.name.lower()
-                # Filter out stock, cubes, etc.
-                if not any(d in name for d in DECEPTIVE_INGREDIENTS):
-                    ingredient_names.append(name)
-
-            combined_text = " ".join(ingredient_names)
-
-            # Check against your MEAT_MAP
-            for category, keywords in MEAT_MAP.items():
-                if any(k in combined_text for k in keywords):
-                    assigned_category = category
-                    break
-
-        recipe.category = assigned_category
-        logging.debug("%s: %s -> %s", recipe.id, recipe.name[:25], assigned_category)
-
-    db.session.commit()
     logging.info("Classification complete")
+    return done
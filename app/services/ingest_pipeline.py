@@ -0,0 +1,673 @@
+# app/services/ingest_pipeline.py
+
+import functools
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import insert, select
+from urllib3.util.retry import Retry
+
+from app.models import Ingredient, Label, Recipe, RecipeIngredient, db, recipe_label
+from app.services.catalogue_scraper import (
+    GET_RECIPES_PAGE_LIMIT,
+    MAX_RECIPES,
+    parse_recipe_entry,
+    poll_delay,
+    recipe_info_endpoint,
+    recipes_endpoint,
+)
+from app.services.classifier import categorise_recipe
+from app.services.ingredient_classifier import categorise_ingredient
+from app.services.near_duplicates import (
+    FLAG_THRESHOLD,
+    MERGE_THRESHOLD,
+    find_near_duplicates,
+    minhash_signatures,
+    recipe_tokens,
+    similarity,
+    store_signatures,
+)
+
+# --- Pipeline Configuration ---
+# Every stage talks to the next through a bounded queue, so a slow stage applies
+# back-pressure upstream instead of letting parsed recipes pile up in memory.
+QUEUE_SIZE = 32
+FETCH_WORKERS = 4
+PARSE_WORKERS = 2
+WRITE_BATCH_SIZE = 25
+REPORT_INTERVAL = 5.0
+REQUEST_TIMEOUT = 30
+
+# Transient API failures (connection resets, 429/5xx) are retried with
+# exponential backoff before the recipe is counted as a fetch error
+FETCH_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Marks the end of a stream; one is sent per downstream worker.
+_DONE = object()
+
+
+class StageStats:
+    """Thread-safe counters for one pipeline stage."""
+
+    def __init__(self, name, workers=1, inbox=None):
+        self.name = name
+        self.workers = workers
+        self.inbox = inbox
+        self.processed = 0
+        self.errors = 0
+        self.retries = 0
+        self.busy_seconds = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, seconds, count=1, ok=True):
+        with self._lock:
+            self.busy_seconds += seconds
+            if ok:
+                self.processed += count
+            else:
+                self.errors += count
+
+    def record_retries(self, count):
+        if count:
+            with self._lock:
+                self.retries += count
+
+    def as_dict(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        with self._lock:
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "processed": self.processed,
+                "errors": self.errors,
+                "retries": self.retries,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "items_per_sec": round(self.processed / elapsed, 2),
+                # Share of the stage's worker time spent doing work (not waiting).
+                # The stage closest to 1.0 is the bottleneck.
+                "utilisation": round(self.busy_seconds / (elapsed * self.workers), 3),
+                "queue_depth": self.inbox.qsize() if self.inbox else 0,
+                "queue_capacity": self.inbox.maxsize if self.inbox else 0,
+            }
+
+
+def _put(q, item, stop):
+    """Blocking put that gives up if the pipeline is being torn down."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class _Stage:
+    """
+    Runs `func` over every item of `inbox` on `workers` threads and forwards
+    non-None results to `outbox`. When the last worker sees the end of the
+    stream it closes `outbox` for each of the downstream workers.
+    """
+
+    def __init__(self, name, func, inbox, outbox, stop, workers=1):
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.stats = StageStats(name, workers, inbox)
+        self.downstream_workers = 1
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"ingest-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = _get(self.inbox, self.stop)
+            if item is _DONE:
+                break
+
+            t0 = time.perf_counter()
+            try:
+                result = self.func(item)
+                self.stats.record(time.perf_counter() - t0)
+            except Exception:
+                logging.exception("Ingest stage '%s' failed", self.stats.name)
+                self.stats.record(time.perf_counter() - t0, ok=False)
+                continue
+
+            if result is not None and not _put(self.outbox, result, self.stop):
+                break
+
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            for _ in range(self.downstream_workers):
+                _put(self.outbox, _DONE, self.stop)
+
+
+# --- Stage Functions ---
+
+_http = threading.local()
+
+
+def _session():
+    # requests.Session is not thread-safe, so each fetch worker keeps its own
+    # (and reuses its connection pool across recipes).
+    if not hasattr(_http, "session"):
+        retry = Retry(
+            total=FETCH_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            # Hand back the last error response so its retries can be counted
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(max_retries=retry))
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        _http.session = session
+    return _http.session
+
+
+def _get_json(url, stats=None):
+    """GETs `url` (with retries) and returns the decoded body."""
+    try:
+        response = _session().get(url, timeout=REQUEST_TIMEOUT)
+    except requests.ConnectionError:
+        # Only raised once every retry has failed
+        if stats is not None:
+            stats.record_retries(FETCH_RETRIES)
+        raise
+
+    retries = getattr(response.raw, "retries", None)
+    if stats is not None and retries is not None:
+        stats.record_retries(len(retries.history))
+    response.raise_for_status()
+    return response.json()
+
+
+def discover_entries(limit=MAX_RECIPES, stop=None, stats=None):
+    """Yields (path, name, servings) for each catalogue entry, page by page."""
+    offset = 0
+    found = 0
+
+    while stop is None or not stop.is_set():
+        logging.info(
+            "Fetching page %s (offset=%s)",
+            (offset // GET_RECIPES_PAGE_LIMIT) + 1,
+            offset,
+        )
+        api_data = _get_json(recipes_endpoint(offset), stats)
+        entries = api_data.get("data", {}).get("entries", [])
+
+        if not entries:
+            logging.info("No more entries found.")
+            return
+
+        for entry in entries:
+            path, name = entry.get("url"), entry.get("title")
+            serv = entry.get("prep_times", {}).get("for_2", 2)
+
+            if path and name:
+                yield path, name, serv
+                found += 1
+
+            if limit and found >= limit:
+                logging.info("Reached limit of %s.", limit)
+                return
+
+        offset += GET_RECIPES_PAGE_LIMIT
+        time.sleep(poll_delay())
+
+
+def fetch_entry(entry, stats=None):
+    path, name, servings = entry
+    slug = path.lstrip("/").split("/")[-1]
+
+    api_data = _get_json(recipe_info_endpoint(slug), stats)
+    api_data = api_data.get("data", {}).get("entry", {})
+    if not api_data:
+        logging.warning("No recipe entry returned for %s", slug)
+        return None
+
+    return {"name": name, "servings": servings, "slug": slug, "api_data": api_data}
+
+
+def parse_fetched(fetched):
+    parsed = parse_recipe_entry(fetched["api_data"], fetched["slug"])
+    parsed["name"] = fetched["name"]
+    parsed["servings"] = fetched["servings"]
+    return parsed
+
+
+def classify_parsed(parsed):
+    parsed["category"] = categorise_recipe(
+        parsed["labels"], [ing["name"] for ing in parsed["ingredients"]]
+    )
+    for ing in parsed["ingredients"]:
+        ing["category"] = categorise_ingredient(ing["name"])
+    return parsed
+
+
+class Listing:
+    """
+    The recipe names the source has listed so far this run. `complete` is set
+    once it has listed everything (not when cut short by a limit, a cancel or
+    an error). A stored recipe can only have been renamed if its name is
+    missing from a complete listing.
+    """
+
+    def __init__(self):
+        self.names = set()
+        self.complete = False
+
+
+class RecipeWriter:
+    """
+    Upserts parsed recipes in batches. Label and ingredient ids are cached by
+    name so a batch costs a handful of statements rather than one per link.
+    Recipes that may be renames of stored ones wait in `deferred` until the
+    `listing` is complete (see _match_renamed). Must be used inside an app
+    context.
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, listing=None):
+        self.batch_size = batch_size
+        self.listing = listing
+        self.written = 0
+        self.deferred = []
+        self.label_ids = dict(db.session.execute(select(Label.title, Label.id)).all())
+        self.ingredient_ids = dict(
+            db.session.execute(select(Ingredient.name, Ingredient.id)).all()
+        )
+
+    def write_batch(self, batch):
+        """
+        Writes a batch in one transaction, retrying row-by-row on failure.
+        Returns how many recipes were written; deferred ones aren't counted.
+        """
+        try:
+            return self._write(batch)
+        except Exception:
+            db.session.rollback()
+            logging.exception("Batch write failed; retrying recipes one by one")
+            written = 0
+            for parsed in batch:
+                try:
+                    written += self._write([parsed])
+                except Exception:
+                    db.session.rollback()
+                    logging.exception("Error writing recipe %s", parsed["slug"])
+            return written
+
+    def _write(self, batch):
+        new_labels, new_ingredients = [], []
+        try:
+            deferred = self._upsert(batch, new_labels, new_ingredients)
+            db.session.commit()
+        except Exception:
+            # Ids handed out inside the failed transaction no longer exist.
+            for title in new_labels:
+                self.label_ids.pop(title, None)
+            for name in new_ingredients:
+                self.ingredient_ids.pop(name, None)
+            raise
+        self.deferred.extend(deferred)
+        written = len(batch) - len(deferred)
+        self.written += written
+        return written
+
+    def _upsert(self, batch, new_labels, new_ingredients):
+        """Writes `batch` in the session; returns the recipes it deferred."""
+        names = [parsed["name"] for parsed in batch]
+        existing = {
+            r.name: r
+            for r in db.session.scalars(select(Recipe).where(Recipe.name.in_(names)))
+        }
+        signatures = minhash_signatures(
+            [
+                recipe_tokens(
+                    [ing["name"] for ing in parsed["ingredients"]],
+                    parsed["instructions"],
+                )
+                for parsed in batch
+            ]
+        )
+        duplicate_of, deferred = self._match_renamed(batch, signatures, existing)
+        if deferred:
+            keep = [k for k in range(len(batch)) if k not in deferred]
+            position = {k: i for i, k in enumerate(keep)}
+            duplicate_of = {position[k]: v for k, v in duplicate_of.items()}
+            deferred = [batch[k] for k in sorted(deferred)]
+            batch = [batch[k] for k in keep]
+            signatures = [signatures[k] for k in keep]
+
+        # Clear old links for a clean update
+        if existing:
+            existing_ids = [r.id for r in existing.values()]
+            db.session.execute(
+                RecipeIngredient.__table__.delete().where(
+                    RecipeIngredient.recipe_id.in_(existing_ids)
+                )
+            )
+            db.session.execute(
+                recipe_label.delete().where(recipe_label.c.recipe_id.in_(existing_ids))
+            )
+
+        recipes = []
+        for parsed in batch:
+            recipe = existing.get(parsed["name"])
+            if recipe is None:
+                recipe = Recipe(name=parsed["name"])
+                db.session.add(recipe)
+
+            # Differs only when a renamed recipe is merged into its original
+            recipe.name = parsed["name"]
+            recipe.servings = parsed["servings"]
+            recipe.time_minutes = parsed["time_minutes"]
+            if parsed["image_url"]:
+                recipe.image_url = parsed["image_url"]
+            recipe.source_url = parsed["source_url"]
+            recipe.instructions = parsed["instructions"]
+            recipe.instruction_steps = parsed["instruction_steps"]
+            recipe.nutritional_info = parsed["nutritional_info"]
+            recipe.category = parsed["category"]
+            recipes.append(recipe)
+
+        # Create any labels/ingredients we have not seen before
+        for parsed in batch:
+            for title in parsed["labels"]:
+                if title not in self.label_ids:
+                    label = Label(title=title)
+                    db.session.add(label)
+                    db.session.flush()
+                    self.label_ids[title] = label.id
+                    new_labels.append(title)
+
+            for ing in parsed["ingredients"]:
+                if ing["name"] not in self.ingredient_ids:
+                    ingredient = Ingredient(name=ing["name"], category=ing["category"])
+                    db.session.add(ingredient)
+                    db.session.flush()
+                    self.ingredient_ids[ing["name"]] = ingredient.id
+                    new_ingredients.append(ing["name"])
+
+        # Flush so new recipes get their sequential ids before linking
+        db.session.flush()
+        new_ids = {r.id for r in recipes} - {r.id for r in existing.values()}
+
+        # Flag near-duplicates (of stored recipes, or of an earlier recipe in
+        # this batch) and keep the signatures for future lookups
+        stored, originals = {}, {}
+        for k, (recipe, signature) in enumerate(zip(recipes, signatures)):
+            if signature is None:
+                continue
+            if k in duplicate_of:
+                recipe.duplicate_of_id = duplicate_of[k]
+            elif recipe.id in new_ids:
+                for other_id, other in originals.items():
+                    if similarity(signature, other) >= FLAG_THRESHOLD:
+                        recipe.duplicate_of_id = other_id
+                        break
+            stored[recipe.id] = signature
+            if recipe.duplicate_of_id is None:
+                originals[recipe.id] = signature
+        store_signatures(db.session.connection(), stored)
+
+        label_rows, ingredient_rows = [], []
+        for recipe, parsed in zip(recipes, batch):
+            for title in parsed["labels"]:
+                label_rows.append(
+                    {"recipe_id": recipe.id, "label_id": self.label_ids[title]}
+                )
+
+            linked = set()
+            for ing in parsed["ingredients"]:
+                ingredient_id = self.ingredient_ids[ing["name"]]
+                # Same ingredient listed in two units: keep the first link only
+                if ingredient_id in linked:
+                    logging.debug(
+                        "Duplicate ingredient %s in %s", ing["name"], parsed["slug"]
+                    )
+                    continue
+                linked.add(ingredient_id)
+                ingredient_rows.append(
+                    {
+                        "recipe_id": recipe.id,
+                        "ingredient_id": ingredient_id,
+                        "quantity": ing["quantity"],
+                        "unit": ing["unit"],
+                    }
+                )
+
+        if label_rows:
+            db.session.execute(recipe_label.insert(), label_rows)
+        if ingredient_rows:
+            db.session.execute(insert(RecipeIngredient.__table__), ingredient_rows)
+        return deferred
+
+    def _match_renamed(self, batch, signatures, existing):
+        """
+        Looks up recipes whose name is new by content instead. A near-copy
+        (MERGE_THRESHOLD) of a stored recipe whose own name is gone from the
+        complete listing is a rename: it's added to `existing` so it updates
+        that recipe, keeping its id, favourite flag and plan history. If the
+        stored name is still listed, both are live variants and the new one is
+        linked to it like a close match (FLAG_THRESHOLD), by mapping its batch
+        index to the original's id. While the listing is incomplete a possible
+        rename can't be told apart, so its index is deferred.
+        Returns (duplicate_of, deferred indices).
+        """
+        conn = db.session.connection()
+        claimed = {r.id for r in existing.values()}
+        duplicate_of, deferred = {}, set()
+        for k, (parsed, signature) in enumerate(zip(batch, signatures)):
+            if signature is None or parsed["name"] in existing:
+                continue
+            matches = find_near_duplicates(conn, signature, exclude_ids=claimed)
+            if not matches:
+                continue
+
+            original_id, score = matches[0]
+            if score < MERGE_THRESHOLD:
+                duplicate_of[k] = original_id
+                continue
+
+            recipe = db.session.get(Recipe, original_id)
+            listing = self.listing
+            if listing is None or recipe.name in listing.names:
+                duplicate_of[k] = original_id
+            elif not listing.complete:
+                deferred.add(k)
+            else:
+                logging.info(
+                    "Recipe %r matches unlisted %r (%.2f); updating it in place",
+                    parsed["name"],
+                    recipe.name,
+                    score,
+                )
+                existing[parsed["name"]] = recipe
+                claimed.add(original_id)
+        return duplicate_of, deferred
+
+
+def _log_stats(all_stats):
+    for stats in all_stats:
+        d = stats.as_dict()
+        logging.info(
+            "[ingest] %-8s done=%-5s err=%-3s retry=%-3s %7.2f/s util=%5.1f%% "
+            "queue=%s/%s",
+            d["stage"],
+            d["processed"],
+            d["errors"],
+            d["retries"],
+            d["items_per_sec"],
+            d["utilisation"] * 100,
+            d["queue_depth"],
+            d["queue_capacity"],
+        )
+
+
+def run_ingest_pipeline(
+    limit=MAX_RECIPES,
+    entries=None,
+    fetch_workers=FETCH_WORKERS,
+    parse_workers=PARSE_WORKERS,
+    batch_size=WRITE_BATCH_SIZE,
+    queue_size=QUEUE_SIZE,
+    report_interval=REPORT_INTERVAL,
+    progress=None,
+    stop=None,
+):
+    """
+    Streams the catalogue through discover -> fetch -> parse -> classify -> write.
+
+    The network, CPU and database stages run concurrently with bounded queues
+    between them, so memory stays flat however big the catalogue is. The write
+    stage runs on the calling thread (which must hold an app context).
+
+    `entries` overrides discovery with an iterable of (path, name, servings).
+    `progress` is called with the stats report after every committed batch.
+    Setting the `stop` event cancels the run; the recipes already gathered
+    into the pending batch are written first. Recipes that may be renames of
+    stored ones are written last, once the listing is complete (see
+    RecipeWriter._match_renamed), and skipped when it never is.
+    Returns the final stats report.
+    """
+    # Internal teardown signal, kept apart from the caller's cancel event
+    halt = threading.Event()
+    started = time.perf_counter()
+
+    entry_q = queue.Queue(maxsize=queue_size)
+    fetched_q = queue.Queue(maxsize=queue_size)
+    parsed_q = queue.Queue(maxsize=queue_size)
+    write_q = queue.Queue(maxsize=queue_size)
+
+    fetch = _Stage("fetch", fetch_entry, entry_q, fetched_q, halt, fetch_workers)
+    parse = _Stage("parse", parse_fetched, fetched_q, parsed_q, halt, parse_workers)
+    classify = _Stage("classify", classify_parsed, parsed_q, write_q, halt)
+    fetch.func = functools.partial(fetch_entry, stats=fetch.stats)
+    fetch.downstream_workers = parse_workers
+    stages = [fetch, parse, classify]
+
+    discover_stats = StageStats("discover")
+    write_stats = StageStats("write", inbox=write_q)
+    all_stats = [discover_stats] + [s.stats for s in stages] + [write_stats]
+
+    def discover():
+        source = entries
+        if source is None:
+            source = discover_entries(limit, halt, discover_stats)
+        try:
+            t0 = time.perf_counter()
+            for entry in source:
+                discover_stats.record(time.perf_counter() - t0)
+                listing.names.add(entry[1])
+                if not _put(entry_q, entry, halt):
+                    return
+                t0 = time.perf_counter()
+            # Discovery stopping at `limit` may have left names unlisted
+            listing.complete = (
+                entries is not None or not limit or len(listing.names) < limit
+            )
+        except Exception:
+            logging.exception("Catalogue discovery failed")
+            discover_stats.record(0.0, ok=False)
+        finally:
+            for _ in range(fetch_workers):
+                _put(entry_q, _DONE, halt)
+
+    def report():
+        return {
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+            "recipes_written": writer.written,
+            "stages": [stats.as_dict() for stats in all_stats],
+        }
+
+    def monitor():
+        while not finished.wait(report_interval):
+            _log_stats(all_stats)
+
+    logging.info("--- Starting Streaming Catalogue Ingest ---")
+    listing = Listing()
+    writer = RecipeWriter(batch_size, listing)
+    finished = threading.Event()
+
+    threading.Thread(target=discover, name="ingest-discover", daemon=True).start()
+    for stage in stages:
+        stage.start()
+    threading.Thread(target=monitor, name="ingest-monitor", daemon=True).start()
+
+    def flush(batch):
+        t0 = time.perf_counter()
+        held = len(writer.deferred)
+        written = writer.write_batch(batch)
+        failed = len(batch) - written - (len(writer.deferred) - held)
+        write_stats.record(time.perf_counter() - t0, count=written)
+        if failed:
+            write_stats.record(0.0, count=failed, ok=False)
+        if progress:
+            progress(report())
+
+    try:
+        batch = []
+        while True:
+            item = _get(write_q, halt)
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (item is _DONE or len(batch) >= batch_size):
+                flush(batch)
+                batch = []
+            if item is _DONE:
+                break
+            if stop is not None and stop.is_set():
+                # Recipes already parsed and classified are kept
+                if batch:
+                    flush(batch)
+                logging.info("Ingest cancelled")
+                break
+
+        # Possible renames held back until the whole listing was known
+        deferred, writer.deferred = writer.deferred, []
+        if deferred and listing.complete:
+            for start in range(0, len(deferred), batch_size):
+                end = start + batch_size
+                flush(deferred[start:end])
+        elif deferred:
+            logging.warning(
+                "Listing incomplete; left %s possibly renamed recipe(s) for the "
+                "next full run",
+                len(deferred),
+            )
+    finally:
+        # Unblocks any upstream stage still waiting on a full queue
+        halt.set()
+        finished.set()
+
+    _log_stats(all_stats)
+    logging.info("--- Finished! Total recipes: %s ---", writer.written)
+    return report()
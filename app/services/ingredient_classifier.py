@@ -133,6 +133,26 @@ SMART_MAP = {
 }
 
 
+def categorise_ingredient(name):
+    """Maps a single ingredient name to a shopping-list category."""
+    name_low = name.lower()
+
+    # 1. Primary Keyword Search
+    for category, keywords in SMART_MAP.items():
+        if any(k in name_low for k in keywords):
+            return category
+
+    # 2. Heuristic Fallbacks (The "Smart" part)
+    if any(x in name_low for x in ["mix", "blend", "dried", "jar"]):
+        return "Pantry"
+    elif any(x in name_low for x in ["clove", "root", "leaf", "stalk"]):
+        return "Veg"
+    elif "stock" in name_low:
+        return "Pantry"
+
+    return "Other"
+
+
 def classify_ingredients():
     """
     Categorises ingredients based on keywords.
@@ -142,25 +162,7 @@ def classify_ingredients():
     updated_count = 0
 
     for ing in ingredients:
-        name_low = ing.name.lower()
-        new_category = "Other"
-
-        # 1. Primary Keyword Search
-        found = False
-        for category, keywords in SMART_MAP.items():
-            if any(k in name_low for k in keywords):
-                new_category = category
-                found = True
-                break
-
-        # 2. Heuristic Fallbacks (The "Smart" part)
-        if not found:
-            if any(x in name_low for x in ["mix", "blend", "dried", "jar"]):
-                new_category = "Pantry"
-            elif any(x in name_low for x in ["clove", "root", "leaf", "stalk"]):
-                new_category = "Veg"
-            elif "stock" in name_low:
-                new_category = "Pantry"
+        new_category = categorise_ingredient(ing.name)
 
         # 3. Apply only if the category has changed or was 'Other'
         if ing.category != new_category:
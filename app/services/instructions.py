@@ -0,0 +1,65 @@
+# app/services/instructions.py
+
+import json
+import logging
+import re
+from typing import List
+
+from sqlalchemy import text
+
+# A new sub-step starts where a capital letter follows lowercase/digit/bracket,
+# e.g. "Boil the kettle.Chop the onion" -> ["Boil the kettle.", "Chop the onion"]
+SUBSTEP_PATTERN = re.compile(r"(?<=[a-z0-9\]\)])\s*(?=[A-Z])")
+
+# Rows per batch when (re)building steps for the whole catalogue
+BACKFILL_BATCH_SIZE = 500
+
+
+def split_substeps(step: str) -> List[str]:
+    return [s.strip() for s in SUBSTEP_PATTERN.split(step) if s.strip()]
+
+
+def structure_steps(steps: List[str]) -> List[List[str]]:
+    """Turns a list of step texts into [[sub-step, ...], ...], dropping blanks."""
+    return [split_substeps(step) for step in steps if step and step.strip()]
+
+
+def structure_instructions(instructions: str) -> List[List[str]]:
+    """Same as structure_steps, for the newline-joined `Recipe.instructions`."""
+    if not instructions:
+        return []
+    return structure_steps(instructions.splitlines())
+
+
+def backfill_instruction_steps(conn, only_missing=True, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Derives `instruction_steps` from `instructions` for existing recipes.
+    Walks the table by id in fixed-size batches so memory stays flat.
+    Returns the number of rows updated.
+    """
+    where = "AND instruction_steps IS NULL" if only_missing else ""
+    last_id, updated = 0, 0
+
+    while True:
+        rows = conn.execute(
+            text(
+                f"SELECT id, instructions FROM recipe WHERE id > :last {where} "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last": last_id, "limit": batch_size},
+        ).all()
+        if not rows:
+            break
+
+        conn.execute(
+            text("UPDATE recipe SET instruction_steps = :steps WHERE id = :id"),
+            [
+                {"id": rid, "steps": json.dumps(structure_instructions(instructions))}
+                for rid, instructions in rows
+            ],
+        )
+        updated += len(rows)
+        last_id = rows[-1][0]
+        logging.info("Structured instructions for %s recipes", updated)
+
+    return updated
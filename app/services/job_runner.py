@@ -0,0 +1,234 @@
+# app/services/job_runner.py
+
+import hmac
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# How many finished jobs we remember for the status endpoint
+MAX_JOB_HISTORY = 50
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Starting or cancelling a job needs `X-Jobs-Token: <JOBS_TOKEN>`. Without a
+# JOBS_TOKEN configured nobody can, so a public deployment can't be made to
+# run a full import against the Gousto API (the scripts call the jobs directly).
+JOBS_TOKEN_HEADER = "X-Jobs-Token"
+
+
+class Job:
+    """One background run of an import/reclassify/reindex/dedupe task."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, params=None):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.stop = threading.Event()
+        # Bumped on every change so SSE listeners know when to push an update
+        self.revision = 0
+        self.changed = threading.Condition()
+
+    def update(self, **fields):
+        with self.changed:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.revision += 1
+            self.changed.notify_all()
+
+    def report_progress(self, progress):
+        self.update(progress=progress)
+
+    @property
+    def is_active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+# --- Job Implementations ---
+# Each runs inside an app context on the worker thread and receives the Job so
+# it can report progress and honour cancellation. Imports are kept local so the
+# web process never loads the scraper stack unless an import is requested.
+
+
+def _refresh_similarity_index(job):
+    from app.services.similarity_index import get_similarity_index
+
+    # Re-embeds only the recipes the job changed, so requests don't have to
+    job.report_progress({"step": "similarity index"})
+    get_similarity_index()
+
+
+def run_import_job(job):
+    from app.services.ingest_pipeline import run_ingest_pipeline
+
+    limit = job.params.get("limit")
+    kwargs = {"limit": int(limit)} if limit else {}
+    report = run_ingest_pipeline(progress=job.report_progress, stop=job.stop, **kwargs)
+    _refresh_similarity_index(job)
+    return report
+
+
+def run_reclassify_job(job):
+    from app.services.classifier import classify_all_recipes
+    from app.services.ingredient_classifier import classify_ingredients
+
+    job.report_progress({"step": "ingredients"})
+    classify_ingredients()
+    job.report_progress({"step": "recipes"})
+    classified = classify_all_recipes(progress=job.report_progress, stop=job.stop)
+    _refresh_similarity_index(job)
+    return {"recipes_classified": classified}
+
+
+def run_dedupe_job(job):
+    from app.services.near_duplicates import dedupe_catalogue
+
+    rebuild = str(job.params.get("rebuild", "")).lower() in ("1", "true", "yes")
+    return dedupe_catalogue(
+        rebuild=rebuild, progress=job.report_progress, stop=job.stop
+    )
+
+
+def run_reindex_job(job):
+    from app.models import db
+
+    # Rebuild the b-tree indexes and refresh the planner statistics SQLite uses
+    # to pick them; both are cheap for a catalogue of this size.
+    job.report_progress({"step": "reindex"})
+    if db.engine.dialect.name == "sqlite":
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("REINDEX")
+            conn.exec_driver_sql("ANALYZE")
+    return {"reindexed": True}
+
+
+JOB_TYPES = {
+    "import": run_import_job,
+    "reclassify": run_reclassify_job,
+    "reindex": run_reindex_job,
+    "dedupe": run_dedupe_job,
+}
+
+
+class JobRunner:
+    """
+    Runs catalogue maintenance jobs on a single background worker thread.
+
+    Jobs are serialised (SQLite only has one writer anyway) and write to the
+    live database in short transactions, so the app keeps serving requests
+    while a refresh is in progress.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.token = ""
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.token = app.config.get("JOBS_TOKEN", os.getenv("JOBS_TOKEN", ""))
+        app.extensions["job_runner"] = self
+
+    def authorised(self, token):
+        """Whether `token` may start/cancel jobs (never, with no JOBS_TOKEN)."""
+        if not self.token or token is None:
+            return False
+        return hmac.compare_digest(token.encode(), self.token.encode())
+
+    def submit(self, kind, params=None):
+        """Queues a job, or returns the already queued/running one of that kind."""
+        if kind not in JOB_TYPES:
+            raise ValueError(f"Unknown job type '{kind}'")
+
+        with self._lock:
+            for job in self.jobs.values():
+                if job.kind == kind and job.is_active:
+                    return job
+
+            job = Job(kind, params)
+            self.jobs[job.id] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job)
+        logging.info("Queued %s job %s", kind, job.id)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return list(reversed(self.jobs.values()))
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job and job.is_active:
+            job.stop.set()
+            if job.status == "queued":
+                job.update(status="cancelled", finished_at=datetime.utcnow())
+        return job
+
+    def _trim_history(self):
+        finished = [jid for jid, job in self.jobs.items() if not job.is_active]
+        for jid in finished[: max(0, len(self.jobs) - MAX_JOB_HISTORY)]:
+            del self.jobs[jid]
+
+    def _run(self, job):
+        if job.stop.is_set():
+            return
+
+        job.update(status="running", started_at=datetime.utcnow())
+        t0 = time.perf_counter()
+
+        with self.app.app_context():
+            from app.models import db
+
+            try:
+                result = JOB_TYPES[job.kind](job)
+                status = "cancelled" if job.stop.is_set() else "succeeded"
+                job.update(status=status, result=result)
+            except Exception as e:
+                db.session.rollback()
+                logging.exception("Background %s job %s failed", job.kind, job.id)
+                job.update(status="failed", error=str(e))
+            finally:
+                db.session.remove()
+
+        job.update(finished_at=datetime.utcnow())
+        logging.info(
+            "%s job %s %s in %.1fs",
+            job.kind,
+            job.id,
+            job.status,
+            time.perf_counter() - t0,
+        )
@@ -0,0 +1,393 @@
+# app/services/near_duplicates.py
+
+import hashlib
+import logging
+import re
+from functools import lru_cache
+from itertools import chain
+
+from sqlalchemy import and_, bindparam, func, select
+
+from app.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    db,
+    recipe_minhash,
+    recipe_minhash_band,
+)
+
+# --- MinHash Signatures ---
+# A recipe is the set of its ingredient names plus every run of SHINGLE_WORDS
+# consecutive words in its instructions. Each of NUM_PERM hash functions
+# (a * x + b) mod PRIME keeps its minimum over that set; the fraction of slots
+# two signatures agree on estimates the Jaccard similarity of the sets.
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+PRIME = 4294967311  # smallest prime above 2**32
+HASH_SEED = 45
+
+# --- LSH Banding ---
+# Two recipes become candidates when any band of ROWS slots matches exactly.
+# With 16 x 4 a pair at Jaccard 0.7 collides ~99% of the time, one at 0.3 ~12%.
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# --- Thresholds (estimated Jaccard) ---
+# At ingest, a new name this close to a stored recipe updates that recipe (it's
+# been renamed or re-published); above FLAG_THRESHOLD it's kept but marked.
+MERGE_THRESHOLD = 0.9
+FLAG_THRESHOLD = 0.7
+
+# Recipes signed per transaction by the bulk pass (token hashes x NUM_PERM
+# uint64s are held in memory per batch)
+SIGN_BATCH_SIZE = 200
+# Larger buckets compare each member to the first rather than pairwise
+MAX_PAIRWISE_BUCKET = 200
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def recipe_tokens(ingredient_names, instructions):
+    """The set MinHash is taken over: ingredient names and instruction shingles."""
+    tokens = {"i:" + name.strip().lower() for name in ingredient_names if name}
+    words = _WORD.findall((instructions or "").lower())
+    for start in range(len(words) - SHINGLE_WORDS + 1):
+        end = start + SHINGLE_WORDS
+        tokens.add("s:" + " ".join(words[start:end]))
+    return tokens
+
+
+@lru_cache(maxsize=1)
+def _coefficients():
+    import numpy as np
+
+    rng = np.random.default_rng(HASH_SEED)
+    # Below 2**32 so a * x + b can't overflow uint64 for 32-bit token hashes
+    a = rng.integers(1, 2**32, size=NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, 2**32, size=NUM_PERM, dtype=np.uint64)
+    return a, b
+
+
+def _token_hash(token):
+    digest = hashlib.blake2b(token.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "little")
+
+
+def minhash_signatures(token_sets):
+    """
+    A (NUM_PERM,) uint32 signature per token set, or None for an empty set
+    (nothing to compare on). All sets are hashed in one vectorised pass.
+    """
+    import numpy as np
+
+    sizes = np.fromiter((len(t) for t in token_sets), dtype=np.int64)
+    hashes = np.fromiter(
+        (_token_hash(t) for t in chain.from_iterable(token_sets)),
+        dtype=np.uint64,
+        count=int(sizes.sum()),
+    )
+    signatures = [None] * len(sizes)
+    if not len(hashes):
+        return signatures
+
+    a, b = _coefficients()
+    values = (np.outer(hashes, a) + b) % np.uint64(PRIME)
+    # Empty sets have no rows, so each non-empty segment ends where the next
+    # non-empty one starts
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    present = np.flatnonzero(sizes)
+    minima = np.minimum.reduceat(values, starts[present], axis=0).astype(np.uint32)
+    for i, signature in zip(present.tolist(), minima):
+        signatures[i] = signature
+    return signatures
+
+
+def band_buckets(signature):
+    """One signed 64-bit bucket key per band, with the band number hashed in."""
+    buckets = []
+    for band in range(BANDS):
+        start, end = band * ROWS, (band + 1) * ROWS
+        digest = hashlib.blake2b(
+            signature[start:end].tobytes(), digest_size=8, person=b"band%d" % band
+        ).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    import numpy as np
+
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _from_blob(blob):
+    import numpy as np
+
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def find_near_duplicates(conn, signature, exclude_ids=(), threshold=FLAG_THRESHOLD):
+    """
+    [(recipe_id, similarity)] for stored recipes at least `threshold` alike,
+    best first. Only recipes sharing a band bucket are compared, so the cost
+    follows the number of look-alikes rather than the catalogue size. Recipes
+    already marked as duplicates are skipped in favour of their originals.
+    """
+    buckets = band_buckets(signature)
+    candidate_ids = set(
+        chain.from_iterable(
+            conn.execute(
+                select(recipe_minhash_band.c.recipe_id).where(
+                    recipe_minhash_band.c.bucket.in_(buckets)
+                )
+            )
+        )
+    )
+    candidate_ids.difference_update(exclude_ids)
+    if not candidate_ids:
+        return []
+
+    rows = conn.execute(
+        select(recipe_minhash.c.recipe_id, recipe_minhash.c.signature)
+        .join(Recipe, Recipe.id == recipe_minhash.c.recipe_id)
+        .where(
+            recipe_minhash.c.recipe_id.in_(candidate_ids),
+            Recipe.duplicate_of_id.is_(None),
+        )
+    )
+    matches = [
+        (recipe_id, similarity(signature, _from_blob(blob))) for recipe_id, blob in rows
+    ]
+    matches = [m for m in matches if m[1] >= threshold]
+    return sorted(matches, key=lambda m: (-m[1], m[0]))
+
+
+def store_signatures(conn, signatures):
+    """Saves {recipe_id: signature} and re-buckets those recipes."""
+    if not signatures:
+        return
+
+    ids = list(signatures)
+    previous = conn.execute(
+        select(recipe_minhash.c.recipe_id, recipe_minhash.c.signature).where(
+            recipe_minhash.c.recipe_id.in_(ids)
+        )
+    ).all()
+    if previous:
+        # Old buckets are recomputed from the old signatures, so the band
+        # table needs no index by recipe
+        conn.execute(
+            recipe_minhash_band.delete().where(
+                and_(
+                    recipe_minhash_band.c.bucket == bindparam("old_bucket"),
+                    recipe_minhash_band.c.recipe_id == bindparam("old_recipe"),
+                )
+            ),
+            [
+                {"old_bucket": bucket, "old_recipe": recipe_id}
+                for recipe_id, blob in previous
+                for bucket in band_buckets(_from_blob(blob))
+            ],
+        )
+        conn.execute(
+            recipe_minhash.delete().where(
+                recipe_minhash.c.recipe_id.in_([r for r, _ in previous])
+            )
+        )
+
+    conn.execute(
+        recipe_minhash.insert(),
+        [
+            {"recipe_id": recipe_id, "signature": signature.tobytes()}
+            for recipe_id, signature in signatures.items()
+        ],
+    )
+    conn.execute(
+        recipe_minhash_band.insert(),
+        [
+            {"bucket": bucket, "recipe_id": recipe_id}
+            for recipe_id, signature in signatures.items()
+            for bucket in band_buckets(signature)
+        ],
+    )
+
+
+def _sign_recipes(conn, recipe_ids):
+    """Computes and stores signatures for the given recipes from the database."""
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, name in conn.execute(
+        select(RecipeIngredient.recipe_id, Ingredient.name)
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .where(RecipeIngredient.recipe_id.in_(recipe_ids))
+    ):
+        names[recipe_id].append(name)
+    instructions = dict(
+        conn.execute(
+            select(Recipe.id, Recipe.instructions).where(Recipe.id.in_(recipe_ids))
+        ).all()
+    )
+
+    signatures = minhash_signatures(
+        [recipe_tokens(names[r], instructions.get(r)) for r in recipe_ids]
+    )
+    signed = {r: s for r, s in zip(recipe_ids, signatures) if s is not None}
+    store_signatures(conn, signed)
+    return len(signed)
+
+
+def _duplicate_groups(conn):
+    """Union-find over every bucket-sharing pair at least FLAG_THRESHOLD alike."""
+    import numpy as np
+
+    shared = (
+        select(recipe_minhash_band.c.bucket)
+        .group_by(recipe_minhash_band.c.bucket)
+        .having(func.count() > 1)
+    )
+    rows = conn.execute(
+        select(recipe_minhash_band.c.bucket, recipe_minhash_band.c.recipe_id)
+        .where(recipe_minhash_band.c.bucket.in_(shared))
+        .order_by(recipe_minhash_band.c.bucket, recipe_minhash_band.c.recipe_id)
+    ).all()
+    if not rows:
+        return []
+
+    buckets = {}
+    for bucket, recipe_id in rows:
+        buckets.setdefault(bucket, []).append(recipe_id)
+    member_ids = sorted({recipe_id for _, recipe_id in rows})
+    signatures = {
+        recipe_id: _from_blob(blob)
+        for recipe_id, blob in conn.execute(
+            select(recipe_minhash.c.recipe_id, recipe_minhash.c.signature).where(
+                recipe_minhash.c.recipe_id.in_(member_ids)
+            )
+        )
+    }
+
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for members in buckets.values():
+        matrix = np.stack([signatures[m] for m in members])
+        if len(members) > MAX_PAIRWISE_BUCKET:
+            agree = (matrix[1:] == matrix[0]).mean(axis=1)
+            pairs = [
+                (0, j + 1) for j in np.flatnonzero(agree >= FLAG_THRESHOLD).tolist()
+            ]
+        else:
+            agree = (matrix[:, None, :] == matrix[None, :, :]).mean(axis=2)
+            left, right = np.nonzero(np.triu(agree >= FLAG_THRESHOLD, k=1))
+            pairs = zip(left.tolist(), right.tolist())
+        for i, j in pairs:
+            root_i, root_j = find(members[i]), find(members[j])
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for recipe_id in list(parent):
+        groups.setdefault(find(recipe_id), set()).add(recipe_id)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def dedupe_catalogue(rebuild=False, progress=None, stop=None):
+    """
+    Bulk pass over the existing catalogue: signs every recipe that has no
+    signature yet (all of them with `rebuild`), then groups near-duplicates
+    and points each group member at one original via duplicate_of_id. The
+    original is a favourite if the group has one, else the oldest recipe.
+    Existing recipes are only flagged, never merged, so confirmed plans that
+    reference them stay valid.
+    """
+    from app.services.catalogue_version import bump_catalogue_version
+
+    # 1. Signatures, one short transaction per batch
+    with db.engine.begin() as conn:
+        if rebuild:
+            conn.execute(recipe_minhash_band.delete())
+            conn.execute(recipe_minhash.delete())
+        todo = list(
+            chain.from_iterable(
+                conn.execute(
+                    select(Recipe.id)
+                    .outerjoin(recipe_minhash, recipe_minhash.c.recipe_id == Recipe.id)
+                    .where(recipe_minhash.c.recipe_id.is_(None))
+                    .order_by(Recipe.id)
+                )
+            )
+        )
+
+    signed = 0
+    for start in range(0, len(todo), SIGN_BATCH_SIZE):
+        if stop is not None and stop.is_set():
+            logging.info("Dedupe cancelled after signing %s recipes", signed)
+            return {"signed": signed, "cancelled": True}
+        end = start + SIGN_BATCH_SIZE
+        with db.engine.begin() as conn:
+            signed += _sign_recipes(conn, todo[start:end])
+        if progress:
+            progress({"step": "signatures", "done": end, "total": len(todo)})
+
+    # 2. Groups -> duplicate_of_id, written only where it changes
+    if progress:
+        progress({"step": "grouping"})
+    with db.engine.begin() as conn:
+        groups = _duplicate_groups(conn)
+        grouped = sorted(chain.from_iterable(groups))
+        favourites = set(
+            chain.from_iterable(
+                conn.execute(
+                    select(Recipe.id).where(
+                        Recipe.id.in_(grouped), Recipe.is_favourite.is_(True)
+                    )
+                )
+            )
+        )
+
+        wanted = {}
+        for group in groups:
+            original = min(group, key=lambda r: (r not in favourites, r))
+            wanted.update({r: original for r in group if r != original})
+
+        current = dict(
+            conn.execute(
+                select(Recipe.id, Recipe.duplicate_of_id).where(
+                    Recipe.duplicate_of_id.is_not(None)
+                )
+            ).all()
+        )
+        changes = [
+            {"rid": recipe_id, "original": wanted.get(recipe_id)}
+            for recipe_id in set(current) | set(wanted)
+            if current.get(recipe_id) != wanted.get(recipe_id)
+        ]
+        if changes:
+            conn.execute(
+                Recipe.__table__.update()
+                .where(Recipe.id == bindparam("rid"))
+                .values(duplicate_of_id=bindparam("original")),
+                changes,
+            )
+            bump_catalogue_version(conn)
+
+    logging.info(
+        "Dedupe: signed %s recipes, %s duplicate(s) in %s group(s), %s changed",
+        signed,
+        len(wanted),
+        len(groups),
+        len(changes),
+    )
+    return {
+        "signed": signed,
+        "groups": len(groups),
+        "duplicates": len(wanted),
+        "changed": len(changes),
+    }
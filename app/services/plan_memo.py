@@ -0,0 +1,85 @@
+# app/services/plan_memo.py
+
+import threading
+from collections import OrderedDict
+
+from app.metrics import PLAN_MEMO_LOOKUPS
+
+# --- Plan Memo ---
+# Reproducible plan requests (an explicit RNG seed, or the deterministic beam
+# mode) are memoized by everything that can change their result. Only recipe
+# ids are stored; callers turn them back into ORM objects in their own session.
+PLAN_MEMO_SIZE = 512
+
+
+def normalize_prefs(prefs):
+    """
+    Canonical, hashable form of planner prefs: numbers as ints, flags as bools,
+    unset values dropped. {"max_time": "30"} and {"max_time": 30,
+    "veg_only": False} therefore share a key.
+    """
+    normalized = []
+    for name, value in sorted((prefs or {}).items()):
+        if value in (None, "", False):
+            continue
+        if name in ("max_calories", "max_time"):
+            value = int(value)
+        elif isinstance(value, str):
+            value = value.lower() in ("1", "true", "on")
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+def plan_memo_key(
+    seed_recipe_id, count, prefs, mode, rng_seed, tuning, catalogue_versions, recent_ids
+):
+    """
+    `tuning` holds mode-specific knobs (beam width, time budget);
+    `catalogue_versions` is the (version, flags_version) pair, since dislikes
+    and favourites change plans too; `recent_ids` is the recency window the
+    plan was penalised against.
+    """
+    return (
+        seed_recipe_id,
+        count,
+        normalize_prefs(prefs),
+        mode,
+        rng_seed,
+        tuple(tuning),
+        catalogue_versions,
+        frozenset(recent_ids),
+    )
+
+
+class PlanMemo:
+    """Thread-safe LRU of plan key -> list of recipe ids."""
+
+    def __init__(self, max_size=PLAN_MEMO_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            recipe_ids = self._entries.get(key)
+            if recipe_ids is not None:
+                self._entries.move_to_end(key)
+        PLAN_MEMO_LOOKUPS.inc(result="miss" if recipe_ids is None else "hit")
+        return recipe_ids
+
+    def put(self, key, recipe_ids):
+        with self._lock:
+            self._entries[key] = list(recipe_ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+plan_memo = PlanMemo()
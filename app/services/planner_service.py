@@ -1,14 +1,25 @@
 # app/services/planner_service.py
 
+import heapq
+import json
 import logging
+import os
 import random
+import re
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain
 from typing import Dict, List, Tuple
 
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from flask import current_app
+from sqlalchemy import or_, select
+from sqlalchemy.orm import defer, selectinload
 
+from app.metrics import StageTimer
 from app.models import ConfirmedPlan, Ingredient, Label, Recipe, RecipeIngredient, db
+from app.services.catalogue_snapshot import RecipeRecord, get_snapshot
+from app.services.catalogue_version import get_catalogue_state
+from app.services.plan_memo import plan_memo, plan_memo_key
 
 # --- Unit Standardization Mapping ---
 # Maps units to a (base_unit, conversion_factor)
@@ -56,6 +67,31 @@ LABEL_CONSTRAINTS = {
 # The maximum number of recipes the user requested
 MAX_PLAN_SIZE = 5
 
+# "sample": weighted random greedy picks; "beam": deterministic beam search
+PLANNER_MODES = ("sample", "beam")
+
+# --- Candidate Retrieval ---
+# Single-pick suggesters only score recipes within the time/kcal limits,
+# stretched by each of these fractions in turn until enough recipes qualify.
+PREFERENCE_WIDENING = (0.0, 0.25, 0.5, 1.0)
+MIN_PREFERRED_CANDIDATES = 50
+
+# Above this many candidates a slot is filled from a stratified sample (by
+# category and favourite) rather than by scoring the whole catalogue.
+# Override with CANDIDATE_CAP (app config or env); 0/"off" scores everything.
+DEFAULT_CANDIDATE_CAP = 3000
+MIN_PER_STRATUM = 25
+
+# Window for the recency penalty (days since a plan was confirmed)
+RECENT_DAYS = 14
+
+# --- Category Quotas ---
+# Recipe.category values (see classifier.categorise_recipe)
+RECIPE_CATEGORIES = ("Chicken", "Beef", "Pork", "Fish", "Vegetarian", "Other")
+# The session plan has six slots
+MAX_QUOTA_RECIPES = 6
+_QUOTA_ITEM = re.compile(r"^\s*(\d+)\s*x?\s+([a-z ]+?)\s*$", re.IGNORECASE)
+
 
 def standardize_ingredient_unit(quantity: float, unit: str) -> Tuple[float, str]:
     """
@@ -118,28 +154,24 @@ def generate_optimized_shopping_list(recipe_ids: List[int]) -> Dict:
     if not recipe_ids:
         return {"error": "No recipes selected."}
 
-    # 1. Fetch full Recipe objects (we need the .labels relationship here)
-    # 1. Fetch full Recipe objects (we need the .labels relationship here)
-    all_recipes = db.session.scalars(
-        select(Recipe)
-        .where(Recipe.id.in_(recipe_ids))
-        .options(
-            selectinload(Recipe.labels)
-        )  # Use selectinload for the secondary=db.Table relationship
-    ).all()
+    with StageTimer("generate_optimized_shopping_list") as stage:
+        with stage("candidate_load"):
+            # 1. Compact records are enough for the label constraints
+            all_recipes = get_snapshot().records(recipe_ids)
+
+            # 2. Filter the recipe set based on constraints
+            optimized_ids = find_optimized_recipe_set(all_recipes)
 
-    # 2. Filter the recipe set based on constraints
-    # NOTE: Since the recipes variable holds full Recipe objects, we need to pass those.
-    optimized_ids = find_optimized_recipe_set(all_recipes)
+            # 3. Get raw ingredients for the OPTIMIZED list
+            raw_ingredients = get_raw_ingredients_for_recipes(optimized_ids)
 
-    # Identify which recipes were selected in the optimization step (for clean output)
-    # (optimized_ids contains the selected recipe ids)
+        with stage("aggregation"):
+            return _aggregate_shopping_list(raw_ingredients, len(recipe_ids))
 
-    # 3. Get raw ingredients for the OPTIMIZED list
-    raw_ingredients = get_raw_ingredients_for_recipes(optimized_ids)
 
-    # 4. Proceed with unit standardization and aggregation (as before)
-    # ... (Aggregation logic is the same) ...
+def _aggregate_shopping_list(raw_ingredients: List[Dict], total_recipes: int) -> Dict:
+    """Standardizes units, sums quantities and groups items by category."""
+    # 4. Proceed with unit standardization and aggregation
 
     # Dictionary to hold the aggregated items
     aggregated_items = {}
@@ -172,11 +204,12 @@ def generate_optimized_shopping_list(recipe_ids: List[int]) -> Dict:
         "Other": [],
     }
 
+    # Categories come from the catalogue snapshot instead of a query per item
+    categories = get_snapshot().ingredient_categories
+
     # Instead of a flat list, we sort them as we loop through aggregated_items
     for (name, unit), quantity in aggregated_items.items():
-        # Fetch the ingredient to get its category
-        ing = Ingredient.query.filter_by(name=name.lower()).first()
-        cat = ing.category if (ing and ing.category) else "Other"
+        cat = categories.get(name.lower(), "Other")
 
         item_data = {"name": name, "quantity": quantity, "unit": unit}
 
@@ -188,40 +221,59 @@ def generate_optimized_shopping_list(recipe_ids: List[int]) -> Dict:
     return {
         "grouped_shopping_list": grouped_list,
         "basics_check_list": basics_check,
-        "total_recipes": len(recipe_ids),
+        "total_recipes": total_recipes,
     }
 
 
-def check_constraints(
-    recipes: List[Recipe], constraints: Dict[str, Tuple[int, int]]
-) -> bool:
+def label_constraints() -> Dict[str, Tuple[int, int]]:
     """
-    Checks if the given list of Recipe objects meets all defined label constraints.
+    LABEL_CONSTRAINTS from the app config, or the LABEL_CONSTRAINTS env var as
+    JSON ({"Spicy": [0, 2], ...}); falls back to the module default.
     """
-    # 1. Count how many recipes belong to each constrained label
-    label_counts = {label: 0 for label in constraints.keys()}
-
-    for recipe in recipes:
-        # Get the titles of all labels for the current recipe
-        recipe_label_titles = [label.title for label in recipe.labels]
+    value = current_app.config.get("LABEL_CONSTRAINTS", os.getenv("LABEL_CONSTRAINTS"))
+    if not value:
+        return LABEL_CONSTRAINTS
+    if isinstance(value, str):
+        value = json.loads(value)
+    return {title: tuple(bounds) for title, bounds in value.items()}
+
+
+@lru_cache(maxsize=32)
+def _constraint_masks(label_table, constraint_items):
+    """(label bitmask, min, max) per constraint, for one snapshot label table."""
+    return [
+        (
+            sum(1 << bit for bit, title in enumerate(label_table) if title == label),
+            min_count,
+            max_count,
+        )
+        for label, (min_count, max_count) in constraint_items
+    ]
 
-        # Increment the count for any label that is in our constraints
-        for title in recipe_label_titles:
-            if title in constraints:
-                label_counts[title] += 1
 
-    # 2. Check all min/max requirements
-    for label, (min_count, max_count) in constraints.items():
-        current_count = label_counts.get(label, 0)
+def check_constraints(
+    recipes: List[RecipeRecord], constraints: Dict[str, Tuple[int, int]]
+) -> bool:
+    """
+    Checks if the given list of RecipeRecords meets all defined label constraints.
+    Each constrained label is interned to its bit(s) in the snapshot's label
+    table once, so counting is an AND per recipe rather than title matching.
+    """
+    label_table = recipes[0].label_table if recipes else ()
+    items = tuple(
+        sorted((label, tuple(bounds)) for label, bounds in constraints.items())
+    )
 
-        # Check if the count is outside the allowed range
+    for mask, min_count, max_count in _constraint_masks(label_table, items):
+        # Count how many recipes carry the label, then check the min/max range
+        current_count = sum(1 for recipe in recipes if recipe.label_mask & mask)
         if current_count < min_count or current_count > max_count:
             return False  # Fails a constraint
 
     return True  # Passes all constraints
 
 
-def find_optimized_recipe_set(all_recipes: List[Recipe]) -> List[int]:
+def find_optimized_recipe_set(all_recipes: List[RecipeRecord]) -> List[int]:
     """
     Searches for a subset of recipes that meets the diversity constraints.
     This uses a basic greedy approach (or exhaustive if MAX_PLAN_SIZE is small).
@@ -237,7 +289,7 @@ def find_optimized_recipe_set(all_recipes: List[Recipe]) -> List[int]:
 
     if len(all_recipes) <= MAX_PLAN_SIZE:
         # If the user selected few enough recipes, just check if they are valid.
-        if check_constraints(all_recipes, LABEL_CONSTRAINTS):
+        if check_constraints(all_recipes, label_constraints()):
             return [r.id for r in all_recipes]
         else:
             # If the user's small selection fails, warn and return the original set.
@@ -253,14 +305,14 @@ def find_optimized_recipe_set(all_recipes: List[Recipe]) -> List[int]:
         # and see if they pass. If not, we return the first MAX_PLAN_SIZE regardless.
 
         candidate_recipes = all_recipes[:MAX_PLAN_SIZE]
-        if check_constraints(candidate_recipes, LABEL_CONSTRAINTS):
+        if check_constraints(candidate_recipes, label_constraints()):
             return [r.id for r in candidate_recipes]
         else:
             logging.warning("Too many recipes selected; returning unoptimized set")
             return [r.id for r in all_recipes[:MAX_PLAN_SIZE]]
 
 
-def get_recent_recipe_ids(days=14):
+def get_recent_recipe_ids(days=RECENT_DAYS):
     """Retrieves a set of all recipe IDs eaten in the last fortnight."""
     cutoff = datetime.utcnow() - timedelta(days=days)
 
@@ -290,32 +342,31 @@ def get_recent_recipe_ids(days=14):
 NOISY_LABELS = {"All Gousto Recipes", "Gluten Free Recipes", "Dairy Free", "New"}
 
 
+def noisy_labels() -> frozenset:
+    """
+    NOISY_LABELS from the app config, or the NOISY_LABELS env var as a
+    comma-separated list; falls back to the module default.
+    """
+    value = current_app.config.get("NOISY_LABELS", os.getenv("NOISY_LABELS"))
+    if not value:
+        return frozenset(NOISY_LABELS)
+    if isinstance(value, str):
+        value = [title.strip() for title in value.split(",")]
+    return frozenset(title for title in value if title)
+
+
 def calculate_affinity_score(recipe_a, recipe_b, prefs=None, recent_ids=None):
+    """Pairwise score of two RecipeRecords (recipe_a is the one being placed)."""
     score = 0.0
     recent_ids = recent_ids or set()
     prefs = prefs or {}
 
     # 1. Ingredient Synergy (+5 for fresh shared items)
-    ing_a = {
-        link.ingredient.name
-        for link in recipe_a.ingredients
-        if not link.ingredient.is_basic
-    }
-    ing_b = {
-        link.ingredient.name
-        for link in recipe_b.ingredients
-        if not link.ingredient.is_basic
-    }
-    score += len(ing_a.intersection(ing_b)) * 5.0
+    shared_fresh = recipe_a.fresh_ingredient_ids & recipe_b.fresh_ingredient_ids
+    score += len(shared_fresh) * 5.0
 
-    # 2. Cuisine Variance (-2 for shared REAL cuisines)
-    labels_a = {
-        label.title for label in recipe_a.labels if label.title not in NOISY_LABELS
-    }
-    labels_b = {
-        label.title for label in recipe_b.labels if label.title not in NOISY_LABELS
-    }
-    score -= len(labels_a.intersection(labels_b)) * 2.0
+    # 2. Cuisine Variance (-2 for shared REAL cuisines; NOISY_LABELS are masked out)
+    score -= (recipe_a.cuisine_mask & recipe_b.cuisine_mask).bit_count() * 2.0
 
     # 3. Preference Weighting (New!)
     max_cal = prefs.get("max_calories")
@@ -349,154 +400,456 @@ def calculate_affinity_score(recipe_a, recipe_b, prefs=None, recent_ids=None):
 
 
 def suggest_meal_plan(
-    seed_recipe_id: int, count: int = 5, prefs: dict = None
+    seed_recipe_id: int,
+    count: int = 5,
+    prefs: dict = None,
+    mode: str = "sample",
+    beam_width: int = None,
+    time_budget_ms: float = None,
+    rng_seed: int = None,
 ) -> List[Recipe]:
+    """
+    Builds a `count`-recipe plan around the seed recipe.
+    mode="sample" draws each pick at random, weighted by affinity with the plan
+    so far; pass `rng_seed` to make the draw reproducible. mode="beam" is
+    deterministic: it keeps the best `beam_width` partial plans at each step and
+    returns the best full plan found in the time budget.
+    Reproducible requests are memoized (see plan_memo).
+    """
+    if mode not in PLANNER_MODES:
+        raise ValueError(f"Unknown planner mode '{mode}'")
+
     prefs = prefs or {}
-    seed_recipe = db.session.get(Recipe, seed_recipe_id)
-    plan = [seed_recipe]
-    recent_ids = get_recent_recipe_ids(days=14)
+    recent_ids = get_recent_recipe_ids(days=RECENT_DAYS)
+
+    memo_key = None
+    if rng_seed is not None or mode == "beam":
+        tuning = (beam_width, time_budget_ms) if mode == "beam" else ()
+        memo_key = plan_memo_key(
+            seed_recipe_id,
+            count,
+            prefs,
+            mode,
+            rng_seed if mode == "sample" else None,
+            tuning,
+            get_catalogue_state()[:2],
+            recent_ids,
+        )
+        recipe_ids = plan_memo.get(memo_key)
+        if recipe_ids is not None:
+            return [r for r in load_plan_recipes(recipe_ids) if r]
+
+    rng = random.Random(rng_seed) if rng_seed is not None else random
+    with StageTimer("suggest_meal_plan") as stage:
+        with stage("candidate_load"):
+            snapshot = get_snapshot()
+            plan = snapshot.records([seed_recipe_id], ignore_labels=noisy_labels())
+
+            # 1. Base Candidates Query
+            query = select(Recipe.id).where(Recipe.id != seed_recipe_id)
+
+            # 2. Apply Hard Limits (e.g., Vegetarian)
+            if prefs.get("veg_only"):
+                # Assuming recipes have a 'Vegetarian' label
+                query = query.join(Recipe.labels).where(Label.title == "Vegetarian")
+
+            candidates = load_candidate_records(query, snapshot)
+
+        if mode == "beam":
+            # Imported here: beam_planner builds on this module's scorers
+            from app.services import beam_planner
+
+            with stage("scoring"):
+                result = beam_planner.beam_search_plan(
+                    candidates,
+                    1,
+                    count,
+                    prefs,
+                    recent_ids,
+                    seed=plan[0] if plan else None,
+                    beam_width=beam_width or beam_planner.BEAM_WIDTH,
+                    time_budget_ms=time_budget_ms or beam_planner.TIME_BUDGET_MS,
+                )
+            plan = result["plan"][0] if result["plan"] else plan
+            # If the beam came up short, the top-up below mustn't repeat it
+            chosen = {r.id for r in plan}
+            candidates = [c for c in candidates if c.id not in chosen]
+
+        while len(plan) < count and candidates:
+            with stage("scoring"):
+                scores = []
+                for candidate in candidates:
+                    # Pass preferences into our affinity logic
+                    total_affinity = sum(
+                        calculate_affinity_score(candidate, r, prefs, recent_ids)
+                        for r in plan
+                    )
+                    scores.append(total_affinity)
+
+            with stage("sampling"):
+                # Softmax-style weight conversion
+                min_score = min(scores)
+                weights = [(s - min_score) + 1 for s in scores]
+
+                next_recipe = rng.choices(candidates, weights=weights, k=1)[0]
+                plan.append(next_recipe)
+                candidates.remove(next_recipe)
+
+    if memo_key is not None:
+        plan_memo.put(memo_key, [r.id for r in plan])
+
+    # Only the chosen recipes become ORM objects
+    return [r for r in load_plan_recipes([r.id for r in plan]) if r]
+
+
+def _candidate_ids(query) -> List[int]:
+    # Near-duplicates would inflate the pool (and their originals' odds)
+    query = query.where(Recipe.duplicate_of_id.is_(None))
+    # Flattening Core rows skips the per-row ORM/scalars() processing, which
+    # dominates on six-figure id lists
+    return list(chain.from_iterable(db.session.connection().execute(query)))
+
+
+def load_candidate_records(query, snapshot) -> List[RecipeRecord]:
+    """Runs an id-only candidate query and returns scoring records for it."""
+    return snapshot.records(_candidate_ids(query), ignore_labels=noisy_labels())
+
+
+def _preference_filters(prefs: dict, widen: float) -> list:
+    """SQL range filters for the time/kcal prefs, each limit stretched by `widen`."""
+    filters = []
+    for pref, column in (
+        ("max_time", Recipe.time_minutes),
+        ("max_calories", Recipe.kcal),
+    ):
+        limit = prefs.get(pref)
+        if limit:
+            # Unknown values aren't out of range; the scorer treats them as neutral
+            filters.append(
+                or_(column <= int(int(limit) * (1 + widen)), column.is_(None))
+            )
+    return filters
 
-    # 1. Base Candidates Query
-    query = select(Recipe).where(Recipe.id != seed_recipe_id)
 
-    # 2. Apply Hard Limits (e.g., Vegetarian)
-    if prefs.get("veg_only"):
-        # Assuming recipes have a 'Vegetarian' label
-        query = query.join(Recipe.labels).where(Label.title == "Vegetarian")
+def candidate_cap() -> int:
+    """CANDIDATE_CAP from the app config or env; 0 (or "off") disables the cap."""
+    value = current_app.config.get(
+        "CANDIDATE_CAP", os.getenv("CANDIDATE_CAP", DEFAULT_CANDIDATE_CAP)
+    )
+    return 0 if str(value).lower() == "off" else int(value)
 
-    candidates = db.session.scalars(
-        query.options(selectinload(Recipe.labels), selectinload(Recipe.ingredients))
-    ).all()
 
-    while len(plan) < count and candidates:
-        scores = []
-        for candidate in candidates:
-            # Pass preferences into our affinity logic
-            total_affinity = sum(
-                calculate_affinity_score(candidate, r, prefs, recent_ids) for r in plan
-            )
-            scores.append(total_affinity)
+def load_preferred_candidates(
+    query,
+    prefs: dict,
+    snapshot,
+    min_candidates: int = MIN_PREFERRED_CANDIDATES,
+    rng=random,
+) -> Tuple[List[RecipeRecord], Dict[int, float]]:
+    """
+    Candidate retrieval for the single-pick suggesters: applies max_time and
+    max_calories as indexed range filters, widening them step by step
+    (PREFERENCE_WIDENING) while fewer than `min_candidates` recipes qualify,
+    then dropping them altogether. Prefs stay soft - the scorer still weighs
+    whatever comes back - but it only has to score the narrowed set.
+
+    If more than candidate_cap() recipes remain, a stratified sample of them is
+    scored instead. Returns (records, expansion): multiply each record's pick
+    weight by expansion.get(id, 1.0) to keep the pick probabilities unbiased.
+    """
+    ids = None
+    if prefs.get("max_time") or prefs.get("max_calories"):
+        for widen in PREFERENCE_WIDENING:
+            ids = _candidate_ids(query.where(*_preference_filters(prefs, widen)))
+            if len(ids) >= min_candidates:
+                break
+        else:
+            ids = None  # Too little close to the limits: fall back to everything
 
-        # Softmax-style weight conversion
-        min_score = min(scores)
-        weights = [(s - min_score) + 1 for s in scores]
+    if ids is None:
+        ids = _candidate_ids(query)
 
-        next_recipe = random.choices(candidates, weights=weights, k=1)[0]
-        plan.append(next_recipe)
-        candidates.remove(next_recipe)
+    expansion = {}
+    cap = candidate_cap()
+    if cap and len(ids) > cap:
+        ids, expansion = snapshot.stratified_sample(ids, cap, MIN_PER_STRATUM, rng)
+    return snapshot.records(ids, ignore_labels=noisy_labels()), expansion
 
-    return plan
 
+def load_plan_recipes(slot_ids: List[int], with_instructions: bool = False) -> List:
+    """
+    Resolves a plan's slot ids to Recipe objects in one eager load: labels and
+    ingredients (with their Ingredient rows) come along, so neither the
+    templates nor get_synergy_report trigger per-recipe lazy loads.
+
+    Returns a list aligned with `slot_ids` (None for empty or missing slots).
+    Instructions are deferred unless asked for; only the cooking view shows them.
+    """
+    ids = [rid for rid in slot_ids if rid]
+    if not ids:
+        return [None] * len(slot_ids)
+
+    options = [
+        selectinload(Recipe.labels),
+        selectinload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient),
+    ]
+    if not with_instructions:
+        options.append(defer(Recipe.instructions))
+        options.append(defer(Recipe.instruction_steps))
 
-def get_synergy_report(recipe_ids: List[int]) -> List[str]:
-    """Identifies fresh ingredients appearing in 2+ recipes."""
     recipes = db.session.scalars(
-        select(Recipe)
-        .where(Recipe.id.in_(recipe_ids))
-        .options(selectinload(Recipe.ingredients))
+        select(Recipe).where(Recipe.id.in_(ids)).options(*options)
     ).all()
 
-    counts = {}
-    for r in recipes:
-        fresh = {
-            link.ingredient.name.title()
-            for link in r.ingredients
-            if not link.ingredient.is_basic
-        }
-        for ing in fresh:
-            counts[ing] = counts.get(ing, 0) + 1
+    by_id = {r.id: r for r in recipes}
+    return [by_id.get(rid) if rid else None for rid in slot_ids]
+
+
+def get_synergy_report(recipe_ids: List[int], recipes: List = None) -> List[str]:
+    """
+    Identifies fresh ingredients appearing in 2+ recipes.
+    Pass `recipes` (e.g. from load_plan_recipes) to reuse already loaded objects.
+    """
+    with StageTimer("get_synergy_report") as stage:
+        if recipes is None:
+            with stage("candidate_load"):
+                recipes = [r for r in load_plan_recipes(recipe_ids) if r]
+
+        with stage("aggregation"):
+            counts = {}
+            for r in recipes:
+                fresh = {
+                    link.ingredient.name.title()
+                    for link in r.ingredients
+                    if not link.ingredient.is_basic
+                }
+                for ing in fresh:
+                    counts[ing] = counts.get(ing, 0) + 1
 
     return [ing for ing, count in counts.items() if count > 1]
 
 
 def suggest_single_replacement(current_plan_ids, exclude_ids, prefs=None, mode="all"):
     prefs = prefs or {}
-    plan_objects = [db.session.get(Recipe, rid) for rid in current_plan_ids]
-
-    query = select(Recipe).where(Recipe.id.notin_(exclude_ids))
-
-    # Apply Hard Limit for Favourites
-    if mode == "favs":
-        query = query.where(Recipe.is_favourite.is_(True))
-
-    # Apply other Hard Limits
-    if prefs.get("veg_only"):
-        query = query.join(Recipe.labels).where(Label.title.ilike("%Vegetarian%"))
+    with StageTimer("suggest_single_replacement") as stage:
+        with stage("candidate_load"):
+            snapshot = get_snapshot()
+            plan_objects = snapshot.records(
+                [rid for rid in current_plan_ids if rid], ignore_labels=noisy_labels()
+            )
 
-    candidates = db.session.scalars(query).all()
+            query = select(Recipe.id).where(Recipe.id.notin_(exclude_ids))
+
+            # Apply Hard Limit for Favourites
+            if mode == "favs":
+                query = query.where(Recipe.is_favourite.is_(True))
+
+            # Apply other Hard Limits
+            if prefs.get("veg_only"):
+                query = query.join(Recipe.labels).where(
+                    Label.title.ilike("%Vegetarian%")
+                )
+
+            candidates, expansion = load_preferred_candidates(query, prefs, snapshot)
+
+        if candidates:
+            with stage("scoring"):
+                scores = []
+                for c in candidates:
+                    total_affinity = sum(
+                        calculate_affinity_score(c, r, prefs) for r in plan_objects
+                    )
+                    scores.append(total_affinity)
+
+            with stage("sampling"):
+                min_score = min(scores)
+                weights = [
+                    ((s - min_score) + 1) * expansion.get(c.id, 1.0)
+                    for s, c in zip(scores, candidates)
+                ]
+                chosen = random.choices(candidates, weights=weights, k=1)[0]
+                return db.session.get(Recipe, chosen.id)
 
     # Fallback: If no favourites match your filters, broaden to all recipes
-    if not candidates:
-        return suggest_single_replacement(
-            current_plan_ids, exclude_ids, prefs, mode="all"
-        )
-
-    scores = []
-    for c in candidates:
-        total_affinity = sum(
-            calculate_affinity_score(c, r, prefs) for r in plan_objects
-        )
-        scores.append(total_affinity)
-
-    min_score = min(scores)
-    weights = [(s - min_score) + 1 for s in scores]
-    return random.choices(candidates, weights=weights, k=1)[0]
+    return suggest_single_replacement(current_plan_ids, exclude_ids, prefs, mode="all")
 
 
 def suggest_single_recipe(
     existing_ids: List[int], category: str = "All", prefs: dict = None
 ) -> Recipe:
     prefs = prefs or {}
-    recent_ids = get_recent_recipe_ids(days=14)
+    with StageTimer("suggest_single_recipe") as stage:
+        with stage("candidate_load"):
+            snapshot = get_snapshot()
+            recent_ids = get_recent_recipe_ids(days=RECENT_DAYS)
+
+            # 1. Current locked-in recipes
+            locked_recipes = snapshot.records(
+                existing_ids, ignore_labels=noisy_labels()
+            )
 
-    # 1. Fetch current locked-in recipes
-    locked_recipes = []
-    if existing_ids:
-        locked_recipes = db.session.scalars(
-            select(Recipe)
-            .where(Recipe.id.in_(existing_ids))
-            .options(selectinload(Recipe.labels), selectinload(Recipe.ingredients))
-        ).all()
+            # 2. Candidate Query; time/calories narrow it in SQL, widening if needed
+            query = select(Recipe.id).where(Recipe.is_disliked.is_(False))
 
-    # 2. Broad Candidate Query (No hard limits on time/calories here)
-    query = select(Recipe).where(Recipe.is_disliked.is_(False))
+            if category != "All":
+                query = query.where(Recipe.category == category)
 
-    if category != "All":
-        query = query.where(Recipe.category == category)
+            if existing_ids:
+                query = query.where(Recipe.id.notin_(existing_ids))
 
-    if existing_ids:
-        query = query.where(Recipe.id.notin_(existing_ids))
+            candidates, expansion = load_preferred_candidates(query, prefs, snapshot)
 
-    candidates = db.session.scalars(
-        query.options(selectinload(Recipe.labels), selectinload(Recipe.ingredients))
-    ).all()
+        if not candidates:
+            return None
 
-    if not candidates:
-        return None
+        with stage("scoring"):
+            # 3. Scoring Logic (This is where weighting happens)
+            scores = []
+            for c in candidates:
+                # Start with a base affinity based on synergy with other meals
+                if not locked_recipes:
+                    total_score = 0.0
+                else:
+                    total_score = sum(
+                        calculate_affinity_score(c, r, prefs, recent_ids)
+                        for r in locked_recipes
+                    )
 
-    # 3. Scoring Logic (This is where weighting happens)
-    scores = []
-    for c in candidates:
-        # Start with a base affinity based on synergy with other meals
-        if not locked_recipes:
-            total_score = 0.0
-        else:
-            total_score = sum(
-                calculate_affinity_score(c, r, prefs, recent_ids)
-                for r in locked_recipes
-            )
+                # ADDED: Self-weighting for the candidate's own stats
+                # Even with no locked recipes, we still want to weight by prefs
+                total_score += calculate_individual_weight(c, prefs)
 
-        # ADDED: Self-weighting for the candidate's own stats
-        # Even if there are no locked recipes, we still want to weight by prefs
-        total_score += calculate_individual_weight(c, prefs)
+                scores.append(total_score)
 
-        scores.append(total_score)
+        with stage("sampling"):
+            # 4. Pick the winner using the weighted probabilities
+            #    (scaled back up for strata the candidate cap over-sampled)
+            min_score = min(scores)
+            weights = [
+                ((s - min_score) + 1) * expansion.get(c.id, 1.0)
+                for s, c in zip(scores, candidates)
+            ]
+            chosen = random.choices(candidates, weights=weights, k=1)[0]
+
+    return db.session.get(Recipe, chosen.id)
+
+
+def parse_category_quotas(text: str) -> Dict[str, int]:
+    """
+    "2 chicken, 1 fish, 2 vegetarian" -> {"Chicken": 2, "Fish": 1, "Vegetarian": 2}.
+    Raises ValueError for anything it can't read, an unknown category, or more
+    than MAX_QUOTA_RECIPES recipes in total.
+    """
+    categories = {name.lower(): name for name in RECIPE_CATEGORIES}
+    categories["veg"] = "Vegetarian"
+
+    quotas = {}
+    for item in filter(str.strip, (text or "").split(",")):
+        match = _QUOTA_ITEM.match(item)
+        if not match:
+            raise ValueError(f"Can't read quota '{item.strip()}' (try '2 chicken')")
+        count, name = int(match.group(1)), match.group(2).strip().lower()
+        # Plurals ("2 chickens") are fine too
+        category = categories.get(name) or categories.get(name.removesuffix("s"))
+        if category is None:
+            raise ValueError(f"Unknown category '{match.group(2).strip()}'")
+        if count:
+            quotas[category] = quotas.get(category, 0) + count
+
+    if not quotas:
+        raise ValueError("No quotas given")
+    if sum(quotas.values()) > MAX_QUOTA_RECIPES:
+        raise ValueError(f"Quotas add up to more than {MAX_QUOTA_RECIPES} recipes")
+    return quotas
+
+
+def _weighted_sample(items: list, weights: List[float], k: int, rng) -> list:
+    """
+    k of `items` without replacement, each draw proportional to its weight
+    (Efraimidis-Spirakis: the k largest random() ** (1 / weight) keys).
+    """
+    keys = ((rng.random() ** (1.0 / w), i) for i, w in enumerate(weights))
+    return [items[i] for _, i in heapq.nlargest(k, keys)]
 
-    # 4. Pick the winner using the weighted probabilities
-    min_score = min(scores)
-    weights = [(s - min_score) + 1 for s in scores]
 
-    return random.choices(candidates, weights=weights, k=1)[0]
+def suggest_quota_plan(
+    quotas: Dict[str, int],
+    existing_ids: List[int] = None,
+    prefs: dict = None,
+    rng_seed: int = None,
+) -> List[Recipe]:
+    """
+    Fills a week to category quotas (e.g. from parse_category_quotas) in one
+    pass: candidates from every quota category are loaded and scored once
+    against the locked-in `existing_ids` (the same score suggest_single_recipe
+    uses), partitioned by category, and each partition gets one weighted draw
+    of its quota. Returns the picks grouped by category in quota order; a
+    category with too few recipes contributes what it has.
+    """
+    prefs = prefs or {}
+    existing_ids = [rid for rid in existing_ids or () if rid]
+    rng = random.Random(rng_seed) if rng_seed is not None else random
+
+    with StageTimer("suggest_quota_plan") as stage:
+        with stage("candidate_load"):
+            snapshot = get_snapshot()
+            recent_ids = get_recent_recipe_ids(days=RECENT_DAYS)
+            locked = snapshot.records(existing_ids, ignore_labels=noisy_labels())
+
+            query = select(Recipe.id).where(Recipe.is_disliked.is_(False))
+            if existing_ids:
+                query = query.where(Recipe.id.notin_(existing_ids))
+
+            candidates, expansion = load_preferred_candidates(
+                query.where(Recipe.category.in_(list(quotas))),
+                prefs,
+                snapshot,
+                min_candidates=MIN_PREFERRED_CANDIDATES * len(quotas),
+                rng=rng,
+            )
+            partitions = {category: [] for category in quotas}
+            for c in candidates:
+                partitions[c.category].append(c)
+
+            # The time/kcal narrowing is shared, so a rare category can come
+            # back short; top those up from the category alone
+            for category, count in quotas.items():
+                if len(partitions[category]) < count:
+                    partitions[category], extra = load_preferred_candidates(
+                        query.where(Recipe.category == category), {}, snapshot, rng=rng
+                    )
+                    expansion.update(extra)
+
+        with stage("scoring"):
+            scores = {}
+            for c in chain.from_iterable(partitions.values()):
+                score = calculate_individual_weight(c, prefs)
+                for r in locked:
+                    score += calculate_affinity_score(c, r, prefs, recent_ids)
+                scores[c.id] = score
+
+        with stage("sampling"):
+            chosen = []
+            for category, count in quotas.items():
+                members = partitions[category]
+                if len(members) < count:
+                    logging.info(
+                        "Only %s %s recipe(s) for a quota of %s",
+                        len(members),
+                        category,
+                        count,
+                    )
+                if not members:
+                    continue
+                min_score = min(scores[c.id] for c in members)
+                weights = [
+                    ((scores[c.id] - min_score) + 1) * expansion.get(c.id, 1.0)
+                    for c in members
+                ]
+                picks = _weighted_sample(members, weights, count, rng)
+                chosen.extend(c.id for c in picks)
+
+    return [r for r in load_plan_recipes(chosen) if r]
 
 
 def calculate_individual_weight(recipe, prefs):
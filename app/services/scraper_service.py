@@ -11,11 +11,8 @@ from flask import current_app
 
 # Ensure all models and the association table are imported
 from app.models import Ingredient, Label, Recipe, RecipeIngredient, db, recipe_label
-
-# Global variables/API Endpoints
-GET_RECIPE_INFO_ENDPOINT = (
-    "https://production-api.gousto.co.uk/cmsreadbroker/v1/recipe/"
-)
+from app.services.catalogue_scraper import recipe_info_endpoint
+from app.services.instructions import structure_steps
 
 
 def scrape_and_save_recipe(recipe_path: str, recipe_name: str, servings: int) -> int:
@@ -31,7 +28,7 @@ def scrape_and_save_recipe(recipe_path: str, recipe_name: str, servings: int) ->
     clean_path = recipe_path.lstrip("/")
     slug = clean_path.split("/")[-1]
 
-    api_url = GET_RECIPE_INFO_ENDPOINT + slug
+    api_url = recipe_info_endpoint(slug)
 
     # --- Initialize variables ---
     time_minutes = None
@@ -195,6 +192,7 @@ def scrape_and_save_recipe(recipe_path: str, recipe_name: str, servings: int) ->
             # Update Recipe Fields
             recipe.servings = servings
             recipe.instructions = instructions_text
+            recipe.instruction_steps = structure_steps(all_steps_text)
             recipe.time_minutes = time_minutes
             recipe.nutritional_info = nutritional_info
 
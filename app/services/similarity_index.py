@@ -0,0 +1,436 @@
+# app/services/similarity_index.py
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+from app.models import db
+from app.services.catalogue_columns import FLAG_DISLIKED, FLAG_DUPLICATE
+from app.services.catalogue_snapshot import columns_path_for, get_snapshot
+
+# --- Similarity Index ---
+# Each recipe is a TF-IDF vector over its fresh (non-basic) ingredients and its
+# non-noisy labels, random-projected down to EMBED_DIM dense dims (so cosine
+# similarity is roughly preserved) and L2-normalised. An IVF index sits on
+# top: spherical k-means splits the recipes into ~IVF_LISTS_PER_SQRT * sqrt(n)
+# lists, and a lookup re-ranks (exact dot product) the members of the NPROBE
+# lists whose centroids are closest to the query.
+EMBED_DIM = 128
+IVF_LISTS_PER_SQRT = 2
+NPROBE = 48
+KMEANS_ITERATIONS = 10
+# k-means trains on a sample; every recipe is then assigned to its nearest list
+KMEANS_SAMPLE = 25000
+# Fixed so embeddings and centroids are identical across workers/restarts
+PROJECTION_SEED = 20240611
+
+# The IDF weights and centroids are frozen at fit time so unchanged recipes
+# keep their vectors and lists. Refit everything once the catalogue has grown
+# this much since.
+REFIT_GROWTH = 0.2
+
+# Rows embedded per batch (bounds the temporary ingredient x dim array)
+EMBED_BATCH = 4096
+
+DEFAULT_K = 10
+MAX_K = 50
+
+
+def _splitmix64(values):
+    import numpy as np
+
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _segment_sum(values, indptr):
+    """Row sums of CSR-style segments values[indptr[i]:indptr[i + 1]]."""
+    import numpy as np
+
+    counts = np.diff(indptr)
+    out = np.zeros((len(counts),) + values.shape[1:], dtype=values.dtype)
+    nonempty = counts > 0
+    if nonempty.any():
+        out[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty], axis=0)
+    return out
+
+
+def _gather_rows(cols, rows):
+    """(ingredient ids, indptr) of the given column rows, concatenated."""
+    import numpy as np
+
+    starts = cols.ingredient_indptr[rows]
+    lengths = cols.ingredient_indptr[rows + 1] - starts
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    offsets = np.repeat(starts - indptr[:-1], lengths)
+    positions = np.arange(indptr[-1], dtype=np.int64) + offsets
+    return cols.ingredient_indices[positions].astype(np.int64), indptr
+
+
+def _label_bit_matrix(cols, rows):
+    """(len(rows), n_label_bits) 0/1 float32 matrix of each row's labels."""
+    import numpy as np
+
+    words = np.ascontiguousarray(cols.label_bits[rows])
+    bits = np.unpackbits(words.view(np.uint8), axis=1, bitorder="little")
+    n_bits = len(cols.label_ids)
+    return bits[:, :n_bits].astype(np.float32)
+
+
+def fingerprints(cols):
+    """One uint64 per row that changes whenever its ingredients or labels do."""
+    import numpy as np
+
+    fp = _segment_sum(_splitmix64(cols.ingredient_indices), cols.ingredient_indptr)
+    label_ids = np.asarray(cols.label_ids, dtype=np.int64)
+    bits = _label_bit_matrix(cols, np.arange(len(cols))).astype(bool)
+    for bit, label_id in enumerate(label_ids.tolist()):
+        fp[bits[:, bit]] += _splitmix64(np.array([label_id + (1 << 40)]))[0]
+    return fp
+
+
+def _projection(seed_part, n_rows):
+    import numpy as np
+
+    # default_rng fills row by row, so row i is the same whatever n_rows is
+    rng = np.random.default_rng([PROJECTION_SEED, seed_part])
+    return rng.standard_normal((n_rows, EMBED_DIM), dtype=np.float32)
+
+
+class SimilarityIndex:
+    """Embeddings + IVF lists for one catalogue version (rows follow its ids)."""
+
+    def __init__(self):
+        self.version = None
+        self.ids = None  # int32, sorted (same order as the catalogue columns)
+        self.fingerprints = None  # uint64 per row
+        self.embeddings = None  # float32 (n, EMBED_DIM), unit length
+        self.centroids = None  # float32 (n_lists, EMBED_DIM), unit length
+        self.assignment = None  # int32 list number per row
+        self.list_order = None  # rows grouped by list ...
+        self.list_indptr = None  # ... list i is list_order[indptr[i]:indptr[i + 1]]
+        self.ingredient_idf = None  # float32 by ingredient id (0 for basics)
+        self.label_idf = None  # float32 by label id (0 for noisy labels)
+        self.fitted_rows = 0
+        self.noisy = frozenset()  # noisy label titles the weights were fitted with
+        self.reembedded = 0
+
+    # --- Fitting / embedding ---
+
+    def fit_weights(self, snapshot, noisy):
+        import numpy as np
+
+        cols = snapshot.columns
+        n = len(cols)
+        max_ing = int(max(cols.ingredient_ids.max(initial=0), 0)) + 1
+        df = np.bincount(cols.ingredient_indices, minlength=max_ing)
+        self.ingredient_idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        self.ingredient_idf[list(snapshot.basic_ingredient_ids)] = 0.0
+
+        max_label = max(cols.label_ids, default=0) + 1
+        self.label_idf = np.zeros(max_label, dtype=np.float32)
+        label_df = _label_bit_matrix(cols, np.arange(n)).sum(axis=0)
+        for bit, label_id in enumerate(cols.label_ids):
+            if snapshot.labels.get(label_id) not in noisy:
+                self.label_idf[label_id] = np.log((1 + n) / (1 + label_df[bit])) + 1
+        self.fitted_rows = n
+
+    def _idf(self, table, ids):
+        import numpy as np
+
+        # Features first seen after the fit get the rarest-possible weight
+        unseen = np.float32(np.log(1 + self.fitted_rows) + 1)
+        weights = np.full(len(ids), unseen, dtype=np.float32)
+        known = ids < len(table)
+        weights[known] = table[ids[known]]
+        return weights
+
+    def embed(self, cols, rows):
+        import numpy as np
+
+        out = np.zeros((len(rows), EMBED_DIM), dtype=np.float32)
+        label_ids = np.asarray(cols.label_ids, dtype=np.int64)
+        label_proj = _projection(1, int(label_ids.max(initial=0)) + 1)[label_ids]
+        label_proj *= self._idf(self.label_idf, label_ids)[:, None]
+        max_ing = max(
+            int(cols.ingredient_ids.max(initial=0)),
+            int(cols.ingredient_indices.max(initial=0)),
+        )
+        ingredient_proj = _projection(0, max_ing + 1)
+
+        for start in range(0, len(rows), EMBED_BATCH):
+            batch = rows[start:][:EMBED_BATCH]
+            ing_ids, indptr = _gather_rows(cols, batch)
+            proj = ingredient_proj[ing_ids]
+            proj *= self._idf(self.ingredient_idf, ing_ids)[:, None]
+            vectors = _segment_sum(proj, indptr)
+            vectors += _label_bit_matrix(cols, batch) @ label_proj
+            end = start + len(batch)
+            out[start:end] = vectors
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        out /= np.where(norms > 0, norms, 1.0)
+        return out
+
+    def fit_centroids(self):
+        """Spherical k-means over (a sample of) the embeddings."""
+        import numpy as np
+
+        rng = np.random.default_rng([PROJECTION_SEED, 2])
+        n = len(self.embeddings)
+        if not n:
+            self.centroids = np.zeros((1, EMBED_DIM), dtype=np.float32)
+            return
+        sample = self.embeddings
+        if n > KMEANS_SAMPLE:
+            sample = self.embeddings[rng.choice(n, KMEANS_SAMPLE, replace=False)]
+
+        n_lists = max(1, min(len(sample), int(IVF_LISTS_PER_SQRT * np.sqrt(n))))
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            centroids = np.zeros_like(centroids)
+            np.add.at(centroids, nearest, sample)
+            # Re-seed lists that lost all their members
+            empty = ~centroids.any(axis=1)
+            centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids
+
+    def assign(self, embeddings):
+        import numpy as np
+
+        out = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), EMBED_BATCH):
+            end = start + EMBED_BATCH
+            out[start:end] = np.argmax(embeddings[start:end] @ self.centroids.T, 1)
+        return out
+
+    def _build_lists(self):
+        import numpy as np
+
+        self.list_order = np.argsort(self.assignment, kind="stable")
+        self.list_indptr = np.searchsorted(
+            self.assignment[self.list_order], np.arange(len(self.centroids) + 1)
+        )
+
+    # --- Build / incremental update ---
+
+    @classmethod
+    def build(cls, snapshot, noisy, previous=None):
+        """
+        Index for `snapshot`. With a `previous` index (older version, same
+        weights), only rows whose ingredients/labels changed are re-embedded.
+        """
+        import numpy as np
+
+        cols = snapshot.columns
+        index = cls()
+        index.version = cols.version
+        index.ids = np.array(cols.ids)
+        index.fingerprints = fingerprints(cols)
+        n = len(cols)
+
+        reuse = np.zeros(n, dtype=bool)
+        positions = None
+        if (
+            previous is not None
+            and len(previous.ids)
+            and n <= previous.fitted_rows * (1 + REFIT_GROWTH)
+            and previous.noisy == noisy
+        ):
+            index.ingredient_idf = previous.ingredient_idf
+            index.label_idf = previous.label_idf
+            index.centroids = previous.centroids
+            index.fitted_rows = previous.fitted_rows
+            positions = np.searchsorted(previous.ids, index.ids)
+            positions[positions >= len(previous.ids)] = 0
+            reuse = (previous.ids[positions] == index.ids) & (
+                previous.fingerprints[positions] == index.fingerprints
+            )
+        else:
+            index.fit_weights(snapshot, noisy)
+        index.noisy = noisy
+
+        changed = np.flatnonzero(~reuse)
+        index.embeddings = np.empty((n, EMBED_DIM), dtype=np.float32)
+        index.assignment = np.empty(n, dtype=np.int32)
+        if reuse.any():
+            index.embeddings[reuse] = previous.embeddings[positions[reuse]]
+            index.assignment[reuse] = previous.assignment[positions[reuse]]
+        if len(changed):
+            index.embeddings[changed] = index.embed(cols, changed)
+            if index.centroids is None:
+                index.fit_centroids()
+            index.assignment[changed] = index.assign(index.embeddings[changed])
+        if index.centroids is None:
+            index.fit_centroids()  # empty catalogue
+        index._build_lists()
+        index.reembedded = len(changed)
+        return index
+
+    # --- Persistence ---
+
+    def save(self, path):
+        import numpy as np
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **self.to_arrays())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at `path`, or None if there isn't a readable one."""
+        import numpy as np
+
+        try:
+            with np.load(path) as data:
+                return cls.from_arrays(data)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def to_arrays(self):
+        """The index as a dict of arrays (what save() writes)."""
+        import numpy as np
+
+        return {
+            "version": np.array(self.version),
+            "ids": self.ids,
+            "fingerprints": self.fingerprints,
+            "embeddings": self.embeddings,
+            "centroids": self.centroids,
+            "assignment": self.assignment,
+            "ingredient_idf": self.ingredient_idf,
+            "label_idf": self.label_idf,
+            "fitted_rows": np.array(self.fitted_rows),
+            "noisy": np.array(sorted(self.noisy), dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, data):
+        """Inverse of to_arrays(); `data` may be any mapping, e.g. an NpzFile."""
+        index = cls()
+        index.version = int(data["version"])
+        for name in (
+            "ids",
+            "fingerprints",
+            "embeddings",
+            "centroids",
+            "assignment",
+            "ingredient_idf",
+            "label_idf",
+        ):
+            setattr(index, name, data[name])
+        index.fitted_rows = int(data["fitted_rows"])
+        index.noisy = frozenset(data["noisy"].tolist())
+        index._build_lists()
+        return index
+
+    # --- Queries ---
+
+    def similar(self, recipe_id, k=DEFAULT_K, exclude_flags=None):
+        """
+        [(recipe_id, cosine), ...] for the k nearest recipes to `recipe_id`,
+        best first. `exclude_flags` (one per row) drops rows where it's set.
+        Returns None if the recipe isn't in the index.
+        """
+        import numpy as np
+
+        row = int(np.searchsorted(self.ids, recipe_id))
+        if row >= len(self.ids) or self.ids[row] != recipe_id:
+            return None
+
+        query = self.embeddings[row]
+        nprobe = min(NPROBE, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        members = []
+        for i in lists.tolist():
+            start, end = self.list_indptr[i], self.list_indptr[i + 1]
+            members.append(self.list_order[start:end])
+        candidates = np.concatenate(members)
+
+        candidates = candidates[candidates != row]
+        if exclude_flags is not None:
+            candidates = candidates[~exclude_flags[candidates]]
+        if not len(candidates):
+            return []
+
+        scores = self.embeddings[candidates] @ query
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(int(self.ids[candidates[i]]), round(float(scores[i]), 4)) for i in top]
+
+
+def index_path_for(app, engine):
+    """Stored next to the catalogue columns file for the same database."""
+    return columns_path_for(app, engine)[: -len(".cols")] + ".similar.npz"
+
+
+# One index per database, like the catalogue snapshots
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_similarity_index(snapshot=None):
+    """
+    The index for the current catalogue version. When the catalogue changed,
+    it is updated from the previous index (in memory, or the one saved on
+    disk) by re-embedding only recipes whose ingredients or labels changed.
+    """
+    from app.services.planner_service import noisy_labels
+
+    snapshot = snapshot or get_snapshot()
+    key = str(db.engine.url)
+    version = snapshot.columns.version
+    current = _indexes.get(key)
+    if current is not None and current.version == version:
+        return current
+
+    with _index_lock:
+        current = _indexes.get(key)
+        if current is not None and current.version == version:
+            return current
+
+        t0 = time.perf_counter()
+        path = index_path_for(current_app, db.engine)
+        previous = current or SimilarityIndex.load(path)
+        if previous is not None and previous.version == version:
+            index = previous
+            index.reembedded = 0
+        else:
+            index = SimilarityIndex.build(snapshot, noisy_labels(), previous)
+            index.save(path)
+        _indexes[key] = index
+        logging.info(
+            "Similarity index v%s ready in %.0f ms (%s of %s recipes embedded)",
+            version,
+            (time.perf_counter() - t0) * 1000,
+            index.reembedded,
+            len(index.ids),
+        )
+        return index
+
+
+def similar_recipes(recipe_id, k=DEFAULT_K):
+    """
+    [(recipe_id, score)] most like `recipe_id`, skipping disliked recipes and
+    near-duplicates (which would otherwise crowd the top of the list).
+    """
+    snapshot = get_snapshot()
+    index = get_similarity_index(snapshot)
+    excluded = (snapshot.flags & (FLAG_DISLIKED | FLAG_DUPLICATE)) > 0
+    return index.similar(recipe_id, k=k, exclude_flags=excluded)
@@ -0,0 +1,254 @@
+# app/services/write_queue.py
+
+import importlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from sqlalchemy import delete, func, select, update
+
+from app.metrics import WRITE_GROUP_SIZE, WRITE_SECONDS
+from app.models import ConfirmedPlan, Ingredient, Recipe, db
+
+# --- Write Queue Configuration ---
+# Most writes queued while the writer is busy are committed together with it
+MAX_GROUP_SIZE = 64
+# How long a request waits for its write to commit before giving up (seconds)
+WRITE_TIMEOUT = 10
+
+# Dialects with INSERT .. ON CONFLICT, for the active plan upsert
+UPSERT_DIALECTS = ("sqlite", "postgresql")
+
+
+class WriteQueue:
+    """
+    Funnels the web routes' small writes through one writer thread.
+
+    SQLite has a single writer anyway: with every request thread committing
+    on its own, concurrent users queue on the database lock (or time out with
+    "database is locked") and pay an fsync each. Here requests hand their write
+    to the writer and wait; whatever queued up while it was busy is applied in
+    one transaction (a group commit). If a group fails, its writes are retried
+    one by one so a bad write only fails its own request.
+
+    A write is a function taking the session (plus arguments) that must only
+    return plain values: the writer commits, and the ORM objects it touched
+    are expired by then. It may run twice (the retry above), always after a
+    rollback. Set WRITE_QUEUE=off to run writes on the request thread instead.
+    Each process has its own writer, so several workers still share the lock,
+    but only one connection per worker competes for it.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.groups = 0
+        self.writes = 0
+        self._inbox = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = (
+            str(app.config.get("WRITE_QUEUE", os.getenv("WRITE_QUEUE", "on"))).lower()
+            != "off"
+        )
+        app.extensions["write_queue"] = self
+
+    def run(self, write, *args, timeout=WRITE_TIMEOUT):
+        """Applies `write(session, *args)` and returns its result once committed."""
+        if not self.enabled:
+            t0 = time.perf_counter()
+            try:
+                result = write(db.session, *args)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            WRITE_SECONDS.observe(time.perf_counter() - t0, operation=write.__name__)
+            return result
+
+        return self.submit(write, *args).result(timeout=timeout)
+
+    def submit(self, write, *args):
+        """Queues `write(session, *args)`; returns a Future of its result."""
+        self._ensure_writer()
+        future = Future()
+        self._inbox.put((write, args, future, time.perf_counter()))
+        return future
+
+    def _ensure_writer(self):
+        # Started on first use, and again in a forked worker (threads don't
+        # survive the fork)
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._inbox = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run, name="write-queue", daemon=True
+                )
+                self._thread.start()
+                self._pid = pid
+
+    def _run(self):
+        inbox = self._inbox
+        while True:
+            group = [inbox.get()]
+            while len(group) < MAX_GROUP_SIZE:
+                try:
+                    group.append(inbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with self.app.app_context():
+                    try:
+                        self._commit_group(group)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                # Keep the writer alive; fail whatever this group left pending
+                logging.exception("Write queue failed applying %s writes", len(group))
+                for _, _, future, _ in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit_group(self, group):
+        try:
+            results = [write(db.session, *args) for write, args, _, _ in group]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(group) == 1:
+                group[0][2].set_exception(e)
+                return
+            logging.warning(
+                "Group commit of %s writes failed; retrying them one by one",
+                len(group),
+            )
+            for item in group:
+                self._commit_group([item])
+            return
+
+        self.groups += 1
+        self.writes += len(group)
+        WRITE_GROUP_SIZE.observe(len(group))
+        now = time.perf_counter()
+        for (write, _, future, queued), result in zip(group, results):
+            WRITE_SECONDS.observe(now - queued, operation=write.__name__)
+            future.set_result(result)
+
+
+def run_write(write, *args):
+    """Runs a write through the current app's queue (see WriteQueue.run)."""
+    from flask import current_app
+
+    return current_app.extensions["write_queue"].run(write, *args)
+
+
+# --- Writes ---
+# Used by the routes through run_write. Each returns whether it found its row.
+
+
+def toggle_recipe_dislike(session, recipe_id):
+    recipe = session.get(Recipe, recipe_id)
+    if recipe is None:
+        return False
+    recipe.is_disliked = not recipe.is_disliked
+    return True
+
+
+def toggle_recipe_status(session, recipe_id, status_type):
+    recipe = session.get(Recipe, recipe_id)
+    if recipe is None:
+        return False
+
+    if status_type == "favourite":
+        recipe.is_favourite = not recipe.is_favourite
+        # Logic: If favourited, it cannot be disliked
+        if recipe.is_favourite:
+            recipe.is_disliked = False
+
+    elif status_type == "dislike":
+        recipe.is_disliked = not recipe.is_disliked
+        # Logic: If disliked, it cannot be a favourite
+        if recipe.is_disliked:
+            recipe.is_favourite = False
+
+    return True
+
+
+def set_ingredient_category(session, name, category):
+    # Use func.lower to match regardless of capitalisation
+    ingredient = session.scalars(
+        select(Ingredient).where(func.lower(Ingredient.name) == name.lower()).limit(1)
+    ).first()
+    if ingredient is None:
+        return False
+    ingredient.category = category
+    return True
+
+
+def save_active_plan(session, recipe_ids):
+    """
+    Creates or replaces the active plan in one statement. The partial unique
+    index on status='active' makes this an upsert, so two requests finalising
+    at once can't leave two active plans (the old read-then-write could).
+    """
+    table = ConfirmedPlan.__table__
+    conn = session.connection()
+    values = {
+        "recipe_ids": ",".join(map(str, recipe_ids)),
+        "status": "active",
+        "date_confirmed": datetime.utcnow(),
+    }
+
+    if conn.dialect.name not in UPSERT_DIALECTS:
+        # No ON CONFLICT: still safe as long as writes go through the queue
+        existing = conn.execute(
+            update(table).where(table.c.status == "active").values(**values)
+        )
+        if existing.rowcount == 0:
+            conn.execute(table.insert().values(**values))
+        return True
+
+    # Imported here: loading a dialect module costs web startup time
+    dialect = importlib.import_module(f"sqlalchemy.dialects.{conn.dialect.name}")
+    stmt = dialect.insert(table).values(**values)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.status],
+            index_where=table.c.status == "active",
+            set_={
+                "recipe_ids": stmt.excluded.recipe_ids,
+                "date_confirmed": stmt.excluded.date_confirmed,
+            },
+        )
+    )
+    return True
+
+
+def complete_active_plan(session):
+    table = ConfirmedPlan.__table__
+    result = session.execute(
+        update(table)
+        .where(table.c.status == "active")
+        .values(status="completed", date_confirmed=datetime.utcnow())
+    )
+    return result.rowcount > 0
+
+
+def abandon_active_plan(session):
+    table = ConfirmedPlan.__table__
+    result = session.execute(delete(table).where(table.c.status == "active"))
+    return result.rowcount > 0
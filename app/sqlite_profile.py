@@ -0,0 +1,52 @@
+# app/sqlite_profile.py
+
+import logging
+import os
+
+from sqlalchemy import event
+
+# --- SQLite Connection Profile ---
+# Applied to every new pooled connection. Override any value via the env var of
+# the same name, or set SQLITE_PROFILE=off to use SQLite's stock settings.
+#   journal_mode=WAL     readers no longer block behind a writer (and vice versa)
+#   synchronous=NORMAL   fsync per checkpoint rather than per commit; safe in WAL
+#   mmap_size            read pages through the OS page cache instead of copies
+#   cache_size           negative = KiB of page cache per connection
+#   busy_timeout         wait (ms) for a lock instead of "database is locked"
+DEFAULT_PRAGMAS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_MMAP_SIZE": "268435456",
+    "SQLITE_CACHE_SIZE": "-65536",
+    "SQLITE_BUSY_TIMEOUT": "5000",
+    "SQLITE_TEMP_STORE": "MEMORY",
+}
+
+
+def init_app(app, engine):
+    for key, default in DEFAULT_PRAGMAS.items():
+        app.config.setdefault(key, os.getenv(key, default))
+
+    enabled = os.getenv("SQLITE_PROFILE", "on").lower() != "off"
+    app.config.setdefault("SQLITE_PROFILE", enabled)
+
+    if engine.dialect.name != "sqlite" or not app.config["SQLITE_PROFILE"]:
+        return
+
+    pragmas = [
+        ("journal_mode", app.config["SQLITE_JOURNAL_MODE"]),
+        ("synchronous", app.config["SQLITE_SYNCHRONOUS"]),
+        ("mmap_size", app.config["SQLITE_MMAP_SIZE"]),
+        ("cache_size", app.config["SQLITE_CACHE_SIZE"]),
+        ("busy_timeout", app.config["SQLITE_BUSY_TIMEOUT"]),
+        ("temp_store", app.config["SQLITE_TEMP_STORE"]),
+    ]
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    logging.debug("SQLite profile: %s", dict(pragmas))
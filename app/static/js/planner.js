@@ -1,4 +1,30 @@
 
+// GET a JSON API with revalidation: the last ETag for each URL is sent back as
+// If-None-Match, and a 304 reuses the body we already parsed.
+const jsonCache = new Map();
+
+function fetchJsonCached(url) {
+    const cached = jsonCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+
+    return fetch(url, { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json().then(data => {
+                const etag = response.headers.get('ETag');
+                if (etag) {
+                    jsonCache.set(url, { etag: etag, data: data });
+                }
+                return data;
+            });
+        });
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     // 1. Mirror global prefs
     document.querySelectorAll('.architect-btn').forEach(btn => {
@@ -23,8 +49,7 @@ document.addEventListener('DOMContentLoaded', function() {
             loading.style.display = 'block';
             content.style.display = 'none';
 
-            fetch('/api/shopping_list_preview')
-                .then(response => response.json())
+            fetchJsonCached('/api/shopping_list_preview')
                 .then(data => {
                     mainList.innerHTML = '';
                     const grouped = data.grouped_shopping_list;
@@ -173,8 +198,7 @@ document.addEventListener('DOMContentLoaded', function() {
     function performSearch(query) {
         const container = document.getElementById('searchResults');
         
-        fetch(`/api/search_recipes?q=${encodeURIComponent(query)}&favourites=${isFavOnly}`)
-            .then(res => res.json())
+        fetchJsonCached(`/api/search_recipes?q=${encodeURIComponent(query)}&favourites=${isFavOnly}`)
             .then(data => {
                 if (data.length === 0) {
                     container.innerHTML = '<p class="text-center text-muted py-4 small">No matching recipes found.</p>';
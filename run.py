@@ -1,10 +1,14 @@
 # run.py
 
 from app import create_app
+from app.services.catalogue_snapshot import warm_snapshot_async
 
 # Create the application instance using the factory
 app = create_app()
 
+# Build the planner's catalogue snapshot off the request path
+warm_snapshot_async(app)
+
 if __name__ == "__main__":
     # Run the application
     app.run(debug=True)
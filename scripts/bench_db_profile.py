@@ -0,0 +1,145 @@
+# scripts/bench_db_profile.py
+"""
+Before/after benchmark for the hot-path indexes and the SQLite profile.
+
+Builds one synthetic catalogue, copies it, strips the copy back to the old
+shape (no secondary indexes, rollback journal, stock pragmas) and times the
+planner and search routes against both.
+
+Usage:  python scripts/bench_db_profile.py --recipes 20000 [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import time_call  # noqa: E402
+from scripts.synthetic_catalogue import generate_catalogue  # noqa: E402
+
+
+def _make_app(db_path, profile):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SQLITE_PROFILE"] = "on" if profile else "off"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app import create_app
+
+    return create_app()
+
+
+def _strip_to_baseline(db_path):
+    conn = sqlite3.connect(db_path)
+    indexes = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'ix_%'"
+    ).fetchall()
+    for (name,) in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.commit()
+    conn.close()
+
+
+def run_cases(app, n_recipes, repeats, seed=7):
+    from app.models import db
+    from app.services.planner_service import (
+        get_recent_recipe_ids,
+        suggest_meal_plan,
+        suggest_single_recipe,
+    )
+
+    rng = random.Random(seed)
+    prefs = {"max_time": 30, "max_calories": 650}
+    client = app.test_client()
+    results = {}
+
+    with app.app_context():
+        cases = {
+            "suggest_single_recipe[Fish]": lambda: suggest_single_recipe(
+                [], "Fish", prefs
+            ),
+            "suggest_single_recipe[All,3 locked]": lambda: suggest_single_recipe(
+                rng.sample(range(1, n_recipes + 1), 3), "All", prefs
+            ),
+            "suggest_meal_plan": lambda: suggest_meal_plan(
+                rng.randint(1, n_recipes), count=5, prefs=prefs
+            ),
+            "get_recent_recipe_ids": get_recent_recipe_ids,
+            "GET /api/search_recipes?q=fish": lambda: client.get(
+                "/api/search_recipes?q=fish"
+            ),
+            "GET /api/search_recipes?favourites=true": lambda: client.get(
+                "/api/search_recipes?q=&favourites=true"
+            ),
+            "GET /api/search_recipes?q=zzz (no match)": lambda: client.get(
+                "/api/search_recipes?q=zzz"
+            ),
+            # Single-row commit: dominated by journal mode + fsync policy
+            "POST /toggle_status (commit)": lambda: client.post(
+                f"/toggle_status/{rng.randint(1, n_recipes)}/favourite"
+            ),
+        }
+        for name, fn in cases.items():
+            # Heavy whole-catalogue cases get fewer repeats
+            reps = max(1, repeats // 3) if name == "suggest_meal_plan" else repeats
+            results[name] = time_call(fn, reps)
+            db.session.remove()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index/pragma before-after bench")
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-db-")
+    after_db = os.path.join(workdir, "after.db")
+    before_db = os.path.join(workdir, "before.db")
+
+    print(f"Generating {args.recipes} recipes in {workdir} ...")
+    app = _make_app(after_db, profile=True)
+    with app.app_context():
+        from app.migrations import upgrade
+        from app.models import db
+
+        upgrade()
+        generate_catalogue(args.recipes)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    shutil.copy(after_db, before_db)
+    _strip_to_baseline(before_db)
+
+    report = {"recipes": args.recipes, "repeats": args.repeats, "cases": {}}
+    before = run_cases(_make_app(before_db, profile=False), args.recipes, args.repeats)
+    after = run_cases(_make_app(after_db, profile=True), args.recipes, args.repeats)
+
+    print(f"\n{'case':<42}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        b, a = before[name]["median_ms"], after[name]["median_ms"]
+        speedup = round(b / a, 2) if a else None
+        report["cases"][name] = {"before": before[name], "after": after[name]}
+        report["cases"][name]["speedup"] = speedup
+        print(f"{name:<42}{b:>12.2f}{a:>12.2f}{speedup:>9.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# scripts/bench_ingest.py
+"""
+Load test for the catalogue import, run offline against fake_gousto.py.
+
+Starts the stand-in API in a subprocess (so its request handling doesn't
+compete with the importer for the GIL), then for each fetch worker count runs
+a full streaming import into a fresh SQLite database and reports:
+  - throughput (recipes written per second of wall time)
+  - retries and errors, next to the failures the server injected
+  - database write time (busy time of the write stage, and its share of the run)
+
+Usage:
+  python scripts/bench_ingest.py [--recipes 1000] [--latency-ms 50]
+      [--jitter-ms 20] [--error-rate 0.02] [--fetch-workers 4 8 16]
+      [--batch-size 25] [--recorded file.json] [--out results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import urllib.request
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import run_metadata, write_json  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "instance", "bench")
+
+
+def start_server(args):
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "scripts", "fake_gousto.py"),
+        "--port",
+        "0",
+        "--recipes",
+        str(args.recipes),
+        "--seed",
+        str(args.seed),
+        "--latency-ms",
+        str(args.latency_ms),
+        "--jitter-ms",
+        str(args.jitter_ms),
+        "--error-rate",
+        str(args.error_rate),
+    ]
+    if args.recorded:
+        command += ["--recorded", args.recorded]
+
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()
+    if " on " not in line:
+        server.kill()
+        raise SystemExit(f"fake_gousto.py didn't start: {line!r}")
+    return server, line.rsplit(" on ", 1)[1].strip()
+
+
+def server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/_stats") as response:
+        return json.load(response)
+
+
+def run_import(db_path, args, fetch_workers):
+    from app import create_app
+    from app.migrations import upgrade
+    from app.models import db
+    from app.services.ingest_pipeline import run_ingest_pipeline
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+    app = create_app()
+
+    with app.app_context():
+        upgrade()
+        report = run_ingest_pipeline(
+            limit=args.recipes,
+            fetch_workers=fetch_workers,
+            parse_workers=args.parse_workers,
+            batch_size=args.batch_size,
+            report_interval=60,
+        )
+        db.session.remove()
+        db.engine.dispose()
+    return report
+
+
+def summarise_run(report, injected):
+    stages = {s["stage"]: s for s in report["stages"]}
+    elapsed = report["elapsed_seconds"]
+    write_seconds = stages["write"]["busy_seconds"]
+    return {
+        "elapsed_seconds": elapsed,
+        "recipes_written": report["recipes_written"],
+        "recipes_per_sec": round(report["recipes_written"] / max(elapsed, 1e-9), 1),
+        "retries": sum(s["retries"] for s in report["stages"]),
+        "errors": sum(s["errors"] for s in report["stages"]),
+        "injected_errors": injected,
+        "write_seconds": write_seconds,
+        "write_share": round(write_seconds / max(elapsed, 1e-9), 3),
+        "stages": report["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalogue import load test")
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--recorded", help="Serve captured responses instead")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--fetch-workers", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--parse-workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.makedirs(args.workdir, exist_ok=True)
+    server, base_url = start_server(args)
+    os.environ["GOUSTO_API_BASE"] = base_url
+    os.environ["GOUSTO_POLL_DELAY"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    report = {
+        "meta": run_metadata(
+            recipes=args.recipes,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            batch_size=args.batch_size,
+            recorded=args.recorded,
+        ),
+        "results": {},
+    }
+    try:
+        for workers in args.fetch_workers:
+            before = server_stats(base_url)["injected_errors"]
+            db_path = os.path.join(args.workdir, f"ingest-{workers}.db")
+            run = run_import(db_path, args, workers)
+            injected = server_stats(base_url)["injected_errors"] - before
+            report["results"][str(workers)] = summarise_run(run, injected)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(
+        f"\n{args.recipes} recipes, {args.latency_ms:g}±{args.jitter_ms:g} ms "
+        f"latency, {args.error_rate:.0%} errors"
+    )
+    print(
+        f"{'fetch workers':<15}{'written':>9}{'seconds':>9}{'recipes/s':>11}"
+        f"{'retries':>9}{'injected':>10}{'errors':>8}{'write s':>9}{'write %':>9}"
+    )
+    for workers, row in report["results"].items():
+        print(
+            f"{workers:<15}{row['recipes_written']:>9}{row['elapsed_seconds']:>9}"
+            f"{row['recipes_per_sec']:>11}{row['retries']:>9}"
+            f"{row['injected_errors']:>10}{row['errors']:>8}"
+            f"{row['write_seconds']:>9.2f}{row['write_share']:>9.1%}"
+        )
+
+    if args.out:
+        write_json(args.out, report)
+
+
+if __name__ == "__main__":
+    main()
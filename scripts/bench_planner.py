@@ -0,0 +1,182 @@
+# scripts/bench_planner.py
+"""
+Benchmark suite for the planner hot paths on synthetic catalogues.
+
+Usage:
+  python scripts/bench_planner.py --sizes 1000 10000 [--sizes ... 100000]
+      [--out results.json] [--baseline previous.json] [--threshold 0.2]
+
+Catalogues are cached in --workdir (one SQLite file per size/seed). Results
+are written as JSON; with --baseline, any case whose median got slower than
+the threshold is flagged and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import (  # noqa: E402
+    compare_results,
+    run_metadata,
+    time_call,
+    write_json,
+)
+from scripts.synthetic_catalogue import build_catalogue_db  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "instance", "bench")
+CONSTRAINT_LOOPS = 1000
+
+
+def bench_size(app, n_recipes, repeats, seed):
+    from app.models import Recipe, db
+    from app.services.catalogue_snapshot import get_snapshot
+    from app.services.planner_service import (
+        LABEL_CONSTRAINTS,
+        check_constraints,
+        generate_optimized_shopping_list,
+        get_synergy_report,
+        load_plan_recipes,
+        suggest_meal_plan,
+        suggest_single_recipe,
+        suggest_single_replacement,
+    )
+
+    rng = random.Random(seed)
+    prefs = {"max_time": 30, "max_calories": 650}
+    client = app.test_client()
+
+    def plan_ids(k=5):
+        return rng.sample(range(1, n_recipes + 1), k)
+
+    # Whole-catalogue scorers are slow at 100k; keep their repeat count sane
+    heavy = max(1, repeats // 3) if n_recipes >= 50000 else repeats
+
+    results = {}
+    with app.app_context():
+        fixed_plan = [r for r in load_plan_recipes(plan_ids()) if r]
+        db.session.expunge_all()
+
+        def replacement():
+            ids = plan_ids()
+            return suggest_single_replacement(ids[1:], ids, prefs)
+
+        def constraints_loop():
+            recipes = get_snapshot().records([r.id for r in fixed_plan])
+            for _ in range(CONSTRAINT_LOOPS):
+                check_constraints(recipes, LABEL_CONSTRAINTS)
+
+        cases = {
+            "suggest_meal_plan": (
+                lambda: suggest_meal_plan(rng.randint(1, n_recipes), 5, prefs),
+                heavy,
+            ),
+            "suggest_single_recipe[All,3 locked]": (
+                lambda: suggest_single_recipe(plan_ids(3), "All", prefs),
+                heavy,
+            ),
+            "suggest_single_recipe[Fish,empty]": (
+                lambda: suggest_single_recipe([], "Fish", prefs),
+                heavy,
+            ),
+            "suggest_single_replacement": (replacement, heavy),
+            "generate_optimized_shopping_list": (
+                lambda: generate_optimized_shopping_list(plan_ids()),
+                repeats,
+            ),
+            "get_synergy_report": (
+                lambda: get_synergy_report(plan_ids()),
+                repeats,
+            ),
+            f"check_constraints x{CONSTRAINT_LOOPS}": (constraints_loop, repeats),
+            "GET /api/search_recipes?q=chicken": (
+                lambda: client.get("/api/search_recipes?q=chicken"),
+                repeats,
+            ),
+            "GET /api/search_recipes?favourites=true": (
+                lambda: client.get("/api/search_recipes?q=&favourites=true"),
+                repeats,
+            ),
+        }
+
+        for name, (fn, reps) in cases.items():
+            print(f"  {name} ...", flush=True)
+            # Fresh session per sample so the identity map doesn't carry over
+            results[name] = time_call(lambda: (fn(), db.session.remove()), reps, 1)
+
+        results["_catalogue"] = {"recipes": db.session.query(Recipe).count()}
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planner hot-path benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Flag cases whose median is this fraction slower than baseline",
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.makedirs(args.workdir, exist_ok=True)
+
+    report = {
+        "meta": run_metadata(seed=args.seed, repeats=args.repeats),
+        "results": {},
+    }
+    for size in args.sizes:
+        path = os.path.join(args.workdir, f"catalogue-{size}-{args.seed}.db")
+        print(f"Catalogue of {size} recipes ({path})", flush=True)
+        app = build_catalogue_db(path, size, seed=args.seed)
+        report["results"][str(size)] = bench_size(app, size, args.repeats, args.seed)
+
+    print(f"\n{'size':>7}  {'case':<42}{'median ms':>12}{'p95 ms':>12}")
+    for size, cases in report["results"].items():
+        for name, stats in cases.items():
+            if name.startswith("_"):
+                continue
+            print(
+                f"{size:>7}  {name:<42}{stats['median_ms']:>12.2f}"
+                f"{stats['p95_ms']:>12.2f}"
+            )
+
+    if args.out:
+        write_json(args.out, report)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+
+        current = {
+            size: {k: v for k, v in cases.items() if not k.startswith("_")}
+            for size, cases in report["results"].items()
+        }
+        rows = compare_results(current, baseline, args.threshold)
+        regressions = [row for row in rows if row[5]]
+
+        print(f"\nAgainst {args.baseline} (threshold +{args.threshold:.0%}):")
+        for size, name, before, after, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(
+                f"{size:>7}  {name:<42}{before:>10.2f} -> {after:>10.2f}"
+                f"  x{ratio:<6} {flag}"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
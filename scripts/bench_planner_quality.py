@@ -0,0 +1,130 @@
+# scripts/bench_planner_quality.py
+"""
+Quality-versus-time comparison of the meal planner modes.
+
+For a set of seed recipes, scores every plan with beam_planner.plan_score (the
+objective beam search maximises) and times the call:
+  - sample: the weighted random planner, as best-of-k shuffles, since shuffling
+    again is the only remedy for a poor draw
+  - beam:   the deterministic planner at several beam widths / time budgets
+
+Usage:
+  python scripts/bench_planner_quality.py --sizes 1000 10000 [--seeds 10]
+      [--widths 1 4 8 16] [--budgets 50 2000] [--out results.json]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import run_metadata, write_json  # noqa: E402
+from scripts.synthetic_catalogue import build_catalogue_db  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "instance", "bench")
+SHUFFLES = (1, 3, 10)
+PREFS = {"max_time": 30, "max_calories": 650}
+
+
+def bench_size(seed_ids, widths, budgets):
+    from app.models import db
+    from app.services.beam_planner import plan_score
+    from app.services.catalogue_snapshot import get_snapshot
+    from app.services.planner_service import (
+        RECENT_DAYS,
+        get_recent_recipe_ids,
+        noisy_labels,
+        suggest_meal_plan,
+    )
+
+    recent_ids = get_recent_recipe_ids(days=RECENT_DAYS)
+
+    def run(seed_id, **kwargs):
+        t0 = time.perf_counter()
+        recipes = suggest_meal_plan(seed_id, count=5, prefs=PREFS, **kwargs)
+        elapsed = (time.perf_counter() - t0) * 1000
+        db.session.remove()
+        records = get_snapshot().records(
+            [r.id for r in recipes], ignore_labels=noisy_labels()
+        )
+        return plan_score(records, PREFS, recent_ids), elapsed
+
+    results = {}
+
+    # 1. Sampling: best of k shuffles costs k full requests
+    draws = {
+        seed_id: [run(seed_id) for _ in range(max(SHUFFLES))] for seed_id in seed_ids
+    }
+    for k in SHUFFLES:
+        scores, times = [], []
+        for runs in draws.values():
+            scores.append(max(score for score, _ in runs[:k]))
+            times.append(sum(ms for _, ms in runs[:k]))
+        results[f"sample best-of-{k}"] = _row(scores, times)
+
+    # 2. Beam search at each width and budget
+    for budget in budgets:
+        for width in widths:
+            runs = [
+                run(seed_id, mode="beam", beam_width=width, time_budget_ms=budget)
+                for seed_id in seed_ids
+            ]
+            results[f"beam w={width} budget={budget}ms"] = _row(
+                [score for score, _ in runs], [ms for _, ms in runs]
+            )
+
+    return results
+
+
+def _row(scores, times):
+    return {
+        "median_score": round(statistics.median(scores), 1),
+        "mean_score": round(statistics.mean(scores), 1),
+        "median_ms": round(statistics.median(times), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planner quality vs time")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--seeds", type=int, default=10)
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[50, 2000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {"meta": run_metadata(seeds=args.seeds, prefs=PREFS), "results": {}}
+
+    for n_recipes in args.sizes:
+        db_path = os.path.join(args.workdir, f"catalogue-{n_recipes}-{args.seed}.db")
+        app = build_catalogue_db(db_path, n_recipes, seed=args.seed)
+
+        random.seed(args.seed)
+        seed_ids = random.sample(range(1, n_recipes + 1), args.seeds)
+        with app.app_context():
+            results = bench_size(seed_ids, args.widths, args.budgets)
+        report["results"][str(n_recipes)] = results
+
+        print(f"\n{n_recipes} recipes ({args.seeds} seed recipes)")
+        print(f"{'case':<28}{'median score':>14}{'mean score':>12}{'median ms':>11}")
+        for case, row in results.items():
+            print(
+                f"{case:<28}{row['median_score']:>14}{row['mean_score']:>12}"
+                f"{row['median_ms']:>11}"
+            )
+
+    if args.out:
+        write_json(args.out, report)
+
+
+if __name__ == "__main__":
+    main()
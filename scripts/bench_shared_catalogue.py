@@ -0,0 +1,103 @@
+# scripts/bench_shared_catalogue.py
+"""
+Checks that the memory-mapped catalogue columns are shared between workers.
+
+Starts 1..N worker processes against the same synthetic catalogue. Each one
+builds its snapshot (mapping the shared columns file) and touches every page.
+Then the proportional set size (PSS) of the mapping and of the whole process
+is read from /proc. PSS splits shared pages between the processes that map
+them, so the summed mapping PSS should stay roughly flat as workers are added.
+
+Linux only (reads /proc/<pid>/smaps).
+Usage:  python scripts/bench_shared_catalogue.py --recipes 100000 --workers 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.synthetic_catalogue import build_catalogue_db  # noqa: E402
+
+WORKER = """
+import sys
+from app import create_app
+from app.services.catalogue_snapshot import get_snapshot
+
+app = create_app()
+with app.app_context():
+    columns = get_snapshot().columns
+    touched = sum(int(getattr(columns, name).sum()) for name in (
+        "ids", "kcal", "category", "flags", "label_bits", "ingredient_indices"))
+    print(columns.path, flush=True)
+    sys.stdin.readline()
+"""
+
+
+def _smaps_kib(pid, path=None):
+    """Sums Pss (KiB) over all mappings, or only those backed by `path`."""
+    total, in_mapping = 0, path is None
+    with open(f"/proc/{pid}/smaps") as fh:
+        for line in fh:
+            fields = line.split()
+            if "-" in fields[0] and len(fields) >= 5:
+                in_mapping = path is None or (len(fields) >= 6 and fields[5] == path)
+            elif fields[0] == "Pss:" and in_mapping:
+                total += int(fields[1])
+    return total
+
+
+def measure(n_workers, env):
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER],
+            cwd=ROOT,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(n_workers)
+    ]
+    try:
+        paths = [w.stdout.readline().strip() for w in workers]
+        mapping = sum(_smaps_kib(w.pid, paths[0]) for w in workers)
+        process = sum(_smaps_kib(w.pid) for w in workers)
+    finally:
+        for w in workers:
+            w.stdin.close()
+            w.wait()
+    return mapping, process, os.path.getsize(paths[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared catalogue memory check")
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=os.path.join(ROOT, "instance", "bench"))
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.join(args.workdir, f"catalogue-{args.recipes}-{args.seed}.db")
+    build_catalogue_db(db_path, args.recipes, seed=args.seed)
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}",
+        CATALOGUE_COLUMNS_DIR=args.workdir,
+        LOG_LEVEL="WARNING",
+    )
+
+    print(f"{'workers':>8}{'file KiB':>12}{'mapping PSS KiB':>18}{'total PSS KiB':>16}")
+    for n in range(1, args.workers + 1):
+        mapping, process, size = measure(n, env)
+        print(f"{n:>8}{size // 1024:>12}{mapping:>18}{process:>16}")
+
+
+if __name__ == "__main__":
+    main()
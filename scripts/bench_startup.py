@@ -0,0 +1,111 @@
+# scripts/bench_startup.py
+"""
+Import-time and startup benchmark for the web process.
+
+Each sample is a fresh interpreter that imports `app` and calls create_app()
+against an empty SQLite file, so nothing is shared between runs. Fails (exit 1)
+if the median create_app() wall time exceeds --budget-ms, or if any module the
+web process must not load (scraper/ML dependencies) shows up in sys.modules.
+
+Usage:  python scripts/bench_startup.py [--repeats 7] [--budget-ms 600]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import run_metadata, summarise, write_json  # noqa: E402
+
+# Modules that only the import/scrape jobs need
+FORBIDDEN_MODULES = ["requests", "bs4", "numpy", "cProfile", "pstats"]
+
+# Framework imports (Flask, SQLAlchemy) are ~85% of this on a dev laptop
+DEFAULT_BUDGET_MS = 600
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "total_ms": (t2 - t0) * 1000,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def sample(db_path):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        LOG_LEVEL="ERROR",
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web process startup benchmark")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    runs = [sample(os.path.join(workdir, "app.db")) for _ in range(args.repeats)]
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": run_metadata(repeats=args.repeats), "results": {}}
+    for key in ("import_ms", "create_app_ms", "total_ms"):
+        report["results"][key] = summarise([run[key] for run in runs])
+        stats = report["results"][key]
+        print(
+            f"{key:<16}median {stats['median_ms']:>8.1f} ms"
+            f"   max {stats['max_ms']:>8.1f} ms"
+        )
+
+    loaded = set(runs[-1]["modules"])
+    leaked = [m for m in FORBIDDEN_MODULES if m in loaded]
+    report["results"]["forbidden_modules_loaded"] = leaked
+    print(f"modules loaded  {len(loaded)}")
+
+    if args.json:
+        write_json(args.json, report)
+
+    failed = False
+    if leaked:
+        print(f"FAIL: web process imported {', '.join(leaked)}")
+        failed = True
+    median = report["results"]["total_ms"]["median_ms"]
+    if median > args.budget_ms:
+        print(
+            f"FAIL: startup {median:.0f} ms is over the {args.budget_ms:.0f} ms budget"
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: startup within {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# scripts/bench_web.py
+"""
+HTTP load test for the web routes: simulated users replay a planning session
+against a running app, each with its own session cookie, and every request's
+latency is recorded per route.
+
+One flow (think time between steps, see --think-ms):
+  GET  /                          open the planner
+  POST /randomise_slot/<i>        fill each of the 6 slots (+ the redirect to /)
+  GET  /api/search_recipes        typeahead burst: one request per keystroke,
+                                  revalidated with If-None-Match like planner.js
+  POST /shuffle/<i>               swap a couple of recipes
+  GET  /api/shopping_list_preview
+  POST /api/finalise_plan
+
+Each --users level runs for --duration seconds and reports per route the
+request count, errors, throughput and p50/p95/p99 latency. Without --url the
+app is started in a subprocess (threaded werkzeug server) on a synthetic
+catalogue of --recipes recipes; pass --url to test a real deployment instead.
+The load generator is threads in one process, so past a few dozen users check
+that it isn't the bottleneck (its CPU use shows in `top`).
+
+Usage:
+  python scripts/bench_web.py [--recipes 10000] [--users 1 4 16]
+      [--duration 30] [--think-ms 200] [--url http://host:port] [--out r.json]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.benchlib import run_metadata, summarise, write_json  # noqa: E402
+from scripts.synthetic_catalogue import build_catalogue_db  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "instance", "bench")
+REQUEST_TIMEOUT = 30
+PLAN_SLOTS = 6
+CATEGORIES = ["Chicken", "Beef", "Pork", "Fish", "Vegetarian", "All"]
+SEARCH_TERMS = ["chicken", "beef", "salmon", "vegetarian", "pork", "recipe"]
+# Gap between typeahead keystrokes, whatever the think time
+KEYSTROKE_MS = 80
+SHUFFLES_PER_FLOW = 2
+
+SERVER = """
+import logging
+from werkzeug.serving import make_server
+from app import create_app
+from app.services.catalogue_snapshot import warm_snapshot_async
+
+app = create_app()
+warm_snapshot_async(app)
+logging.getLogger("werkzeug").setLevel(logging.WARNING)
+server = make_server("127.0.0.1", 0, app, threaded=True)
+print(f"http://127.0.0.1:{server.server_port}", flush=True)
+server.serve_forever()
+"""
+
+
+class Recorder:
+    """Latency samples (ms) and error counts per route, shared by all users."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, ms, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(ms)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self, seconds):
+        rows = {}
+        everything = []
+        for route, samples in sorted(self.samples.items()):
+            everything.extend(samples)
+            rows[route] = _row(samples, self.errors.get(route, 0), seconds)
+        if everything:
+            rows["(all)"] = _row(everything, sum(self.errors.values()), seconds)
+        return rows
+
+
+def _row(samples, errors, seconds):
+    return {
+        **summarise(samples),
+        "errors": errors,
+        "requests_per_sec": round(len(samples) / seconds, 2),
+    }
+
+
+class User:
+    """One browser: its own cookie jar and ETag cache."""
+
+    def __init__(self, base_url, recorder, rng, think_ms):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think_ms / 1000
+        self.http = requests.Session()
+        self.etags = {}
+
+    def request(self, route, method, path, **kwargs):
+        headers = {}
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+
+        t0 = time.perf_counter()
+        try:
+            response = self.http.request(
+                method,
+                self.base_url + path,
+                headers=headers,
+                allow_redirects=False,
+                timeout=REQUEST_TIMEOUT,
+                **kwargs,
+            )
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(route, (time.perf_counter() - t0) * 1000, ok)
+
+        if ok and "ETag" in response.headers:
+            self.etags[path] = response.headers["ETag"]
+        return response
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+
+    def flow(self):
+        rng = self.rng
+        self.request("/", "GET", "/")
+        self.pause()
+
+        for slot in range(PLAN_SLOTS):
+            form = {"category": rng.choice(CATEGORIES)}
+            if rng.random() < 0.5:
+                form.update(max_time=rng.choice([30, 45]), max_cal=650)
+            response = self.request(
+                "/randomise_slot/<i>", "POST", f"/randomise_slot/{slot}", data=form
+            )
+            if response is not None and response.is_redirect:
+                self.request("/", "GET", "/")
+            self.pause()
+
+        term = rng.choice(SEARCH_TERMS)
+        for length in range(1, len(term) + 1):
+            self.request(
+                "/api/search_recipes",
+                "GET",
+                f"/api/search_recipes?q={term[:length]}&favourites=false",
+            )
+            time.sleep(KEYSTROKE_MS / 1000)
+        self.pause()
+
+        for _ in range(SHUFFLES_PER_FLOW):
+            slot = rng.randrange(PLAN_SLOTS)
+            mode = "favs" if rng.random() < 0.2 else "all"
+            self.request(
+                "/shuffle/<i>", "POST", f"/shuffle/{slot}", data={"mode": mode}
+            )
+            self.pause()
+
+        self.request("/api/shopping_list_preview", "GET", "/api/shopping_list_preview")
+        self.pause()
+        self.request("/api/finalise_plan", "POST", "/api/finalise_plan")
+
+
+def run_level(base_url, users, duration, think_ms, seed):
+    """Runs `users` concurrent users for `duration` seconds; returns the report."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def run_user(k):
+        user = User(base_url, recorder, random.Random(f"{seed}:{k}"), think_ms)
+        while time.perf_counter() < deadline:
+            user.flow()
+
+    threads = [
+        threading.Thread(target=run_user, args=(k,), daemon=True) for k in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Flows in progress at the deadline finish, so measure the real span
+    return recorder.report(time.perf_counter() - started)
+
+
+def start_app(args, **env_overrides):
+    """Serves the app on a synthetic catalogue; returns (process, base URL)."""
+    db_path = os.path.join(args.workdir, f"catalogue-{args.recipes}-{args.seed}.db")
+    build_catalogue_db(db_path, args.recipes, seed=args.seed)
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}",
+        LOG_LEVEL="WARNING",
+        METRICS_ENABLED="off",
+        **env_overrides,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER], cwd=ROOT, env=env, stdout=subprocess.PIPE
+    )
+    return server, server.stdout.readline().decode().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web route load test")
+    parser.add_argument("--url", help="Test a running app instead of starting one")
+    parser.add_argument("--recipes", type=int, default=10000)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--think-ms", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        os.makedirs(args.workdir, exist_ok=True)
+        server, base_url = start_app(args)
+        if not base_url.startswith("http"):
+            server.kill()
+            raise SystemExit("The app didn't start")
+    base_url = base_url.rstrip("/")
+
+    report = {
+        "meta": run_metadata(
+            url=args.url,
+            recipes=None if args.url else args.recipes,
+            duration=args.duration,
+            think_ms=args.think_ms,
+        ),
+        "results": {},
+    }
+    try:
+        # One unrecorded flow loads the catalogue snapshot and warms caches
+        User(base_url, Recorder(), random.Random(args.seed), 0).flow()
+
+        for users in args.users:
+            results = run_level(
+                base_url, users, args.duration, args.think_ms, args.seed
+            )
+            report["results"][str(users)] = results
+
+            print(f"\n{users} user(s), {args.duration:g} s, {args.think_ms:g} ms think")
+            print(
+                f"{'route':<30}{'requests':>9}{'errors':>8}{'req/s':>8}"
+                f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            )
+            for route, row in results.items():
+                print(
+                    f"{route:<30}{row['n']:>9}{row['errors']:>8}"
+                    f"{row['requests_per_sec']:>8}{row['median_ms']:>9.1f}"
+                    f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.out:
+        write_json(args.out, report)
+
+
+if __name__ == "__main__":
+    main()
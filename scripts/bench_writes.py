@@ -0,0 +1,170 @@
+# scripts/bench_writes.py
+"""
+Write throughput of the web routes under many concurrent clients, with the
+write queue (one writer thread, group commits) on and off.
+
+Each client has its own session and, with no think time, loops over a mix of
+the routes that write:
+  POST /toggle_status/<id>/favourite          35%
+  POST /toggle_dislike/<id>                   10%
+  POST /api/update_ingredient_category        20%
+  POST /api/finalise_plan                     30%   (upserts the active plan)
+  POST /complete_plan or /abandon_plan         5%
+
+For every mode and --clients level the app is served from a subprocess and
+the run reports writes per second, errors (e.g. "database is locked") and
+p50/p95/p99 latency per route, then checks there is at most one active plan.
+
+Usage:
+  python scripts/bench_writes.py [--recipes 10000] [--clients 1 16 64]
+      [--duration 20] [--modes on off] [--out results.json]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.bench_web import DEFAULT_WORKDIR, Recorder, User, start_app  # noqa: E402
+from scripts.benchlib import run_metadata, write_json  # noqa: E402
+from scripts.synthetic_catalogue import BASIC_INGREDIENTS  # noqa: E402
+
+INGREDIENT_CATEGORIES = ["Veg", "Dairy", "Pantry", "Meat", "Other"]
+# Fresh ingredients are named "fresh ingredient <n>" by synthetic_catalogue.py
+FRESH_INGREDIENTS = 300
+OPERATIONS = {
+    "favourite": 0.35,
+    "dislike": 0.10,
+    "ingredient": 0.20,
+    "finalise": 0.30,
+    "close_plan": 0.05,
+}
+
+
+def write_once(user, n_recipes):
+    rng = user.rng
+    operation = rng.choices(list(OPERATIONS), list(OPERATIONS.values()))[0]
+    recipe_id = rng.randint(1, n_recipes)
+
+    if operation == "favourite":
+        user.request(
+            "/toggle_status/<id>/favourite",
+            "POST",
+            f"/toggle_status/{recipe_id}/favourite",
+        )
+    elif operation == "dislike":
+        user.request("/toggle_dislike/<id>", "POST", f"/toggle_dislike/{recipe_id}")
+    elif operation == "ingredient":
+        if rng.random() < 0.2:
+            name = rng.choice(BASIC_INGREDIENTS)
+        else:
+            name = f"fresh ingredient {rng.randrange(FRESH_INGREDIENTS)}"
+        user.request(
+            "/api/update_ingredient_category",
+            "POST",
+            "/api/update_ingredient_category",
+            json={"name": name, "category": rng.choice(INGREDIENT_CATEGORIES)},
+        )
+    elif operation == "finalise":
+        # Changes one slot of this client's plan first (session only, not timed)
+        slot = rng.randrange(6)
+        user.http.post(f"{user.base_url}/select_recipe/{slot}/{recipe_id}")
+        user.request("/api/finalise_plan", "POST", "/api/finalise_plan")
+    else:
+        path = rng.choice(["/complete_plan", "/abandon_plan"])
+        user.request(path, "POST", path)
+
+
+def run_level(base_url, clients, duration, n_recipes, seed):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def run_client(k):
+        user = User(base_url, recorder, random.Random(f"{seed}:{k}"), 0)
+        # Every client starts with a plan of its own to finalise
+        for slot in range(6):
+            recipe_id = user.rng.randint(1, n_recipes)
+            user.http.post(f"{base_url}/select_recipe/{slot}/{recipe_id}")
+        while time.perf_counter() < deadline:
+            write_once(user, n_recipes)
+
+    threads = [
+        threading.Thread(target=run_client, args=(k,), daemon=True)
+        for k in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - started)
+
+
+def active_plans(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM confirmed_plan WHERE status = 'active'"
+        ).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent write throughput")
+    parser.add_argument("--recipes", type=int, default=10000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--modes", nargs="+", default=["on", "off"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.join(args.workdir, f"catalogue-{args.recipes}-{args.seed}.db")
+    report = {
+        "meta": run_metadata(recipes=args.recipes, duration=args.duration),
+        "results": {},
+    }
+
+    for mode in args.modes:
+        server, base_url = start_app(args, WRITE_QUEUE=mode)
+        try:
+            for clients in args.clients:
+                results = run_level(
+                    base_url, clients, args.duration, args.recipes, args.seed
+                )
+                results["(all)"]["active_plans"] = active_plans(db_path)
+                report["results"][f"queue={mode} clients={clients}"] = results
+
+                total = results["(all)"]
+                print(
+                    f"\nwrite queue {mode}, {clients} client(s): "
+                    f"{total['requests_per_sec']} writes/s, {total['errors']} errors, "
+                    f"{total['active_plans']} active plan(s)"
+                )
+                print(
+                    f"{'route':<36}{'requests':>9}{'errors':>8}"
+                    f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                )
+                for route, row in results.items():
+                    print(
+                        f"{route:<36}{row['n']:>9}{row['errors']:>8}"
+                        f"{row['median_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                        f"{row['p99_ms']:>9.1f}"
+                    )
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.out:
+        write_json(args.out, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# scripts/benchlib.py
+"""Shared helpers for the benchmark scripts (timing, metadata, comparisons)."""
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+
+def time_call(fn, repeats, warmup=0):
+    """Runs fn `repeats` times and returns latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    return summarise(samples)
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(sorted_samples)) - 1)
+    return sorted_samples[rank]
+
+
+def summarise(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def run_metadata(**extra):
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        revision = None
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "git_revision": revision or None,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **extra,
+    }
+
+
+def write_json(path, payload):
+    with open(path, "w") as fh:
+        json.dump(payload, fh, indent=2, sort_keys=True)
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Compares {group: {case: stats}} result trees by median latency.
+    Returns a list of (group, case, baseline_ms, current_ms, ratio, regressed).
+    """
+    rows = []
+    for group, cases in current.items():
+        for case, stats in cases.items():
+            before = baseline.get(group, {}).get(case)
+            if not before or not before.get("median_ms"):
+                continue
+            ratio = stats["median_ms"] / before["median_ms"]
+            rows.append(
+                (
+                    group,
+                    case,
+                    before["median_ms"],
+                    stats["median_ms"],
+                    round(ratio, 3),
+                    ratio > 1 + threshold,
+                )
+            )
+    return rows
@@ -0,0 +1,40 @@
+import argparse
+import logging
+import sys
+
+from app import create_app
+from app.migrations import upgrade
+from app.services.catalogue_archive import export_archive, import_archive
+
+# Bootstraps a new instance without scraping:
+#   python -m scripts.catalogue_archive export catalogue.npz   (on a live one)
+#   python -m scripts.catalogue_archive import catalogue.npz   (on an empty one)
+parser = argparse.ArgumentParser(description="Export/import the recipe catalogue.")
+parser.add_argument("action", choices=("export", "import"))
+parser.add_argument("path", help="Archive file (.npz)")
+parser.add_argument(
+    "--no-similarity",
+    action="store_true",
+    help="Leave the similarity index out of the export (it is rebuilt on demand).",
+)
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    upgrade()
+    try:
+        if args.action == "export":
+            manifest = export_archive(args.path, with_similarity=not args.no_similarity)
+        else:
+            manifest = import_archive(args.path)
+    except ValueError as e:
+        logging.error("%s", e)
+        sys.exit(1)
+
+    logging.info(
+        "Done: %s",
+        ", ".join(
+            f"{spec['rows']} {name} rows" for name, spec in manifest["tables"].items()
+        ),
+    )
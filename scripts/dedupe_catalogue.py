@@ -0,0 +1,27 @@
+import argparse
+import logging
+
+from app import create_app
+from app.migrations import upgrade
+from app.services.near_duplicates import dedupe_catalogue
+
+parser = argparse.ArgumentParser(description="Flag near-duplicate recipes.")
+parser.add_argument(
+    "--rebuild",
+    action="store_true",
+    help="Recompute every signature (only unsigned recipes are hashed otherwise).",
+)
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    upgrade()
+
+    # New imports are checked as they are written (see ingest_pipeline.py);
+    # this catches the catalogue as it was before. The running app can do the
+    # same via POST /api/jobs/dedupe (with the X-Jobs-Token header).
+    report = dedupe_catalogue(rebuild=args.rebuild)
+    logging.info(
+        "Done: %s duplicate(s) in %s group(s)", report["duplicates"], report["groups"]
+    )
@@ -0,0 +1,291 @@
+# scripts/fake_gousto.py
+"""
+Local stand-in for the Gousto recipe API, so imports can be run and load-tested
+offline. Serves the two endpoints the scrapers use:
+  /cmsreadbroker/v1/recipes?category=recipes&limit=..&offset=..
+  /cmsreadbroker/v1/recipe/<slug>
+plus /_stats (request and injected-error counters, as JSON).
+
+Recipes are synthetic (generated on demand from --seed, same vocabulary as
+synthetic_catalogue.py) unless --recorded points at a JSON file of captured
+responses: {"entries": [listing entries...], "recipes": {slug: entry}}.
+`record` writes such a file from whatever GOUSTO_API_BASE points at.
+
+Usage:
+  python scripts/fake_gousto.py [--recipes 1000] [--latency-ms 50]
+      [--jitter-ms 20] [--error-rate 0.02] [--port 8800] [--recorded file.json]
+  python scripts/fake_gousto.py record out.json --recipes 200
+
+Then run the import with GOUSTO_API_BASE=http://127.0.0.1:8800 and
+GOUSTO_POLL_DELAY=0 (see bench_ingest.py, which does all of this itself).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.catalogue_scraper import (  # noqa: E402
+    GET_RECIPE_INFO_PATH,
+    GET_RECIPES_PATH,
+)
+from scripts.synthetic_catalogue import (  # noqa: E402
+    BASIC_INGREDIENTS,
+    CATEGORY_WEIGHTS,
+    CUISINE_LABELS,
+    PROTEINS,
+    STEP_WORDS,
+    TRAIT_LABELS,
+)
+
+DEFAULT_PORT = 8800
+SLUG_PREFIX = "fake-recipe-"
+FRESH_INGREDIENTS = 400
+# Status returned for injected failures; the importer retries it
+ERROR_STATUS = 503
+
+
+def synthetic_entry(seed, index):
+    """The full recipe entry for catalogue position `index` (0-based)."""
+    rng = random.Random(f"{seed}:{index}")
+    category = rng.choices(list(CATEGORY_WEIGHTS), list(CATEGORY_WEIGHTS.values()))[0]
+    cuisine = rng.choice(CUISINE_LABELS)
+    protein = rng.choice(PROTEINS[category])
+    slug = f"{SLUG_PREFIX}{index + 1}"
+
+    labels = [cuisine] + rng.sample(TRAIT_LABELS, rng.randint(0, 2))
+    if category == "Vegetarian":
+        labels.append("Vegetarian")
+    categories = [{"title": "All recipes"}] + [
+        {"title": f"{label} recipes"} for label in labels
+    ]
+
+    ingredients = [{"name": protein, "label": f"{protein} ({rng.randint(2, 5)}00g)"}]
+    for _ in range(rng.randint(4, 9)):
+        name = f"fresh ingredient {int(rng.paretovariate(1.2)) % FRESH_INGREDIENTS}"
+        if rng.random() < 0.5:
+            label = f"{name} ({rng.randint(1, 20) * 10}g)"
+        else:
+            label = f"{name} x{rng.randint(1, 3)}"
+        ingredients.append({"name": name, "label": label})
+    for name in rng.sample(BASIC_INGREDIENTS, rng.randint(1, 3)):
+        ingredients.append({"name": name, "label": f"{name} ({rng.randint(1, 3)}tbsp)"})
+
+    steps = []
+    for _ in range(rng.randint(4, 8)):
+        words = rng.choices(STEP_WORDS, k=rng.randint(8, 20))
+        steps.append({"instruction": f"<p>{' '.join(words).capitalize()}.</p>"})
+
+    minutes = rng.choice([15, 20, 25, 30, 35, 40, 45, 50])
+    image = f"https://example.invalid/images/{slug}"
+    return {
+        "title": f"{cuisine} {protein.title()} {category} Recipe {index + 1}",
+        "url": f"/cookbook/recipes/{slug}",
+        "prep_times": {"for_2": minutes, "for_4": minutes + 5},
+        "media": {
+            "images": [
+                {"image": f"{image}-200.jpg", "width": 200},
+                {"image": f"{image}-400.jpg", "width": 400},
+            ]
+        },
+        "cooking_instructions": steps,
+        "nutritional_information": {
+            "per_portion": {"energy_kcal": max(int(rng.gauss(600, 120)), 250)}
+        },
+        "categories": categories,
+        "ingredients": ingredients,
+    }
+
+
+def listing_entry(entry):
+    return {k: entry[k] for k in ("title", "url", "prep_times")}
+
+
+class SyntheticCatalogue:
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.seed = seed
+
+    def page(self, offset, limit):
+        end = min(offset + limit, self.size)
+        return [
+            listing_entry(synthetic_entry(self.seed, i)) for i in range(offset, end)
+        ]
+
+    def recipe(self, slug):
+        index = slug.removeprefix(SLUG_PREFIX)
+        if not index.isdigit() or not 0 < int(index) <= self.size:
+            return None
+        return synthetic_entry(self.seed, int(index) - 1)
+
+
+class RecordedCatalogue:
+    def __init__(self, path):
+        with open(path) as fh:
+            data = json.load(fh)
+        self.entries = data["entries"]
+        self.recipes = data["recipes"]
+        self.size = len(self.entries)
+
+    def page(self, offset, limit):
+        end = offset + limit
+        return self.entries[offset:end]
+
+    def recipe(self, slug):
+        return self.recipes.get(slug)
+
+
+class FakeGoustoServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, catalogue, latency_ms=0, jitter_ms=0, error_rate=0):
+        super().__init__(address, _Handler)
+        self.catalogue = catalogue
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.requests = 0
+        self.injected_errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self):
+        """Counts a request and returns (delay seconds, fail?) for it."""
+        with self._lock:
+            self.requests += 1
+            delay = max(self.latency + self._rng.uniform(-1, 1) * self.jitter, 0)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        return delay, fail
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the importer's pooled connections behave as they would
+    # against the real API
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            self._send(
+                200,
+                {
+                    "requests": self.server.requests,
+                    "injected_errors": self.server.injected_errors,
+                },
+            )
+            return
+
+        delay, fail = self.server.draw()
+        time.sleep(delay)
+        if fail:
+            self._send(ERROR_STATUS, {"error": "injected failure"})
+            return
+
+        listing_path = GET_RECIPES_PATH.split("?")[0]
+        if url.path == listing_path:
+            query = parse_qs(url.query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["16"])[0])
+            entries = self.server.catalogue.page(offset, limit)
+            self._send(200, {"data": {"entries": entries}})
+        elif url.path.startswith(GET_RECIPE_INFO_PATH):
+            entry = self.server.catalogue.recipe(
+                url.path.removeprefix(GET_RECIPE_INFO_PATH)
+            )
+            if entry is None:
+                self._send(404, {"error": "not found"})
+            else:
+                self._send(200, {"data": {"entry": entry}})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def record(path, limit):
+    """Captures `limit` recipes from GOUSTO_API_BASE in the --recorded format."""
+    from app.services.ingest_pipeline import discover_entries, fetch_entry
+
+    entries, recipes = [], {}
+    for entry_path, name, servings in discover_entries(limit):
+        fetched = fetch_entry((entry_path, name, servings))
+        if fetched is None:
+            continue
+        entries.append(
+            {"title": name, "url": entry_path, "prep_times": {"for_2": servings}}
+        )
+        recipes[fetched["slug"]] = fetched["api_data"]
+
+    with open(path, "w") as fh:
+        json.dump({"entries": entries, "recipes": recipes}, fh)
+    print(f"Recorded {len(entries)} recipes to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gousto API stand-in")
+    parser.add_argument("command", nargs="?", choices=["serve", "record"])
+    parser.add_argument("path", nargs="?", help="Output file for `record`")
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--recorded", help="Serve captured responses instead")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 = any")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        if not args.path:
+            parser.error("record needs an output path")
+        record(args.path, args.recipes)
+        return
+
+    if args.recorded:
+        catalogue = RecordedCatalogue(args.recorded)
+    else:
+        catalogue = SyntheticCatalogue(args.recipes, seed=args.seed)
+    server = FakeGoustoServer(
+        (args.host, args.port),
+        catalogue,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    )
+    # bench_ingest.py reads the URL from this line
+    print(f"Serving {catalogue.size} recipes on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
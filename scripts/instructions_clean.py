@@ -1,17 +1,13 @@
 import logging
-import re
 
 from app import create_app, db
-from app.models import Recipe
+from app.services.instructions import backfill_instruction_steps
 
+# Rebuilds the structured steps for every recipe, e.g. after instructions have
+# been edited by hand. New imports already store them (see instructions.py).
 app = create_app()
 with app.app_context():
-    recipes = Recipe.query.all()
-    for r in recipes:
-        if r.instructions:
-            cleaned = re.sub(r"([a-z])([A-Z])", r"\1. \2", r.instructions)
-            cleaned = cleaned.replace("..", ".")
-            r.instructions = cleaned
+    with db.engine.begin() as conn:
+        updated = backfill_instruction_steps(conn, only_missing=False)
 
-    db.session.commit()
-    logging.info("Database instructions cleaned")
+    logging.info("Structured instructions rebuilt for %s recipes", updated)
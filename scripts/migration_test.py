@@ -0,0 +1,133 @@
+# scripts/migration_test.py
+"""
+Upgrades a database with the original (pre-migrations) schema to head and
+checks the result, so a migration that depends on the current model rather
+than on the schema it actually runs against fails here first.
+
+Usage:  python scripts/migration_test.py   (exits 1 on failure)
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# The schema db.create_all() produced before schema versioning existed
+BASELINE_SCHEMA = """
+CREATE TABLE recipe (
+    id INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    servings INTEGER,
+    time_minutes INTEGER,
+    instructions TEXT,
+    nutritional_info TEXT,
+    is_favourite BOOLEAN,
+    is_disliked BOOLEAN,
+    image_url VARCHAR(500),
+    source_url VARCHAR(500),
+    category VARCHAR(50),
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+CREATE TABLE ingredient (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    is_basic BOOLEAN,
+    category VARCHAR(50),
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+CREATE TABLE label (
+    id INTEGER NOT NULL,
+    title VARCHAR(100) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (title)
+);
+CREATE TABLE confirmed_plan (
+    id INTEGER NOT NULL,
+    date_confirmed DATETIME,
+    recipe_ids VARCHAR(500) NOT NULL,
+    status VARCHAR(20),
+    PRIMARY KEY (id)
+);
+CREATE TABLE recipe_label (
+    recipe_id INTEGER NOT NULL,
+    label_id INTEGER NOT NULL,
+    PRIMARY KEY (recipe_id, label_id),
+    FOREIGN KEY(recipe_id) REFERENCES recipe (id),
+    FOREIGN KEY(label_id) REFERENCES label (id)
+);
+CREATE TABLE recipe_ingredient (
+    recipe_id INTEGER NOT NULL,
+    ingredient_id INTEGER NOT NULL,
+    quantity FLOAT NOT NULL,
+    unit VARCHAR(50) NOT NULL,
+    PRIMARY KEY (recipe_id, ingredient_id),
+    FOREIGN KEY(recipe_id) REFERENCES recipe (id),
+    FOREIGN KEY(ingredient_id) REFERENCES ingredient (id)
+);
+INSERT INTO recipe VALUES (1, 'Chicken Curry', 2, 30, 'Chop the onion. Fry.',
+    '{"per_portion": {"energy_kcal": 540}}', 0, 0, NULL, NULL, 'Chicken');
+INSERT INTO confirmed_plan VALUES (1, '2026-01-01 00:00:00', '1', 'active');
+INSERT INTO confirmed_plan VALUES (2, '2026-01-02 00:00:00', '1', 'active');
+"""
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "baseline.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["CATALOGUE_COLUMNS_DIR"] = workdir
+
+    from sqlalchemy import inspect
+
+    from app import create_app
+    from app.migrations import MIGRATIONS, current_version, upgrade
+    from app.models import db
+
+    app = create_app()
+    failures = []
+    with app.app_context():
+        upgrade()
+        if current_version() != MIGRATIONS[-1][0]:
+            failures.append(f"schema at v{current_version()}")
+
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                failures.append(f"missing table {table.name}")
+                continue
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in set(table.columns.keys()) - columns:
+                failures.append(f"missing column {table.name}.{column}")
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    failures.append(f"missing index {index.name}")
+
+        kcal = db.session.execute(db.text("SELECT kcal FROM recipe")).scalar()
+        if kcal != 540:
+            failures.append(f"kcal backfilled as {kcal!r}")
+        active = db.session.execute(
+            db.text("SELECT COUNT(*) FROM confirmed_plan WHERE status = 'active'")
+        ).scalar()
+        if active != 1:
+            failures.append(f"{active} active plans")
+        db.session.remove()
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        sys.exit(1)
+    print(f"Baseline schema upgraded to v{MIGRATIONS[-1][0]}: OK")
+
+
+if __name__ == "__main__":
+    main()
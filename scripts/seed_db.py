@@ -1,23 +1,31 @@
+import argparse
 import logging
 
 from app import create_app
+from app.migrations import upgrade
 from app.models import db
-from app.services.catalogue_scraper import run_catalogue_import
-from app.services.classifier import classify_all_recipes
-from app.services.ingredient_classifier import classify_ingredients
+from app.services.ingest_pipeline import run_ingest_pipeline
+
+parser = argparse.ArgumentParser(description="Import the Gousto catalogue.")
+parser.add_argument(
+    "--reset",
+    action="store_true",
+    help="Drop all tables first (the import upserts by name otherwise).",
+)
+args = parser.parse_args()
 
 app = create_app()
 
 with app.app_context():
-    logging.info("Clearing old data...")
-    db.drop_all()
-    db.create_all()
-
-    logging.info("Running scraper...")
-    run_catalogue_import()  # This now runs all 4 of your scraper functions
+    if args.reset:
+        logging.info("Clearing old data...")
+        db.drop_all()
+    upgrade()
 
-    logging.info("Classifying...")
-    classify_ingredients()
-    classify_all_recipes()
+    # Fetch, parse, classify and write all overlap; see ingest_pipeline.py.
+    # The running app can do the same via POST /api/jobs/import (with the
+    # X-Jobs-Token header, see job_runner.py).
+    logging.info("Running streaming ingest...")
+    run_ingest_pipeline()
 
     logging.info("Done")
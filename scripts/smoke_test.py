@@ -1,6 +1,6 @@
+import importlib
 import os
 import sys
-import importlib
 
 # Ensure project root is on sys.path so `app` package can be imported
 ROOT = os.path.dirname(os.path.dirname(__file__))
@@ -11,6 +11,10 @@ if ROOT not in sys.path:
 app_mod = importlib.import_module("app")
 app = app_mod.create_app()
 
+# Schema creation isn't done at boot any more; bring the test DB up to date
+with app.app_context():
+    importlib.import_module("app.migrations").upgrade()
+
 with app.test_client() as c:
     r = c.get("/")
     print("GET / ->", r.status_code)
@@ -0,0 +1,248 @@
+# scripts/synthetic_catalogue.py
+"""
+Generates a synthetic Gousto-like catalogue for benchmarks.
+
+Usage:  python scripts/synthetic_catalogue.py --recipes 10000
+(writes to DATABASE_URL, which must point at an empty database)
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+# Ensure project root is on sys.path so `app` package can be imported
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.migrations import upgrade  # noqa: E402
+from app.models import (  # noqa: E402
+    ConfirmedPlan,
+    Ingredient,
+    Label,
+    Recipe,
+    RecipeIngredient,
+    db,
+    recipe_label,
+)
+from app.services.catalogue_version import bump_catalogue_version  # noqa: E402
+
+# Rough shape of the real catalogue
+CATEGORY_WEIGHTS = {
+    "Chicken": 0.30,
+    "Vegetarian": 0.28,
+    "Beef": 0.12,
+    "Fish": 0.13,
+    "Pork": 0.11,
+    "Other": 0.06,
+}
+CUISINE_LABELS = [
+    "Italian",
+    "Indian",
+    "Thai",
+    "Mexican",
+    "Chinese",
+    "Japanese",
+    "Korean",
+    "British",
+    "Middle Eastern",
+    "Mediterranean",
+    "American",
+    "French",
+    "Spanish",
+    "Vietnamese",
+    "Caribbean",
+    "Greek",
+]
+TRAIT_LABELS = ["Healthy", "Quick", "Spicy", "Family Friendly", "Calorie Controlled"]
+NOISY_LABELS = ["All Gousto Recipes", "Gluten Free Recipes", "Dairy Free", "New"]
+BASIC_INGREDIENTS = [
+    "salt",
+    "pepper",
+    "olive oil",
+    "vegetable oil",
+    "sugar",
+    "butter",
+    "plain flour",
+    "water",
+]
+PROTEINS = {
+    "Chicken": ["chicken breast", "chicken thigh", "diced chicken"],
+    "Beef": ["beef mince", "beef steak", "diced beef"],
+    "Pork": ["pork mince", "smoked bacon", "pork sausages", "chorizo"],
+    "Fish": ["salmon fillet", "cod fillet", "king prawns", "smoked haddock"],
+    "Vegetarian": ["halloumi", "paneer", "chickpeas", "tofu", "free range egg"],
+    "Other": ["lamb mince", "duck leg", "turkey mince"],
+}
+UNITS = [("g", 50, 400), ("ml", 50, 400), ("item", 1, 4), ("tbsp", 1, 3)]
+STEP_WORDS = (
+    "heat chop stir add season simmer roast slice drain mix serve toss fry "
+    "bake boil grate whisk pour garnish reduce blend"
+).split()
+
+
+def _zipf_weights(n, s=1.1):
+    return [1.0 / (rank**s) for rank in range(1, n + 1)]
+
+
+def _instructions(rng):
+    steps = []
+    for _ in range(rng.randint(4, 8)):
+        sentences = [
+            " ".join(rng.choices(STEP_WORDS, k=rng.randint(5, 12))).capitalize()
+            for _ in range(rng.randint(1, 3))
+        ]
+        steps.append(". ".join(sentences) + ".")
+    return "\n".join(steps)
+
+
+def generate_catalogue(n_recipes, seed=42, chunk_size=2000, history_weeks=4):
+    """
+    Bulk-loads `n_recipes` synthetic recipes (plus ingredients, labels, links and
+    a few weeks of plan history) into the current app's database.
+    Must be called inside an app context. Returns the number of link rows.
+    """
+    rng = random.Random(seed)
+
+    # Ingredient vocabulary grows with the catalogue, popularity is Zipfian
+    n_fresh = max(300, n_recipes // 15)
+    fresh_names = [f"fresh ingredient {i}" for i in range(n_fresh)]
+    fresh_weights = _zipf_weights(n_fresh)
+    protein_names = sorted({p for names in PROTEINS.values() for p in names})
+
+    ingredient_rows = []
+    for name in BASIC_INGREDIENTS:
+        ingredient_rows.append({"name": name, "is_basic": True, "category": "Pantry"})
+    for name in protein_names:
+        ingredient_rows.append({"name": name, "is_basic": False, "category": "Meat"})
+    for name in fresh_names:
+        category = rng.choice(["Veg", "Veg", "Dairy", "Pantry", "Other"])
+        ingredient_rows.append({"name": name, "is_basic": False, "category": category})
+    db.session.execute(insert(Ingredient), ingredient_rows)
+
+    label_titles = CUISINE_LABELS + TRAIT_LABELS + NOISY_LABELS + ["Vegetarian"]
+    db.session.execute(insert(Label), [{"title": t} for t in label_titles])
+    db.session.commit()
+
+    ingredient_ids = dict(
+        db.session.execute(db.select(Ingredient.name, Ingredient.id)).all()
+    )
+    label_ids = dict(db.session.execute(db.select(Label.title, Label.id)).all())
+    categories = list(CATEGORY_WEIGHTS)
+    category_weights = list(CATEGORY_WEIGHTS.values())
+
+    links = 0
+    for start in range(0, n_recipes, chunk_size):
+        end = min(start + chunk_size, n_recipes)
+        recipe_rows, label_rows, ingredient_link_rows = [], [], []
+
+        for rid in range(start + 1, end + 1):
+            category = rng.choices(categories, category_weights)[0]
+            kcal = max(int(rng.gauss(600, 120)), 250)
+            recipe_rows.append(
+                {
+                    "id": rid,
+                    "name": f"Synthetic {category} Recipe {rid}",
+                    "servings": 2,
+                    "time_minutes": rng.choice(range(15, 65, 5)),
+                    "instructions": _instructions(rng),
+                    "nutritional_info": json.dumps(
+                        {"per_portion": {"energy_kcal": kcal}}
+                    ),
+                    # Core inserts skip the ORM hook that derives this column
+                    "kcal": kcal,
+                    "is_favourite": rng.random() < 0.03,
+                    "is_disliked": rng.random() < 0.02,
+                    "image_url": f"https://example.invalid/img/{rid}.jpg",
+                    "source_url": f"https://example.invalid/recipes/{rid}",
+                    "category": category,
+                }
+            )
+
+            titles = {rng.choice(CUISINE_LABELS), "All Gousto Recipes"}
+            titles.update(rng.sample(TRAIT_LABELS, rng.randint(0, 2)))
+            titles.update(rng.sample(NOISY_LABELS[1:], rng.randint(0, 2)))
+            if category == "Vegetarian":
+                titles.add("Vegetarian")
+            label_rows.extend(
+                {"recipe_id": rid, "label_id": label_ids[t]} for t in titles
+            )
+
+            names = {rng.choice(PROTEINS[category])}
+            names.update(rng.sample(BASIC_INGREDIENTS, rng.randint(1, 4)))
+            target = rng.randint(8, 14)
+            while len(names) < target:
+                names.add(rng.choices(fresh_names, fresh_weights)[0])
+            for name in names:
+                unit, low, high = rng.choice(UNITS)
+                ingredient_link_rows.append(
+                    {
+                        "recipe_id": rid,
+                        "ingredient_id": ingredient_ids[name],
+                        "quantity": float(rng.randint(low, high)),
+                        "unit": "to taste" if name in BASIC_INGREDIENTS else unit,
+                    }
+                )
+
+        db.session.execute(insert(Recipe), recipe_rows)
+        db.session.execute(recipe_label.insert(), label_rows)
+        db.session.execute(insert(RecipeIngredient), ingredient_link_rows)
+        db.session.commit()
+        links += len(ingredient_link_rows)
+        logging.info("Generated %s/%s recipes", end, n_recipes)
+
+    # A few weeks of completed plans so recency penalties have work to do
+    now = datetime.utcnow()
+    for week in range(history_weeks):
+        ids = rng.sample(range(1, n_recipes + 1), min(5, n_recipes))
+        db.session.add(
+            ConfirmedPlan(
+                recipe_ids=",".join(map(str, ids)),
+                status="completed",
+                date_confirmed=now - timedelta(days=7 * week + 1),
+            )
+        )
+    # Core inserts bypass the ORM flush hook that versions the catalogue
+    bump_catalogue_version()
+    db.session.commit()
+    return links
+
+
+def build_catalogue_db(path, n_recipes, seed=42):
+    """
+    Creates (or reuses) a SQLite file holding a synthetic catalogue and returns
+    an app bound to it. Generation is skipped if the file already exists, so
+    repeated benchmark runs at 100k recipes don't pay for it every time.
+    """
+    from app import create_app
+
+    fresh = not os.path.exists(path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(path)}"
+    app = create_app()
+
+    with app.app_context():
+        upgrade()
+        if fresh:
+            generate_catalogue(n_recipes, seed=seed)
+        db.session.remove()
+
+    return app
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        upgrade()
+        generate_catalogue(args.recipes, seed=args.seed)